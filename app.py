@@ -21,9 +21,14 @@ import json
 import os
 from werkzeug.security import generate_password_hash, check_password_hash
 import re
+import ipaddress
 import time
 import random
+import uuid
 from .config import config
+from .inventory_cache import InventoryCache
+from .job_journal import JobJournal, RESUMABLE_STATUSES
+from .log_bus import LogBus
 import traceback
 
 app = Flask(__name__)
@@ -44,6 +49,17 @@ app.logger.info(f"Demo mode is {'enabled' if DEMO_MODE else 'disabled'}")
 # Global variable for storing last provision VMs data
 last_provision_vms = []
 
+# Inventory snapshot cache shared by all requests
+inventory_cache = InventoryCache(
+    ttls=config["INVENTORY_CACHE_TTLS"],
+    default_ttl=config["INVENTORY_CACHE_TTL"],
+    max_entries=config["INVENTORY_CACHE_MAX_ENTRIES"],
+    wait_timeout=config["INVENTORY_CACHE_WAIT_TIMEOUT"],
+)
+
+# Durable journal of production provisioning jobs (plan, task MoRefs, phases)
+job_journal = JobJournal(config["JOB_JOURNAL_PATH"])
+
 
 @app.route("/get_demo_mode", methods=["GET"])
 def get_demo_mode():
@@ -57,6 +73,8 @@ def toggle_demo_mode():
     """Toggle demo mode"""
     global DEMO_MODE
     DEMO_MODE = not DEMO_MODE
+    # Cached inventory belongs to the previous mode (mock vs real vCenter)
+    inventory_cache.invalidate()
     app.logger.info(f"Demo mode {'enabled' if DEMO_MODE else 'disabled'}")
     response = jsonify({"demo_mode": DEMO_MODE})
     response.headers['Content-Type'] = 'application/json; charset=utf-8'
@@ -70,8 +88,21 @@ logging.basicConfig(
     handlers=[logging.FileHandler("vm_provisioning.log"), logging.StreamHandler()],
 )
 
-# Thread-safe queue for log messages
-log_queue = queue.Queue()
+# Broadcast log channels: one per provisioning job, plus one per user for other tasks
+log_bus = LogBus(
+    capacity=config["LOG_BUS_CAPACITY"],
+    retention=config["LOG_BUS_RETENTION"],
+    memory_limit=config["LOG_BUS_MEMORY_LIMIT"],
+    spill_dir=config["LOG_SPILL_DIR"] or None,
+    max_channels=config["LOG_BUS_MAX_CHANNELS"],
+)
+
+
+def _user_channel():
+    return f"user:{session.get('username')}"
+
+# Job channels a session remembers as its own for /stream (demo jobs are not journaled)
+SESSION_LOG_JOBS = 20
 
 # In-memory storage for demo (use database in production)
 users = {
@@ -91,6 +122,13 @@ MOCK_TEMPLATES = [
     "Windows-10-Template",
 ]
 
+# Powered-on VMs offered as instant-clone parents
+MOCK_INSTANT_CLONE_PARENTS = [
+    "ci-worker-parent-ubuntu22",
+    "ci-worker-parent-rhel9",
+    "ci-worker-parent-windows2022",
+]
+
 MOCK_DATACENTERS = ["DataCenter-Primary", "DataCenter-DR", "DataCenter-Development"]
 
 MOCK_CLUSTERS = {
@@ -121,6 +159,24 @@ def validate_ip(ip):
     return re.match(pattern, ip) is not None
 
 
+def validate_ipv6(ip):
+    """Validate IPv6 address format"""
+    try:
+        ipaddress.IPv6Address(ip)
+    except ValueError:
+        return False
+    return True
+
+
+def validate_ip_spec(spec):
+    """Validate a bulk NIC entry: an IPv4 address, optionally with /prefix or /netmask"""
+    try:
+        ipaddress.IPv4Interface(spec)
+    except ValueError:
+        return False
+    return validate_ip(spec.split("/", 1)[0])
+
+
 def validate_hostname(hostname):
     """Validate hostname format"""
     pattern = r"^[a-zA-Z0-9]([a-zA-Z0-9\-]{0,61}[a-zA-Z0-9])?(\.[a-zA-Z0-9]([a-zA-Z0-9\-]{0,61}[a-zA-Z0-9])?)*$"
@@ -159,6 +215,11 @@ def mock_get_networks(vcenter_host, vcenter_user, vcenter_pass, datacenter_name)
 def mock_get_nic_count(vcenter_host, vcenter_user, vcenter_pass, template_name):
     """Mock function to return NIC count"""
     time.sleep(0.2)
+    return mock_template_nic_count(template_name)
+
+
+def mock_template_nic_count(template_name):
+    """NIC count of a mock template"""
     # Different templates have different NIC counts
     if "Windows" in template_name:
         return 2
@@ -170,6 +231,53 @@ def mock_get_nic_count(vcenter_host, vcenter_user, vcenter_pass, template_name):
         return 2  # Default for others
 
 
+def mock_get_inventory_bootstrap(vcenter_host, vcenter_user, vcenter_pass):
+    """Mock function to return the provision page inventory in one document"""
+    time.sleep(0.5)
+    if vcenter_host == "error.vcenter.com":
+        raise Exception("Mock Connection Error: Could not reach vCenter host.")
+    return {
+        "templates": [
+            {"name": name, "nic_count": mock_template_nic_count(name)}
+            for name in sorted(MOCK_TEMPLATES)
+        ],
+        "datacenters": [
+            {
+                "name": dc,
+                "clusters": sorted(MOCK_CLUSTERS.get(dc, ["Default-Cluster"])),
+                "networks": sorted(MOCK_NETWORKS.get(dc, ["Default-Network"])),
+            }
+            for dc in sorted(MOCK_DATACENTERS)
+        ],
+    }
+
+
+def mock_discover_datacenter_resources(vcenter_host, vcenter_user, vcenter_pass, datacenter_names):
+    """Mock function to return per-datacenter clusters, networks, datastores and resource pools"""
+    time.sleep(0.3)  # Fetched concurrently, so one delay covers every datacenter
+    resources = {}
+    for dc in datacenter_names:
+        clusters = sorted(MOCK_CLUSTERS.get(dc, ["Default-Cluster"]))
+        resources[dc] = {
+            "clusters": clusters,
+            "networks": sorted(MOCK_NETWORKS.get(dc, ["Default-Network"])),
+            "datastores": [f"{dc}-datastore1", f"{dc}-datastore2", f"{dc}-SSD-Storage"],
+            "resource_pools": ["Resources"] + [f"{cluster}-Pool" for cluster in clusters],
+        }
+    return resources
+
+
+def mock_get_instant_clone_parents(vcenter_host, vcenter_user, vcenter_pass):
+    """Mock function to return powered-on VMs usable as instant-clone parents"""
+    time.sleep(0.3)
+    if vcenter_host == "error.vcenter.com":
+        raise Exception("Mock Connection Error: Could not reach vCenter host.")
+    return [
+        {"name": name, "nic_count": 2 if "windows" in name else 1}
+        for name in sorted(MOCK_INSTANT_CLONE_PARENTS)
+    ]
+
+
 def mock_provision_vms(
     vcenter_host,
     vcenter_user,
@@ -185,8 +293,17 @@ def mock_provision_vms(
     timeout_seconds=None,
     individual_nodes_data=None,
     hostname_prefix=None,
+    clone_mode="full",
+    resource_pool=None,
+    emit=None,
 ):
     import random
+
+    def emit_event(event_type, **data):
+        if emit:
+            emit(event_type, data)
+
+    clone_method = {"linked": "Linked clone", "instant": "Instant clone"}.get(clone_mode, "Full clone")
     logger(f"🚀 DEMO: Starting VM provisioning...")
     logger(f"📋 Template: {template}")
     logger(f"📋 Prefix: {prefix}")
@@ -194,6 +311,8 @@ def mock_provision_vms(
     logger(f"📋 Datacenter: {datacenter_name}")
     logger(f"📋 Cluster: {cluster_name}")
     logger(f"📋 Network: {network_name}")
+    logger(f"📋 Clone mode: {clone_method}")
+    logger(f"📋 Resource pool: {resource_pool or 'cluster root pool'}")
 
     vms = []
     logger(f"🔍 DEBUG: individual_nodes_data={individual_nodes_data}")
@@ -207,6 +326,7 @@ def mock_provision_vms(
             vm_name = node.get('name', f"{prefix}{i:02d}")
             hostname = node.get('hostname', vm_name)
             ips = node.get('ips', {})
+            emit_event("vm.started", name=vm_name, hostname=hostname, index=i, total=len(individual_nodes_data))
             logger(f"🚀 Starting VM {i}/{len(individual_nodes_data)}: {vm_name}")
             logger(f"📋 Validating configuration for {vm_name}")
             logger(f"   • Hostname: {hostname}")
@@ -214,11 +334,15 @@ def mock_provision_vms(
             logger(f"   • Datacenter: {datacenter_name}")
             logger(f"   • Cluster: {cluster_name}")
             logger(f"\n💾 Cloning template for {vm_name}")
+            logger(f"   • Clone method: {clone_method}")
             for pct in [25, 50, 75, 100]:
+                emit_event("vm.clone_progress", name=vm_name, progress=pct)
                 logger(f"📈 Clone progress: {pct}% - VM {vm_name}")
                 time.sleep(random.uniform(0.5, 1.0))
+            emit_event("vm.cloned", name=vm_name)
             logger(f"✅ VM {vm_name} cloned successfully")
             time.sleep(random.uniform(0.8, 1.5))
+            emit_event("vm.customized", name=vm_name, hostname=hostname, ips=[ip for ip in ips.values() if ip])
             logger(f"⚙️ Applying customization for {vm_name}")
             logger(f"   • Setting hostname: {hostname}")
             if ips:
@@ -233,6 +357,7 @@ def mock_provision_vms(
             else:
                 logger(f"   • Network: DHCP automatic assignment")
             time.sleep(random.uniform(0.8, 1.5))
+            emit_event("vm.powered_on", name=vm_name)
             logger(f"🟢 VM {vm_name} powered on successfully")
             time.sleep(random.uniform(0.8, 1.5))
             logger(f"✅ Guest OS boot completed - VM {vm_name} ready")
@@ -249,15 +374,27 @@ def mock_provision_vms(
                 'ips': ips_string,
             }
             vms.append(vm_data)
+            emit_event("vm.ready", **vm_data)
             # Send VM data in JSON format for frontend parsing
             import json
             vm_json = json.dumps(vm_data, ensure_ascii=False)
             logger(f"VM{len(vms)}: {vm_json}")
     else:
         logger(f"📦 Bulk provisioning mode: {count} VMs with prefix '{prefix}'")
+        # Same allocator as production, so demo jobs show the addresses a real job would get
+        try:
+            from .vm_provision import plan_bulk_ips
+        except ImportError:  # app loaded as a top-level module
+            from vm_provision import plan_bulk_ips
+        ip_rows, ip_networks = plan_bulk_ips(ip_map or {}, count)
+        for nic_idx, network in enumerate(ip_networks):
+            if network is not None:
+                logger(f"🧮 NIC{nic_idx + 1}: {count} addresses allocated in {network}")
         for i in range(1, count + 1):
             vm_name = f"{prefix}{i:02d}"
             hostname = f"{hostname_prefix}{i:02d}" if hostname_prefix else vm_name
+            vm_ips = {f"net{n}": ip for n, ip in enumerate(ip_rows[i - 1], 1) if ip}
+            emit_event("vm.started", name=vm_name, hostname=hostname, index=i, total=count)
             logger(f"🚀 Starting VM {i}/{count}: {vm_name}")
             logger(f"📋 Validating configuration for {vm_name}")
             logger(f"   • Hostname: {hostname}")
@@ -265,28 +402,30 @@ def mock_provision_vms(
             logger(f"   • Datacenter: {datacenter_name}")
             logger(f"   • Cluster: {cluster_name}")
             logger(f"\n💾 Cloning template for {vm_name}")
+            logger(f"   • Clone method: {clone_method}")
             for pct in [25, 50, 75, 100]:
+                emit_event("vm.clone_progress", name=vm_name, progress=pct)
                 logger(f"📈 Clone progress: {pct}% - VM {vm_name}")
                 time.sleep(random.uniform(0.5, 1.0))
+            emit_event("vm.cloned", name=vm_name)
             logger(f"✅ VM {vm_name} cloned successfully")
             time.sleep(random.uniform(0.8, 1.5))
+            emit_event("vm.customized", name=vm_name, hostname=hostname, ips=list(vm_ips.values()))
             logger(f"⚙️ Applying customization for {vm_name}")
             time.sleep(random.uniform(0.8, 1.5))
             logger(f"🌐 Detecting network zones for {vm_name}")
-            if ip_map:
-                for nic, ip in ip_map.items():
+            if vm_ips:
+                for nic, ip in vm_ips.items():
                     logger(f"   • {nic.upper()}: {ip}")
             else:
                 logger(f"   • Network: DHCP mode")
             time.sleep(random.uniform(0.8, 1.5))
+            emit_event("vm.powered_on", name=vm_name)
             logger(f"🟢 VM {vm_name} powered on successfully")
             time.sleep(random.uniform(0.8, 1.5))
             logger(f"✅ Guest OS boot completed - VM {vm_name} ready")
             # Convert IPs object to string for display
-            ips_string = '-'
-            if ip_map and isinstance(ip_map, dict):
-                ip_values = [ip for ip in ip_map.values() if ip]
-                ips_string = ', '.join(ip_values) if ip_values else 'DHCP'
+            ips_string = ', '.join(vm_ips.values()) if vm_ips else 'DHCP'
             
             vm_data = {
                 'name': vm_name,
@@ -295,11 +434,13 @@ def mock_provision_vms(
                 'ips': ips_string,
             }
             vms.append(vm_data)
+            emit_event("vm.ready", **vm_data)
             # Send VM data in JSON format for frontend parsing
             import json
             vm_json = json.dumps(vm_data, ensure_ascii=False)
             logger(f"VM{len(vms)}: {vm_json}")
     completion_msg = f"DEMO: Provisioned {len(vms)} VMs successfully!"
+    emit_event("job.completed", succeeded=len(vms), failed=0, total=len(vms), message=completion_msg)
     logger(f"\n🎉 {completion_msg}")
     logger(f"🔍 DEBUG: Final vms list: {vms}")
     return {'vms': vms, 'message': completion_msg}
@@ -318,6 +459,10 @@ def get_current_functions():
             'get_clusters': mock_get_clusters,
             'get_networks': mock_get_networks,
             'get_nic_count': mock_get_nic_count,
+            'get_inventory_bootstrap': mock_get_inventory_bootstrap,
+            'discover_datacenter_resources': mock_discover_datacenter_resources,
+            'get_instant_clone_parents': mock_get_instant_clone_parents,
+            'inventory_sync_live': lambda vcenter_host, vcenter_user: False,
             'provision_vms': mock_provision_vms,
         }
     else:
@@ -331,6 +476,11 @@ def get_current_functions():
                 get_datacenters,
                 get_clusters,
                 get_networks,
+                get_inventory_bootstrap,
+                discover_datacenter_resources,
+                get_instant_clone_parents,
+                inventory_sync_live,
+                _split_host_port,
             )
             app.logger.info("Successfully loaded REAL vCenter functions")
             return {
@@ -339,30 +489,114 @@ def get_current_functions():
                 'get_clusters': get_clusters,
                 'get_networks': get_networks,
                 'get_nic_count': get_nic_count,
+                'get_inventory_bootstrap': get_inventory_bootstrap,
+                'discover_datacenter_resources': discover_datacenter_resources,
+                'get_instant_clone_parents': get_instant_clone_parents,
+                'inventory_sync_live': inventory_sync_live,
+                'split_host_port': _split_host_port,
                 'provision_vms': provision_vms,
                 # 'provision_vms_demo_mode': provision_vms_demo_mode  # REMOVED: only use in production troubleshooting
             }
         except Exception as e:
             app.logger.error(f"Error loading real vCenter functions: {e}, falling back to mock")
             raise Exception(f"Failed to load real vCenter functions: {e}")
-# Wrapper functions that dynamically select implementation
+# Wrapper functions that dynamically select implementation (served through inventory_cache)
+def _inventory_lookup(vcenter_host, vcenter_user, kind, arg, loader):
+    """
+    Serve an inventory lookup through inventory_cache, except while the
+    WaitForUpdatesEx sync index is live: it is already current within seconds,
+    so its answers must not be hidden behind the TTL cache
+    """
+    if get_current_functions()['inventory_sync_live'](vcenter_host, vcenter_user):
+        return loader()
+    return inventory_cache.get_or_load(vcenter_host, vcenter_user, kind, arg, loader)
+
+
 def get_template_names(vcenter_host, vcenter_user, vcenter_pass):
-    return get_current_functions()['get_template_names'](vcenter_host, vcenter_user, vcenter_pass)
+    return _inventory_lookup(
+        vcenter_host, vcenter_user, "templates", None,
+        lambda: get_current_functions()['get_template_names'](vcenter_host, vcenter_user, vcenter_pass),
+    )
 
 def get_datacenters(vcenter_host, vcenter_user, vcenter_pass):
-    return get_current_functions()['get_datacenters'](vcenter_host, vcenter_user, vcenter_pass)
+    return _inventory_lookup(
+        vcenter_host, vcenter_user, "datacenters", None,
+        lambda: get_current_functions()['get_datacenters'](vcenter_host, vcenter_user, vcenter_pass),
+    )
 
 def get_clusters(vcenter_host, vcenter_user, vcenter_pass, datacenter_name):
-    return get_current_functions()['get_clusters'](vcenter_host, vcenter_user, vcenter_pass, datacenter_name)
+    return _inventory_lookup(
+        vcenter_host, vcenter_user, "clusters", datacenter_name,
+        lambda: get_current_functions()['get_clusters'](vcenter_host, vcenter_user, vcenter_pass, datacenter_name),
+    )
 
 def get_networks(vcenter_host, vcenter_user, vcenter_pass, datacenter_name):
-    return get_current_functions()['get_networks'](vcenter_host, vcenter_user, vcenter_pass, datacenter_name)
+    return _inventory_lookup(
+        vcenter_host, vcenter_user, "networks", datacenter_name,
+        lambda: get_current_functions()['get_networks'](vcenter_host, vcenter_user, vcenter_pass, datacenter_name),
+    )
 
 def get_nic_count(vcenter_host, vcenter_user, vcenter_pass, template_name):
-    return get_current_functions()['get_nic_count'](vcenter_host, vcenter_user, vcenter_pass, template_name)
-
-def provision_vms(vcenter_host, vcenter_user, vcenter_pass, template, prefix, count, datacenter_name, cluster_name, network_name, ip_map, logger=print, individual_nodes_data=None):
-    return get_current_functions()['provision_vms'](vcenter_host, vcenter_user, vcenter_pass, template, prefix, count, datacenter_name, cluster_name, network_name, ip_map, logger, individual_nodes_data)
+    return _inventory_lookup(
+        vcenter_host, vcenter_user, "nic_count", template_name,
+        lambda: get_current_functions()['get_nic_count'](vcenter_host, vcenter_user, vcenter_pass, template_name),
+    )
+
+def get_inventory_bootstrap(vcenter_host, vcenter_user, vcenter_pass):
+    return _inventory_lookup(
+        vcenter_host, vcenter_user, "bootstrap", None,
+        lambda: get_current_functions()['get_inventory_bootstrap'](vcenter_host, vcenter_user, vcenter_pass),
+    )
+
+def discover_datacenter_resources(vcenter_host, vcenter_user, vcenter_pass, datacenter_names):
+    names = tuple(sorted(set(datacenter_names)))
+    return _inventory_lookup(
+        vcenter_host, vcenter_user, "datacenter_resources", names,
+        lambda: get_current_functions()['discover_datacenter_resources'](vcenter_host, vcenter_user, vcenter_pass, list(names)),
+    )
+
+def get_instant_clone_parents(vcenter_host, vcenter_user, vcenter_pass):
+    # Not cached: power states change too often for the inventory TTLs
+    return get_current_functions()['get_instant_clone_parents'](vcenter_host, vcenter_user, vcenter_pass)
+
+def provision_vms(vcenter_host, vcenter_user, vcenter_pass, template, prefix, count, datacenter_name, cluster_name, network_name, ip_map, logger=print, individual_nodes_data=None, **kwargs):
+    # Pass options by keyword: the real and mock implementations differ after `logger`
+    return get_current_functions()['provision_vms'](vcenter_host, vcenter_user, vcenter_pass, template, prefix, count, datacenter_name, cluster_name, network_name, ip_map, logger=logger, individual_nodes_data=individual_nodes_data, **kwargs)
+
+
+def run_provision_job(job_id, vcenter_host, vcenter_user, vcenter_pass, params, logger, emit=None, resume_vms=None):
+    """Run a production provisioning job, journaling its plan and per-VM phases"""
+    global last_provision_vms
+    vm_results = []
+    try:
+        result = provision_vms(
+            vcenter_host,
+            vcenter_user,
+            vcenter_pass,
+            params["template"],
+            params["prefix"],
+            params["count"],
+            params["datacenter"],
+            params["cluster"],
+            params["network"],
+            params["ip_map"],
+            logger=logger,
+            timeout_seconds=30,
+            individual_nodes_data=params.get("individual_nodes_data"),
+            clone_mode=params.get("clone_mode"),
+            vm_results=vm_results,
+            placement_policy=params.get("placement_policy"),
+            resource_pool_name=params.get("resource_pool"),
+            journal=job_journal.recorder(job_id),
+            resume_vms=resume_vms,
+            emit=emit,
+        )
+    except Exception as e:
+        job_journal.set_status(job_id, "failed", str(e))
+        raise
+    job_journal.set_status(job_id, "completed", result)
+    last_provision_vms = vm_results
+    return result
 
 
 @app.route("/", methods=["GET", "POST"])
@@ -472,14 +706,17 @@ def vcenter_login():
         try:
             if not DEMO_MODE:
                 # In Production Mode, validate host format and attempt real vCenter connection
-                if not validate_hostname(vcenter_host) and not validate_ip(vcenter_host):
+                # An optional ":port" suffix is allowed (e.g. a local vcsim on 127.0.0.1:8989,
+                # or [::1]:8989 for IPv6); parsed the same way the session pool connects
+                current_functions = get_current_functions()
+                host_part, _ = current_functions['split_host_port'](vcenter_host)
+                if not (validate_hostname(host_part) or validate_ip(host_part) or validate_ipv6(host_part)):
                     return jsonify({
                         "error": "Invalid vCenter host format. Please enter a valid hostname or IP address.",
                         "status": "error"
                     }), 400
                 
                 # Use dynamic function resolver for production mode
-                current_functions = get_current_functions()
                 template_func = current_functions['get_template_names']
                 
                 # This will attempt REAL vCenter connection and should fail with wrong credentials
@@ -959,11 +1196,22 @@ def provision():
         print(
             f"Received POST request to /provision from {session.get('username')}"
         )  # Debug print on server console
+        # Every request gets its own log channel; the browser subscribes with the returned job_id
+        job_id = uuid.uuid4().hex[:12]
+        job_log = log_bus.publisher(job_id)
+        job_emit = log_bus.emitter(job_id)
         try:
             template = request.form.get("template", "").strip()
             datacenter = request.form.get("datacenter", "").strip()
             cluster = request.form.get("cluster", "").strip()
             network = request.form.get("network", "").strip()
+            clone_mode = request.form.get("clone_mode", "full").strip() or "full"
+            if clone_mode not in ("full", "linked", "instant"):
+                raise ValueError("Clone mode must be 'full', 'linked' or 'instant'")
+            placement_policy = request.form.get("placement_policy", "").strip() or None
+            if placement_policy and placement_policy not in ("most-free", "round-robin", "weighted"):
+                raise ValueError("Placement policy must be 'most-free', 'round-robin' or 'weighted'")
+            resource_pool = request.form.get("resource_pool", "").strip() or None
 
             # Check if individual configuration is enabled
             is_individual_config = request.form.get("individualConfig") == "on"
@@ -975,11 +1223,11 @@ def provision():
                 if not individual_nodes_data_str:
                     raise ValueError("Individual node configuration data is missing.")
                 individual_nodes_data = json.loads(individual_nodes_data_str)
-                log_queue.put(
+                job_log(
                     f"ℹ️ Backend received individual node config: {len(individual_nodes_data)} nodes."
                 )
                 for i, node in enumerate(individual_nodes_data):
-                    log_queue.put(
+                    job_log(
                         f"   Node {i+1}: Name='{node.get('name')}', Hostname='{node.get('hostname')}', IPs={node.get('ips')}"
                     )
                 prefix = "individual-vm"
@@ -1003,8 +1251,8 @@ def provision():
                 for i in range(1, 10):
                     ip_val = request.form.get(f"ip{i}", "").strip()
                     if ip_val:
-                        if not validate_ip(ip_val):
-                            raise ValueError(f"Invalid IP address format for NIC {i}")
+                        if not validate_ip_spec(ip_val):
+                            raise ValueError(f"Invalid IP address or CIDR for NIC {i}")
                         ip_map[f"net{i}"] = ip_val
             if not all([template, datacenter, cluster, network]):
                 raise ValueError(
@@ -1014,6 +1262,24 @@ def provision():
             vcenter_user = session["vcenter_user"]
             vcenter_pass = session["vcenter_pass"]
             username = session.get("username", "Unknown")
+            # /stream?job= serves only jobs this session started or owns in the journal
+            session["log_jobs"] = (session.get("log_jobs", []) + [job_id])[-SESSION_LOG_JOBS:]
+
+            # Add initial logs to the job channel for immediate streaming
+            job_log("🚀 Starting VM provisioning...")
+            job_log("📋 Configuration validated successfully")
+
+            # Add network zone information if available
+            network_zones = request.form.get("networkZones")
+            if network_zones:
+                try:
+                    zones_data = json.loads(network_zones)
+                    job_log("🌐 Detected network zones:")
+                    for nic, zone in zones_data.items():
+                        job_log(f"   {nic.upper()}: {zone}")
+                except:
+                    pass
+
             if DEMO_MODE:
                 # ใช้ queue เพื่อรับผลลัพธ์จาก thread
                 result_queue = queue.Queue()
@@ -1026,9 +1292,9 @@ def provision():
                             if is_individual_config and individual_nodes_data:
                                 individual_data = individual_nodes_data
                             
-                            # สร้าง logger function ที่ส่ง message ไปยัง queue
+                            # สร้าง logger function ที่ส่ง message ไปยัง channel ของ job
                             def logger_wrapper(message):
-                                log_queue.put(str(message))
+                                job_log(str(message))
                             
                             # Debug: Log parameters
                             logger_wrapper(f"🔍 DEBUG: count={count}, is_individual_config={is_individual_config}")
@@ -1051,6 +1317,9 @@ def provision():
                                 logger=logger_wrapper,  # ใช้ wrapper function แทน
                                 individual_nodes_data=individual_data,
                                 hostname_prefix=hostname_prefix if not is_individual_config else None,
+                                clone_mode=clone_mode,
+                                resource_pool=resource_pool,
+                                emit=job_emit,
                             )
                                 logger_wrapper(f"🔍 DEBUG: demo_provision_func completed successfully")
                                 # ส่ง vms array กลับมาทาง queue
@@ -1074,10 +1343,12 @@ def provision():
                                 logger_wrapper(f"🔍 DEBUG: Exception details: {type(e).__name__}: {str(e)}")
                         else:
                             result_queue.put([])
-                            log_queue.put("⚠️ Demo provision function not found")
+                            job_log("⚠️ Demo provision function not found")
                     except Exception as e:
                         result_queue.put([])
-                        log_queue.put(f"❌ Task error: {str(e)}")
+                        job_log(f"❌ Task error: {str(e)}")
+                    finally:
+                        log_bus.close(job_id)
                 t = threading.Thread(target=task, daemon=True)
                 t.start()
                 # ไม่ต้อง join() เพื่อให้ frontend ได้รับ log ก่อน
@@ -1091,66 +1362,57 @@ def provision():
                     vms_result = result_queue.get()
                     last_provision_vms = vms_result
                 threading.Thread(target=save_vms_result, daemon=True).start()
-                return jsonify({'status': 'success', 'message': 'Provisioning started! This is simulated data.'})
             else:
                 # Production mode - use real provisioning with per-VM customization
-                try:
-                    log_queue.put("🏭 PRODUCTION MODE: Starting real VM provisioning with per-VM customization")
-                    result = provision_vms(
-                        vcenter_host,
-                        vcenter_user,
-                        vcenter_pass,
-                        template,
-                        prefix,
-                        count,
-                        datacenter,
-                        cluster,
-                        network,
-                        ip_map,
-                        logger=log_queue.put,
-                        timeout_seconds=30,
-                        individual_nodes_data=individual_nodes_data if is_individual_config else None,
-                    )
-                    log_queue.put(f"✅ {result}")
-                    logging.info(
-                        f"Provisioning completed by {username}: {result}"
-                    )
-                except Exception as e:
-                    # Enhanced error handling for production provisioning
-                    error_msg = str(e)
-                    log_queue.put(f"❌ ERROR: Provisioning failed: {error_msg}")
-                    if "customiz" in error_msg.lower():
-                        log_queue.put("❗ Guest Customization failed. Please check that your template has VMware Tools installed, network config is not hardcoded, and OS is supported by vSphere Guest Customization.")
-                    elif "vcenter" in error_msg.lower() or "connect" in error_msg.lower():
-                        log_queue.put("❗ vCenter connection or resource discovery failed. Please check vCenter credentials, network, and permissions.")
-                    else:
-                        log_queue.put("❗ An unexpected error occurred during provisioning. Please check logs and vSphere tasks for more details.")
-                    logging.error(f"Provisioning failed for user {username}: {error_msg}")
-                    return jsonify({"status": "error", "message": error_msg}), 500
-            # Add initial logs to queue for immediate streaming
-            log_queue.put("🚀 Starting VM provisioning...")
-            log_queue.put("📋 Configuration validated successfully")
-            
-            # Add network zone information if available
-            network_zones = request.form.get("networkZones")
-            if network_zones:
-                try:
-                    zones_data = json.loads(network_zones)
-                    log_queue.put("🌐 Detected network zones:")
-                    for nic, zone in zones_data.items():
-                        log_queue.put(f"   {nic.upper()}: {zone}")
-                except:
-                    pass
+                # The journal keeps the job parameters but never the vCenter password
+                job_params = {
+                    "template": template,
+                    "prefix": prefix,
+                    "count": count,
+                    "datacenter": datacenter,
+                    "cluster": cluster,
+                    "network": network,
+                    "ip_map": ip_map,
+                    "individual_nodes_data": individual_nodes_data if is_individual_config else None,
+                    "clone_mode": clone_mode,
+                    "placement_policy": placement_policy,
+                    "resource_pool": resource_pool,
+                }
+                job_journal.create_job(vcenter_host, vcenter_user, job_params, username=username, job_id=job_id)
+
+                def production_task():
+                    try:
+                        job_log("🏭 PRODUCTION MODE: Starting real VM provisioning with per-VM customization")
+                        job_log(f"🗂️ Job ID: {job_id}")
+                        result = run_provision_job(
+                            job_id, vcenter_host, vcenter_user, vcenter_pass, job_params, job_log, emit=job_emit
+                        )
+                        job_log(f"✅ {result}")
+                        logging.info(
+                            f"Provisioning completed by {username}: {result}"
+                        )
+                    except Exception as e:
+                        # Enhanced error handling for production provisioning
+                        error_msg = str(e)
+                        job_log(f"❌ ERROR: Provisioning failed: {error_msg}")
+                        if "customiz" in error_msg.lower():
+                            job_log("❗ Guest Customization failed. Please check that your template has VMware Tools installed, network config is not hardcoded, and OS is supported by vSphere Guest Customization.")
+                        elif "vcenter" in error_msg.lower() or "connect" in error_msg.lower():
+                            job_log("❗ vCenter connection or resource discovery failed. Please check vCenter credentials, network, and permissions.")
+                        else:
+                            job_log("❗ An unexpected error occurred during provisioning. Please check logs and vSphere tasks for more details.")
+                        logging.error(f"Provisioning failed for user {username}: {error_msg}")
+                    finally:
+                        log_bus.close(job_id)
+
+                threading.Thread(target=production_task, daemon=True).start()
 
             message = "Provisioning started! Check the logs below."
             if DEMO_MODE:
                 message = "DEMO: Provisioning started! This is simulated data."
 
             # Return JSON response for successful POST via AJAX
-            return (
-                jsonify({"message": message, "status": "success"}),
-                202,
-            )  # 202 Accepted
+            return jsonify({"message": message, "status": "success", "job_id": job_id}), 202  # 202 Accepted
 
         except ValueError as e:
             # Return JSON error for AJAX requests
@@ -1159,7 +1421,7 @@ def provision():
         except Exception as e:
             # Top-level error handler for form/validation errors
             error_msg = str(e)
-            log_queue.put(f"❌ ERROR: {error_msg}")
+            job_log(f"❌ ERROR: {error_msg}")
             return jsonify({"status": "error", "message": error_msg}), 400
 
     # For GET requests, render the HTML template
@@ -1176,21 +1438,98 @@ def logout():
     return redirect(url_for("login"))
 
 
+def _data_frame(event_id, lines):
+    """One SSE frame carrying several log lines; the client splits event.data on newlines"""
+    id_line = f"id: {event_id}\n" if event_id is not None else ""
+    return id_line + "".join(f"data: {line}\n" for line in lines) + "\n"
+
+
 @app.route("/stream")
 def stream():
+    if not session.get("username"):
+        return jsonify({"error": "Not authenticated"}), 401
+
+    # ?job=<id> follows one provisioning job; without it the user's own channel
+    job_id = request.args.get("job", "").strip()
+    if job_id and job_id not in session.get("log_jobs", []) and not _own_job(job_journal.get_job(job_id)):
+        return jsonify({"error": "Job not found"}), 404
+    channel = log_bus.channel(job_id, create=False) if job_id else log_bus.channel(_user_channel())
+    if channel is None:
+        return jsonify({"error": "Job not found"}), 404
+
+    # Every event carries its sequence number as the SSE id; a reconnecting
+    # EventSource sends the last one back and the stream replays from there
+    last_event_id = request.headers.get("Last-Event-ID") or request.args.get("last_event_id", "")
+    start = 0
+    if last_event_id.strip().isdigit():
+        start = int(last_event_id) + 1
+        if start > channel.next_seq:
+            start = 0  # the id is from an older channel with the same name
+
+    batch_window = config["STREAM_BATCH_WINDOW_MS"] / 1000.0
+    batch_max_lines = max(1, config["STREAM_BATCH_MAX_LINES"])
+    heartbeat = config["STREAM_HEARTBEAT_SECONDS"]
+
+    def read_batch(cursor, timeout):
+        """Read [(seq, message)] from the channel; returns (entries, next cursor, dropped)"""
+        messages, cursor, dropped = channel.read(cursor, timeout=timeout)
+        return list(enumerate(messages, cursor - len(messages))), cursor, dropped
+
+    def format_frames(entries, dropped):
+        # Consecutive log lines share one frame (one "data:" line each, the last
+        # line's id); typed lifecycle events keep their own named frames
+        frames = []
+        lines = [f"⚠️ {dropped} log lines were dropped (log buffer limit reached)"] if dropped else []
+        last_id = None
+        for event_id, message in entries:
+            if isinstance(message, dict):
+                if lines:
+                    frames.append(_data_frame(last_id, lines))
+                    lines = []
+                # Typed lifecycle event: named SSE event with a JSON payload
+                payload = json.dumps(message["data"], ensure_ascii=False)
+                frames.append(f"id: {event_id}\nevent: {message['event']}\ndata: {payload}\n\n")
+                continue
+            # Escape newlines in the message for proper SSE format
+            lines.append(str(message).replace('\n', '\\n').replace('\r', '\\r'))
+            last_id = event_id
+            if len(lines) >= batch_max_lines:
+                frames.append(_data_frame(last_id, lines))
+                lines = []
+        if lines:
+            frames.append(_data_frame(last_id, lines))
+        return "".join(frames)
+
     def event_stream():
+        # Each subscriber reads the shared ring buffer from its own cursor
+        cursor = start
+        last_flush = 0.0
+        yield "retry: 3000\n\n"
         while True:
             try:
-                message = log_queue.get(timeout=30)
-                # Clean the message and ensure proper encoding
-                if message:
-                    # Escape newlines in the message for proper SSE format
-                    clean_message = str(message).replace('\n', '\\n').replace('\r', '\\r')
-                    yield f"data: {clean_message}\n\n"
-                else:
-                    yield f"data: \n\n"  # Keep connection alive
-            except queue.Empty:
-                yield f"data: \n\n"  # Keep connection alive with ping
+                entries, cursor, dropped = read_batch(cursor, heartbeat)
+                if not entries and not dropped:
+                    if channel.closed and cursor >= channel.next_seq:
+                        # Job finished and everything was sent: tell the browser not to reconnect
+                        yield "event: end\ndata: {}\n\n"
+                        break
+                    yield ": keep-alive\n\n"  # Only sent when the stream is idle
+                    continue
+                # While messages keep coming, collect them for up to the batch window;
+                # the first message after a quiet period goes out immediately
+                if batch_window and time.time() - last_flush < batch_window:
+                    deadline = time.time() + batch_window
+                    while len(entries) < batch_max_lines:
+                        remaining = deadline - time.time()
+                        if remaining <= 0:
+                            break
+                        more, cursor, more_dropped = read_batch(cursor, remaining)
+                        if not more and not more_dropped:
+                            break
+                        entries.extend(more)
+                        dropped += more_dropped
+                last_flush = time.time()
+                yield format_frames(entries, dropped)
             except Exception as e:
                 logging.error(f"EventSource error: {e}")
                 yield f"data: ❌ Stream error: {e}\n\n"
@@ -1199,7 +1538,7 @@ def stream():
     response = Response(event_stream(), mimetype="text/event-stream")
     response.headers['Cache-Control'] = 'no-cache'
     response.headers['Access-Control-Allow-Origin'] = '*'
-    response.headers['Access-Control-Allow-Headers'] = 'Cache-Control'
+    response.headers['Access-Control-Allow-Headers'] = 'Cache-Control, Last-Event-ID'
     return response
 
 
@@ -1283,6 +1622,28 @@ def get_networks_api():
         return response, 500
 
 
+@app.route("/api/datacenter-resources")
+def get_datacenter_resources_api():
+    datacenters = request.args.getlist("datacenter")
+    if not session.get("username") or not datacenters:
+        return jsonify({"error": "Not authenticated or missing datacenter"}), 401
+
+    try:
+        resources = discover_datacenter_resources(
+            session["vcenter_host"],
+            session["vcenter_user"],
+            session["vcenter_pass"],
+            datacenters,
+        )
+        response = jsonify({"datacenters": resources})
+        response.headers['Content-Type'] = 'application/json; charset=utf-8'
+        return response
+    except Exception as e:
+        response = jsonify({"error": str(e)})
+        response.headers['Content-Type'] = 'application/json; charset=utf-8'
+        return response, 500
+
+
 @app.route("/api/nic-count")
 def get_nic_count_api():
     template = request.args.get("template")
@@ -1305,6 +1666,161 @@ def get_nic_count_api():
         return response, 500
 
 
+@app.route("/api/inventory/bootstrap")
+def get_inventory_bootstrap_api():
+    if not session.get("username"):
+        return jsonify({"error": "Not authenticated"}), 401
+
+    try:
+        inventory = get_inventory_bootstrap(
+            session["vcenter_host"], session["vcenter_user"], session["vcenter_pass"]
+        )
+        response = jsonify(inventory)
+        response.headers['Content-Type'] = 'application/json; charset=utf-8'
+        return response
+    except Exception as e:
+        response = jsonify({"error": str(e)})
+        response.headers['Content-Type'] = 'application/json; charset=utf-8'
+        return response, 500
+
+
+@app.route("/api/instant-clone-parents")
+def get_instant_clone_parents_api():
+    if not session.get("username"):
+        return jsonify({"error": "Not authenticated"}), 401
+
+    try:
+        parents = get_instant_clone_parents(
+            session["vcenter_host"], session["vcenter_user"], session["vcenter_pass"]
+        )
+        response = jsonify({"parents": parents})
+        response.headers['Content-Type'] = 'application/json; charset=utf-8'
+        return response
+    except Exception as e:
+        response = jsonify({"error": str(e)})
+        response.headers['Content-Type'] = 'application/json; charset=utf-8'
+        return response, 500
+
+
+@app.route("/api/inventory/cache", methods=["GET"])
+def get_inventory_cache_stats():
+    if not session.get("username"):
+        return jsonify({"error": "Not authenticated"}), 401
+
+    response = jsonify(inventory_cache.stats())
+    response.headers['Content-Type'] = 'application/json; charset=utf-8'
+    return response
+
+
+@app.route("/api/inventory/cache/invalidate", methods=["POST"])
+def invalidate_inventory_cache():
+    if not session.get("username"):
+        return jsonify({"error": "Not authenticated"}), 401
+
+    # Optional filters: kind (templates, datacenters, clusters, networks, nic_count, bootstrap,
+    # datacenter_resources) and arg
+    kind = request.values.get("kind") or None
+    arg = request.values.get("arg") or None
+    removed = inventory_cache.invalidate(
+        host=session.get("vcenter_host"), kind=kind, arg=arg
+    )
+    app.logger.info(f"Inventory cache invalidated by {session['username']}: {removed} entries (kind={kind}, arg={arg})")
+    response = jsonify({"status": "success", "invalidated": removed})
+    response.headers['Content-Type'] = 'application/json; charset=utf-8'
+    return response
+
+
+@app.route("/api/logs/stats", methods=["GET"])
+def get_log_bus_stats():
+    if not session.get("username"):
+        return jsonify({"error": "Not authenticated"}), 401
+
+    response = jsonify(log_bus.stats())
+    response.headers['Content-Type'] = 'application/json; charset=utf-8'
+    return response
+
+
+def _own_job(job):
+    """Jobs are visible to sessions logged in to the same vCenter as the same user"""
+    return (
+        job is not None
+        and job["vcenter_host"] == session.get("vcenter_host")
+        and job["vcenter_user"] == session.get("vcenter_user")
+    )
+
+
+@app.route("/api/jobs")
+def list_jobs_api():
+    if not session.get("username"):
+        return jsonify({"error": "Not authenticated"}), 401
+
+    jobs = [job for job in job_journal.list_jobs() if _own_job(job)]
+    response = jsonify({"jobs": jobs})
+    response.headers['Content-Type'] = 'application/json; charset=utf-8'
+    return response
+
+
+@app.route("/api/jobs/<job_id>")
+def get_job_api(job_id):
+    if not session.get("username"):
+        return jsonify({"error": "Not authenticated"}), 401
+
+    job = job_journal.get_job(job_id)
+    if not _own_job(job):
+        return jsonify({"error": "Job not found"}), 404
+    response = jsonify(job)
+    response.headers['Content-Type'] = 'application/json; charset=utf-8'
+    return response
+
+
+@app.route("/api/jobs/<job_id>/resume", methods=["POST"])
+def resume_job_api(job_id):
+    if not session.get("username"):
+        return jsonify({"error": "Not authenticated"}), 401
+    if DEMO_MODE:
+        return jsonify({"error": "Jobs can only be resumed in production mode"}), 400
+
+    job = job_journal.get_job(job_id)
+    if not _own_job(job):
+        return jsonify({"error": "Job not found"}), 404
+    if job["status"] not in RESUMABLE_STATUSES:
+        return jsonify({"error": f"Job is {job['status']} and cannot be resumed"}), 409
+    # Atomic claim: of two concurrent resume requests only one gets the job
+    if not job_journal.claim_for_resume(job_id):
+        return jsonify({"error": "Job is already being resumed"}), 409
+
+    # Credentials come from the current session; the journal never stores the password
+    job_log = log_bus.publisher(job_id)
+    job_log(f"♻️ Resuming provisioning job {job_id}")
+    vcenter_host = session["vcenter_host"]
+    vcenter_user = session["vcenter_user"]
+    vcenter_pass = session["vcenter_pass"]
+    username = session["username"]
+
+    def resume_task():
+        try:
+            result = run_provision_job(
+                job_id,
+                vcenter_host,
+                vcenter_user,
+                vcenter_pass,
+                job["params"],
+                job_log,
+                emit=log_bus.emitter(job_id),
+                resume_vms=job["vms"] or None,
+            )
+            job_log(f"✅ {result}")
+            logging.info(f"Job {job_id} resumed by {username}: {result}")
+        except Exception as e:
+            job_log(f"❌ ERROR: Resume failed: {str(e)}")
+            logging.error(f"Resume of job {job_id} failed for user {username}: {str(e)}")
+        finally:
+            log_bus.close(job_id)
+
+    threading.Thread(target=resume_task, daemon=True).start()
+    return jsonify({"status": "success", "message": f"Resuming job {job_id}", "job_id": job_id}), 202
+
+
 @app.route('/favicon.ico')
 def favicon():
     return send_from_directory(
@@ -1326,6 +1842,8 @@ def docker_deploy():
         try:
             import subprocess
             import json
+
+            deploy_log = log_bus.publisher(_user_channel())
             
             # Get GitHub token from form
             github_token = request.form.get('github_token', '')
@@ -1337,24 +1855,24 @@ def docker_deploy():
                 })
             
             # Step 1: Commit and push code
-            log_queue.put("🚀 Starting Docker deployment process...")
+            deploy_log("🚀 Starting Docker deployment process...")
             
             # Git operations
             try:
                 subprocess.run(['git', 'add', '.'], check=True, capture_output=True)
-                log_queue.put("✅ Added all changes to git")
+                deploy_log("✅ Added all changes to git")
                 
                 subprocess.run(['git', 'commit', '-m', 'Auto-deploy: Update VM Provisioning Program'], check=True, capture_output=True)
-                log_queue.put("✅ Committed changes")
+                deploy_log("✅ Committed changes")
                 
                 subprocess.run(['git', 'push', 'origin', 'main'], check=True, capture_output=True)
-                log_queue.put("✅ Pushed code to GitHub")
+                deploy_log("✅ Pushed code to GitHub")
             except subprocess.CalledProcessError as e:
-                log_queue.put(f"❌ Git operation failed: {e}")
+                deploy_log(f"❌ Git operation failed: {e}")
                 return jsonify({'status': 'error', 'message': f'Git operation failed: {e}'})
             
             # Step 2: Build Docker images
-            log_queue.put("🔨 Building Docker images...")
+            deploy_log("🔨 Building Docker images...")
             
             try:
                 # Build VM Provisioning Program
@@ -1362,7 +1880,7 @@ def docker_deploy():
                     'docker', 'build', '-t', 
                     'ghcr.io/goasutlor/vmprovisioning_from_template/vm-provisioning:latest', '.'
                 ], check=True, capture_output=True, text=True)
-                log_queue.put("✅ VM Provisioning Program built successfully")
+                deploy_log("✅ VM Provisioning Program built successfully")
                 
                 # Build Template Pre-Check Script
                 result = subprocess.run([
@@ -1370,14 +1888,14 @@ def docker_deploy():
                     'ghcr.io/goasutlor/vmprovisioning_from_template/template-precheck:latest', 
                     '-f', 'Dockerfile.precheck', '.'
                 ], check=True, capture_output=True, text=True)
-                log_queue.put("✅ Template Pre-Check Script built successfully")
+                deploy_log("✅ Template Pre-Check Script built successfully")
                 
             except subprocess.CalledProcessError as e:
-                log_queue.put(f"❌ Docker build failed: {e}")
+                deploy_log(f"❌ Docker build failed: {e}")
                 return jsonify({'status': 'error', 'message': f'Docker build failed: {e}'})
             
             # Step 3: Login to GHCR
-            log_queue.put("🔐 Logging in to GitHub Container Registry...")
+            deploy_log("🔐 Logging in to GitHub Container Registry...")
             
             try:
                 login_process = subprocess.Popen([
@@ -1386,37 +1904,37 @@ def docker_deploy():
                 stdout, stderr = login_process.communicate(input=github_token.encode())
                 
                 if login_process.returncode != 0:
-                    log_queue.put(f"❌ GHCR login failed: {stderr.decode()}")
+                    deploy_log(f"❌ GHCR login failed: {stderr.decode()}")
                     return jsonify({'status': 'error', 'message': 'GHCR login failed'})
                 
-                log_queue.put("✅ Logged in to GHCR successfully")
+                deploy_log("✅ Logged in to GHCR successfully")
                 
             except Exception as e:
-                log_queue.put(f"❌ GHCR login error: {e}")
+                deploy_log(f"❌ GHCR login error: {e}")
                 return jsonify({'status': 'error', 'message': f'GHCR login error: {e}'})
             
             # Step 4: Push Docker images
-            log_queue.put("📦 Pushing Docker images to GHCR...")
+            deploy_log("📦 Pushing Docker images to GHCR...")
             
             try:
                 # Push VM Provisioning Program
                 result = subprocess.run([
                     'docker', 'push', 'ghcr.io/goasutlor/vmprovisioning_from_template/vm-provisioning:latest'
                 ], check=True, capture_output=True, text=True)
-                log_queue.put("✅ VM Provisioning Program pushed successfully")
+                deploy_log("✅ VM Provisioning Program pushed successfully")
                 
                 # Push Template Pre-Check Script
                 result = subprocess.run([
                     'docker', 'push', 'ghcr.io/goasutlor/vmprovisioning_from_template/template-precheck:latest'
                 ], check=True, capture_output=True, text=True)
-                log_queue.put("✅ Template Pre-Check Script pushed successfully")
+                deploy_log("✅ Template Pre-Check Script pushed successfully")
                 
             except subprocess.CalledProcessError as e:
-                log_queue.put(f"❌ Docker push failed: {e}")
+                deploy_log(f"❌ Docker push failed: {e}")
                 return jsonify({'status': 'error', 'message': f'Docker push failed: {e}'})
             
-            log_queue.put("🎉 Docker deployment completed successfully!")
-            log_queue.put("📦 Images available at: https://github.com/goasutlor/vmprovisioning_from_template/packages")
+            deploy_log("🎉 Docker deployment completed successfully!")
+            deploy_log("📦 Images available at: https://github.com/goasutlor/vmprovisioning_from_template/packages")
             
             return jsonify({
                 'status': 'success',
@@ -1424,7 +1942,7 @@ def docker_deploy():
             })
             
         except Exception as e:
-            log_queue.put(f"❌ Deployment failed: {e}")
+            deploy_log(f"❌ Deployment failed: {e}")
             return jsonify({'status': 'error', 'message': f'Deployment failed: {e}'})
     
     return render_template('docker_deploy.html')
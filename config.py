@@ -1,5 +1,10 @@
 import os
 
+
+def _env_bool(name, default):
+    return str(os.environ.get(name, default)).lower() in ["true", "1", "yes", "on", "y"]
+
+
 # Default configuration
 config = {
     "DEMO_MODE": str(os.environ.get("DEMO_MODE", "false")).lower()
@@ -12,4 +17,71 @@ config = {
         os.environ.get("SESSION_LIFETIME", "1800")
     ),  # 30 minutes in seconds
     "LOG_FILE": os.environ.get("LOG_FILE", "vm_provisioning.log"),
+    # Inventory cache (TTLs in seconds, 0 disables caching for that kind)
+    "INVENTORY_CACHE_TTL": int(os.environ.get("INVENTORY_CACHE_TTL", "300")),
+    "INVENTORY_CACHE_TTLS": {
+        "templates": int(os.environ.get("INVENTORY_CACHE_TTL_TEMPLATES", "300")),
+        "datacenters": int(os.environ.get("INVENTORY_CACHE_TTL_DATACENTERS", "900")),
+        "clusters": int(os.environ.get("INVENTORY_CACHE_TTL_CLUSTERS", "600")),
+        "networks": int(os.environ.get("INVENTORY_CACHE_TTL_NETWORKS", "600")),
+        "nic_count": int(os.environ.get("INVENTORY_CACHE_TTL_NIC_COUNT", "30")),
+        "bootstrap": int(os.environ.get("INVENTORY_CACHE_TTL_BOOTSTRAP", "60")),
+        "datacenter_resources": int(
+            os.environ.get("INVENTORY_CACHE_TTL_DATACENTER_RESOURCES", "300")
+        ),
+    },
+    "INVENTORY_CACHE_MAX_ENTRIES": int(
+        os.environ.get("INVENTORY_CACHE_MAX_ENTRIES", "512")
+    ),
+    # Seconds a request waits for another request's in-flight load of the same key
+    "INVENTORY_CACHE_WAIT_TIMEOUT": int(os.environ.get("INVENTORY_CACHE_WAIT_TIMEOUT", "60")),
+    # SQLite file recording provisioning jobs for resume after a restart
+    "JOB_JOURNAL_PATH": os.environ.get("JOB_JOURNAL_PATH", "provision_jobs.db"),
+    # Per-job log channels: lines and characters kept in memory per channel (older
+    # lines spill to LOG_SPILL_DIR), seconds a finished job's log is kept
+    "LOG_BUS_CAPACITY": int(os.environ.get("LOG_BUS_CAPACITY", "2000")),
+    "LOG_BUS_MEMORY_LIMIT": int(os.environ.get("LOG_BUS_MEMORY_LIMIT", "262144")),
+    "LOG_BUS_RETENTION": int(os.environ.get("LOG_BUS_RETENTION", "3600")),
+    "LOG_BUS_MAX_CHANNELS": int(os.environ.get("LOG_BUS_MAX_CHANNELS", "200")),
+    "LOG_SPILL_DIR": os.environ.get("LOG_SPILL_DIR", "job_logs"),
+    # /stream framing: log lines arriving within the window (ms) share one SSE frame,
+    # up to the line cap; idle streams get a keep-alive comment every heartbeat seconds
+    "STREAM_BATCH_WINDOW_MS": int(os.environ.get("STREAM_BATCH_WINDOW_MS", "100")),
+    "STREAM_BATCH_MAX_LINES": int(os.environ.get("STREAM_BATCH_MAX_LINES", "200")),
+    "STREAM_HEARTBEAT_SECONDS": int(os.environ.get("STREAM_HEARTBEAT_SECONDS", "30")),
+    # vCenter-side tunables used by vm_provision.py (seconds unless noted)
+    "VCENTER": {
+        # Session pool
+        "SESSION_POOL_MAX_SIZE": int(os.environ.get("VCENTER_SESSION_POOL_MAX_SIZE", "8")),
+        "SESSION_IDLE_TIMEOUT": int(os.environ.get("VCENTER_SESSION_IDLE_TIMEOUT", "900")),
+        "SESSION_KEEPALIVE_INTERVAL": int(os.environ.get("VCENTER_SESSION_KEEPALIVE_INTERVAL", "300")),
+        "SESSION_HEALTH_CHECK_INTERVAL": int(
+            os.environ.get("VCENTER_SESSION_HEALTH_CHECK_INTERVAL", "60")
+        ),
+        # Inventory paging, background sync and name index
+        "INVENTORY_PAGE_SIZE": int(os.environ.get("VCENTER_INVENTORY_PAGE_SIZE", "500")),
+        "INVENTORY_SYNC": _env_bool("VCENTER_INVENTORY_SYNC", "true"),
+        "INVENTORY_SYNC_WAIT_SECONDS": int(os.environ.get("VCENTER_INVENTORY_SYNC_WAIT_SECONDS", "30")),
+        "INVENTORY_SYNC_RETRY_SECONDS": int(os.environ.get("VCENTER_INVENTORY_SYNC_RETRY_SECONDS", "10")),
+        "NAME_INDEX_TTL": int(os.environ.get("VCENTER_NAME_INDEX_TTL", "60")),
+        "DISCOVERY_MAX_WORKERS": int(os.environ.get("VCENTER_DISCOVERY_MAX_WORKERS", "8")),
+        # Clone scheduler
+        "CLONE_MAX_IN_FLIGHT": int(os.environ.get("VCENTER_CLONE_MAX_IN_FLIGHT", "8")),
+        "CLONE_MAX_PER_DATASTORE": int(os.environ.get("VCENTER_CLONE_MAX_PER_DATASTORE", "4")),
+        "CLONE_MAX_PER_HOST": int(os.environ.get("VCENTER_CLONE_MAX_PER_HOST", "2")),
+        "CLONE_POLL_INTERVAL": float(os.environ.get("VCENTER_CLONE_POLL_INTERVAL", "1")),
+        "TASK_MONITOR_WAIT_SECONDS": int(os.environ.get("VCENTER_TASK_MONITOR_WAIT_SECONDS", "30")),
+        # Linked clones and datastore-local template replicas
+        "LINKED_CLONE_SNAPSHOT": os.environ.get("VCENTER_LINKED_CLONE_SNAPSHOT", "linked-clone-base"),
+        "TEMPLATE_REPLICAS": _env_bool("VCENTER_TEMPLATE_REPLICAS", "false"),
+        "REPLICA_MIN_USES": int(os.environ.get("VCENTER_REPLICA_MIN_USES", "2")),
+        "REPLICA_MIN_FREE_PERCENT": float(os.environ.get("VCENTER_REPLICA_MIN_FREE_PERCENT", "15")),
+        "REPLICA_MAX_WORKERS": int(os.environ.get("VCENTER_REPLICA_MAX_WORKERS", "2")),
+        "REPLICA_CHECK_SECONDS": int(os.environ.get("VCENTER_REPLICA_CHECK_SECONDS", "300")),
+        # Placement and IP addressing
+        "PLACEMENT_POLICY": os.environ.get("VCENTER_PLACEMENT_POLICY", "most-free"),
+        "IP_RESERVED": os.environ.get("VCENTER_IP_RESERVED", ""),
+        "IP_CONFLICT_CHECK": _env_bool("VCENTER_IP_CONFLICT_CHECK", "true"),
+        "IP_INDEX_TTL": int(os.environ.get("VCENTER_IP_INDEX_TTL", "120")),
+    },
 }
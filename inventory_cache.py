@@ -0,0 +1,104 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+
+class InventoryCache:
+    """
+    In-memory snapshot cache for vCenter inventory lookups
+
+    - Entries are keyed per vCenter (host, user) plus kind and argument, e.g.
+      ("vc01", "admin", "clusters", "DC1")
+    - Each kind has its own TTL; the cache is a size-bounded LRU
+    - Concurrent misses for the same key share a single load; waiters give up
+      after wait_timeout seconds instead of stalling behind a hung vCenter call
+    - Callers get deep copies, so mutating a result never changes the cache
+    """
+
+    def __init__(self, ttls=None, default_ttl=300, max_entries=512, wait_timeout=60):
+        self.ttls = dict(ttls or {})
+        self.default_ttl = default_ttl
+        self.max_entries = max(1, max_entries)
+        self.wait_timeout = wait_timeout
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._loading = {}  # key -> threading.Event for in-flight loads
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _ttl(self, kind):
+        return self.ttls.get(kind, self.default_ttl)
+
+    def get_or_load(self, host, user, kind, arg, loader):
+        """Return the cached value for the key, calling loader() on a miss"""
+        key = (host, user, kind, arg)
+        while True:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry and entry[0] > time.time():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return copy.deepcopy(entry[1])
+                if entry:
+                    del self._entries[key]
+                pending = self._loading.get(key)
+                if pending is None:
+                    pending = threading.Event()
+                    self._loading[key] = pending
+                    self.misses += 1
+                    break
+            # Another request is loading this key; wait and re-check
+            if not pending.wait(self.wait_timeout):
+                raise TimeoutError(
+                    f"Inventory lookup {kind} for {host} still loading after {self.wait_timeout}s"
+                )
+
+        try:
+            value = loader()
+        except Exception:
+            with self._lock:
+                del self._loading[key]
+            pending.set()
+            raise
+
+        with self._lock:
+            ttl = self._ttl(kind)
+            if ttl > 0:
+                self._entries[key] = (time.time() + ttl, value)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+            del self._loading[key]
+        pending.set()
+        return copy.deepcopy(value)
+
+    def invalidate(self, host=None, kind=None, arg=None):
+        """Drop cached entries matching host/kind/arg (None matches everything)"""
+        with self._lock:
+            keys = [
+                key
+                for key in self._entries
+                if (host is None or key[0] == host)
+                and (kind is None or key[2] == kind)
+                and (arg is None or key[3] == arg)
+            ]
+            for key in keys:
+                del self._entries[key]
+        return len(keys)
+
+    def stats(self):
+        """Return hit/miss counters and current size"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+                "ttls": dict(self.ttls, default=self.default_ttl),
+            }
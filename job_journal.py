@@ -0,0 +1,226 @@
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    status TEXT NOT NULL,
+    username TEXT,
+    vcenter_host TEXT NOT NULL,
+    vcenter_user TEXT NOT NULL,
+    params TEXT NOT NULL,
+    message TEXT,
+    owner TEXT
+);
+CREATE TABLE IF NOT EXISTS job_vms (
+    job_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    config TEXT NOT NULL,
+    phase TEXT NOT NULL,
+    task_moid TEXT,
+    error TEXT,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (job_id, name)
+);
+CREATE TABLE IF NOT EXISTS job_events (
+    job_id TEXT NOT NULL,
+    name TEXT,
+    phase TEXT NOT NULL,
+    detail TEXT,
+    at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS job_events_job ON job_events (job_id, at);
+"""
+
+# Job statuses; 'interrupted' marks jobs that were running when the process stopped
+RESUMABLE_STATUSES = ("interrupted", "failed")
+
+
+# Unique per process: pids and hostnames are reused (pid 1 in every container), so
+# only a token minted at import tells this process apart from the one that died
+PROCESS_TOKEN = uuid.uuid4().hex
+
+
+def process_owner():
+    """Identify this process as "<hostname>/<pid>/<token>" for the jobs it runs"""
+    return f"{socket.gethostname()}/{os.getpid()}/{PROCESS_TOKEN}"
+
+
+class JobJournal:
+    """
+    Durable record of provisioning jobs in a local SQLite file
+
+    - A job stores its parameters (never the vCenter password), the per-VM plan,
+      each VM's clone task MoRef and every phase transition
+    - Writes are committed immediately (WAL mode), so a restart loses nothing
+      that had already been reported
+    - Every running job records the process that owns it; when the journal is
+      opened, 'running' jobs owned by any other process are marked 'interrupted'
+      and can be resumed (the journal file belongs to a single app process)
+    - claim_for_resume() moves a job back to 'running' atomically, so a job is
+      resumed at most once
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.owner = process_owner()
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        with self._lock, self._db:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.executescript(SCHEMA)
+            columns = {row["name"] for row in self._db.execute("PRAGMA table_info(jobs)")}
+            if "owner" not in columns:
+                self._db.execute("ALTER TABLE jobs ADD COLUMN owner TEXT")
+        self.mark_interrupted()
+
+    def mark_interrupted(self):
+        """Mark 'running' jobs owned by another process as 'interrupted'; returns their ids"""
+        with self._lock, self._db:
+            rows = self._db.execute(
+                "SELECT id FROM jobs WHERE status = 'running' AND owner IS NOT ?", (self.owner,)
+            ).fetchall()
+            orphaned = [row["id"] for row in rows]
+            now = time.time()
+            for job_id in orphaned:
+                self._db.execute(
+                    "UPDATE jobs SET status = 'interrupted', updated_at = ?"
+                    " WHERE id = ? AND status = 'running'",
+                    (now, job_id),
+                )
+                self._event(job_id, None, "interrupted")
+        return orphaned
+
+    def _event(self, job_id, name, phase, detail=None):
+        self._db.execute(
+            "INSERT INTO job_events (job_id, name, phase, detail, at) VALUES (?, ?, ?, ?, ?)",
+            (job_id, name, phase, detail, time.time()),
+        )
+
+    def create_job(self, vcenter_host, vcenter_user, params, username=None, job_id=None):
+        """Record a new running job and return its id (generated unless given)"""
+        job_id = job_id or uuid.uuid4().hex[:12]
+        now = time.time()
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT INTO jobs (id, created_at, updated_at, status, username, vcenter_host,"
+                " vcenter_user, params, owner) VALUES (?, ?, ?, 'running', ?, ?, ?, ?, ?)",
+                (job_id, now, now, username, vcenter_host, vcenter_user,
+                 json.dumps(params, ensure_ascii=False), self.owner),
+            )
+            self._event(job_id, None, "running")
+        return job_id
+
+    def set_status(self, job_id, status, message=None):
+        with self._lock, self._db:
+            self._db.execute(
+                "UPDATE jobs SET status = ?, message = ?, updated_at = ? WHERE id = ?",
+                (status, message, time.time(), job_id),
+            )
+            self._event(job_id, None, status, message)
+
+    def claim_for_resume(self, job_id, message="resumed"):
+        """
+        Move a resumable job back to 'running', owned by this process
+        Returns False when the job is not (or no longer) in a resumable status, e.g.
+        because a concurrent request claimed it first.
+        """
+        placeholders = ", ".join("?" for _ in RESUMABLE_STATUSES)
+        with self._lock, self._db:
+            cursor = self._db.execute(
+                "UPDATE jobs SET status = 'running', message = ?, owner = ?, updated_at = ?"
+                f" WHERE id = ? AND status IN ({placeholders})",
+                (message, self.owner, time.time(), job_id, *RESUMABLE_STATUSES),
+            )
+            if cursor.rowcount != 1:
+                return False
+            self._event(job_id, None, "running", message)
+        return True
+
+    def record_plan(self, job_id, vm_configs):
+        """Store the planned VMs (name, hostname, IPs); VMs already in the plan are kept"""
+        now = time.time()
+        with self._lock, self._db:
+            for seq, vmc in enumerate(vm_configs):
+                config = {"hostname": vmc["hostname"], "ips": vmc["ips"]}
+                self._db.execute(
+                    "INSERT OR IGNORE INTO job_vms (job_id, seq, name, config, phase, updated_at)"
+                    " VALUES (?, ?, ?, ?, 'planned', ?)",
+                    (job_id, seq, vmc["name"], json.dumps(config), now),
+                )
+
+    def set_vm_phase(self, job_id, name, phase, task_moid=None, error=None):
+        with self._lock, self._db:
+            self._db.execute(
+                "UPDATE job_vms SET phase = ?, task_moid = COALESCE(?, task_moid), error = ?,"
+                " updated_at = ? WHERE job_id = ? AND name = ?",
+                (phase, task_moid, error, time.time(), job_id, name),
+            )
+            self._event(job_id, name, phase, error or task_moid)
+
+    def recorder(self, job_id):
+        """Return the object provision_vms reports its plan and phases to"""
+        return JobRecorder(self, job_id)
+
+    def _job_dict(self, row):
+        job = dict(row)
+        job["params"] = json.loads(job["params"])
+        return job
+
+    def list_jobs(self, limit=50):
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT j.*, "
+                " (SELECT COUNT(*) FROM job_vms v WHERE v.job_id = j.id) AS vm_count,"
+                " (SELECT COUNT(*) FROM job_vms v WHERE v.job_id = j.id"
+                "   AND v.phase = 'succeeded') AS succeeded"
+                " FROM jobs j ORDER BY j.created_at DESC LIMIT ?",
+                (limit,),
+            ).fetchall()
+        return [self._job_dict(row) for row in rows]
+
+    def get_job(self, job_id):
+        """Return the job with its VMs (plan order) and phase history, or None"""
+        with self._lock:
+            row = self._db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            vms = self._db.execute(
+                "SELECT * FROM job_vms WHERE job_id = ? ORDER BY seq", (job_id,)
+            ).fetchall()
+            events = self._db.execute(
+                "SELECT name, phase, detail, at FROM job_events WHERE job_id = ? ORDER BY at",
+                (job_id,),
+            ).fetchall()
+        job = self._job_dict(row)
+        job["vms"] = []
+        for vm in vms:
+            vm = dict(vm)
+            vm.update(json.loads(vm.pop("config")))
+            job["vms"].append(vm)
+        job["events"] = [dict(event) for event in events]
+        return job
+
+
+class JobRecorder:
+    """Journal calls for one job, in the shape provision_vms expects"""
+
+    def __init__(self, journal, job_id):
+        self.journal = journal
+        self.job_id = job_id
+
+    def plan(self, vm_configs):
+        self.journal.record_plan(self.job_id, vm_configs)
+
+    def phase(self, name, phase, task_moid=None, error=None):
+        self.journal.set_vm_phase(self.job_id, name, phase, task_moid=task_moid, error=error)
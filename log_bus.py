@@ -0,0 +1,282 @@
+import bisect
+import itertools
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import deque
+
+# One spill-file checkpoint (sequence number -> byte offset) per this many lines
+SPILL_INDEX_EVERY = 256
+
+
+def _entry_size(entry):
+    """Characters a buffered entry (log line or typed event) accounts for"""
+    if isinstance(entry, dict):
+        return len(json.dumps(entry, ensure_ascii=False))
+    return len(entry)
+
+
+class LogChannel:
+    """
+    Ring buffer of one channel's log messages
+
+    Every message gets a sequence number; subscribers keep their own cursor (the
+    next sequence number they want), so any number of readers share one buffer.
+    Messages are log lines (str) or typed events ({"event": type, "data": {...}})
+    sharing one sequence, so both stay in order.
+
+    - Memory is capped by line count and by size (characters); older lines beyond
+      the cap are spilled to spill_path, or dropped when there is no spill file
+    - Readers that fall behind the in-memory window are served from the spill file
+    """
+
+    def __init__(self, name, capacity, memory_limit=None, spill_path=None):
+        self.name = name
+        self.capacity = capacity
+        self.memory_limit = memory_limit
+        self.spill_path = spill_path
+        self._buffer = deque()
+        self._buffer_size = 0
+        self._next_seq = 0
+        self._cond = threading.Condition()
+        self.closed = False
+        self.updated_at = time.time()
+        self.spilled = 0
+        self.dropped = 0
+        self._spill_file = None
+        self._spill_start = None  # first sequence number in the spill file
+        self._spill_next = None  # sequence number after the last spilled line
+        self._spill_index = []  # [(seq, offset)] checkpoints into the spill file
+
+    def _over_cap(self):
+        if len(self._buffer) > self.capacity:
+            return True
+        return bool(self.memory_limit) and self._buffer_size > self.memory_limit and len(self._buffer) > 1
+
+    def _evict(self):
+        message = self._buffer.popleft()
+        self._buffer_size -= _entry_size(message)
+        seq = self._next_seq - len(self._buffer) - 1
+        if self.spill_path and (self._spill_next is None or self._spill_next == seq):
+            try:
+                if self._spill_file is None:
+                    # Start a fresh file for a new channel; a resumed job appends to it
+                    self._spill_file = open(self.spill_path, "wb" if self._spill_start is None else "ab")
+                    if self._spill_start is None:
+                        self._spill_start = self._spill_next = seq
+                offset = self._spill_file.tell()
+                if (seq - self._spill_start) % SPILL_INDEX_EVERY == 0:
+                    self._spill_index.append((seq, offset))
+                self._spill_file.write((json.dumps(message, ensure_ascii=False) + "\n").encode("utf-8"))
+                self._spill_next = seq + 1
+                self.spilled += 1
+                return
+            except OSError as e:
+                logging.error(f"Log spill to {self.spill_path} failed, dropping older lines: {e}")
+                self.spill_path = None
+        self.dropped += 1
+
+    @property
+    def next_seq(self):
+        """Sequence number the next published message will get"""
+        return self._next_seq
+
+    def publish(self, message):
+        if not isinstance(message, dict):
+            message = str(message)
+        size = _entry_size(message)
+        with self._cond:
+            self._buffer.append(message)
+            self._buffer_size += size
+            self._next_seq += 1
+            while self._over_cap():
+                self._evict()
+            self.closed = False  # a resumed job publishes to its channel again
+            self.updated_at = time.time()
+            self._cond.notify_all()
+
+    def close(self):
+        """Mark the job finished; the channel stays readable until it is reaped"""
+        with self._cond:
+            self.closed = True
+            self.updated_at = time.time()
+            if self._spill_file:
+                self._spill_file.close()
+                self._spill_file = None
+            self._cond.notify_all()  # readers waiting at the end can finish
+
+    def discard(self):
+        """Close the channel and delete its spill file"""
+        self.close()
+        if self._spill_start is not None and self.spill_path:
+            try:
+                os.remove(self.spill_path)
+            except OSError:
+                pass
+
+    def _read_spill(self, cursor, spill_path, checkpoint, spill_next):
+        """
+        Return up to capacity spilled lines starting at cursor
+        Runs without the channel lock: checkpoint and spill_next are a snapshot taken
+        under it, and lines before spill_next are already flushed and never rewritten.
+        """
+        seq, offset = checkpoint
+        messages = []
+        with open(spill_path, "rb") as spill:
+            spill.seek(offset)
+            for line in spill:
+                if seq >= cursor:
+                    messages.append(json.loads(line))
+                    if len(messages) >= self.capacity:
+                        break
+                seq += 1
+                if seq >= spill_next:
+                    break
+        return messages
+
+    def _read_buffer(self, cursor, dropped):
+        """Serve cursor from the in-memory window (call with the lock held)"""
+        first_seq = self._next_seq - len(self._buffer)
+        if cursor < first_seq:
+            dropped += first_seq - cursor
+            cursor = first_seq
+        messages = list(itertools.islice(self._buffer, cursor - first_seq, None))
+        return messages, self._next_seq, dropped
+
+    def read(self, cursor, timeout=None):
+        """
+        Wait up to timeout for messages at or after cursor (or for the channel to close)
+        Returns (messages, next cursor, dropped) where dropped counts messages the
+        reader missed because they were no longer in memory or on disk. The
+        messages carry sequence numbers next cursor - len(messages) onwards.
+        Spill-file reads happen outside the lock so slow disks never block publishers.
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: self._next_seq > cursor or self.closed, timeout)
+            first_seq = self._next_seq - len(self._buffer)
+            dropped = 0
+            if not (
+                cursor < first_seq and self._spill_start is not None
+                and self.spill_path and cursor < self._spill_next
+            ):
+                return self._read_buffer(cursor, dropped)
+            if cursor < self._spill_start:
+                dropped = self._spill_start - cursor
+                cursor = self._spill_start
+            spill_path = self.spill_path
+            spill_next = self._spill_next
+            pos = bisect.bisect_right(self._spill_index, (cursor, float("inf"))) - 1
+            checkpoint = self._spill_index[pos]
+            try:
+                if self._spill_file:
+                    self._spill_file.flush()
+            except OSError as e:
+                logging.error(f"Flushing log spill {spill_path} failed: {e}")
+                return self._read_buffer(cursor, dropped)
+        try:
+            messages = self._read_spill(cursor, spill_path, checkpoint, spill_next)
+            return messages, cursor + len(messages), dropped
+        except (OSError, ValueError) as e:
+            logging.error(f"Reading log spill {spill_path} failed: {e}")
+        with self._cond:
+            return self._read_buffer(cursor, dropped)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "lines": self._next_seq,
+                "buffered": len(self._buffer),
+                "buffered_size": self._buffer_size,
+                "spilled": self.spilled,
+                "dropped": self.dropped,
+                "closed": self.closed,
+            }
+
+
+class LogBus:
+    """
+    Broadcast log channels, one per provisioning job
+
+    - publish() appends to a channel; subscribers read from their own cursor, so
+      every observer sees every message of the job and nothing from other jobs
+    - Each channel keeps at most capacity lines / memory_limit characters in
+      memory and spills older lines to <spill_dir>/<channel>.log
+    - Closed channels are dropped (with their spill file) retention seconds after
+      their last message, or earlier once there are more than max_channels
+    """
+
+    def __init__(self, capacity=2000, retention=3600, memory_limit=None, spill_dir=None, max_channels=200):
+        self.capacity = max(1, capacity)
+        self.retention = retention
+        self.memory_limit = memory_limit
+        self.spill_dir = spill_dir
+        self.max_channels = max(1, max_channels)
+        self._channels = {}
+        self._lock = threading.Lock()
+
+    def _reap(self):
+        cutoff = time.time() - self.retention
+        closed = sorted(
+            (channel.updated_at, name) for name, channel in self._channels.items() if channel.closed
+        )
+        excess = len(self._channels) - self.max_channels
+        for updated_at, name in closed:
+            if updated_at >= cutoff and excess <= 0:
+                break
+            self._channels.pop(name).discard()
+            excess -= 1
+
+    def _spill_path(self, name):
+        if not self.spill_dir:
+            return None
+        try:
+            os.makedirs(self.spill_dir, exist_ok=True)
+        except OSError as e:
+            logging.error(f"Cannot create log spill directory {self.spill_dir}: {e}")
+            return None
+        return os.path.join(self.spill_dir, re.sub(r"[^A-Za-z0-9_.-]", "_", name) + ".log")
+
+    def channel(self, name, create=True):
+        with self._lock:
+            self._reap()
+            channel = self._channels.get(name)
+            if channel is None and create:
+                channel = LogChannel(name, self.capacity, self.memory_limit, self._spill_path(name))
+                self._channels[name] = channel
+            return channel
+
+    def publish(self, name, message):
+        self.channel(name).publish(message)
+
+    def publisher(self, name):
+        """Return a logger(message) callable bound to the channel"""
+        return self.channel(name).publish
+
+    def emitter(self, name):
+        """Return an emit(event_type, data) callable publishing typed events to the channel"""
+        channel = self.channel(name)
+
+        def emit(event_type, data):
+            channel.publish({"event": event_type, "data": data})
+
+        return emit
+
+    def close(self, name):
+        channel = self.channel(name, create=False)
+        if channel:
+            channel.close()
+
+    def stats(self):
+        """Return per-channel buffer, spill and drop counters"""
+        with self._lock:
+            channels = dict(self._channels)
+        return {
+            "capacity": self.capacity,
+            "memory_limit": self.memory_limit,
+            "spill_dir": self.spill_dir,
+            "max_channels": self.max_channels,
+            "channels": {name: channel.stats() for name, channel in channels.items()},
+        }
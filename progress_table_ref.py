@@ -163,6 +163,32 @@ def parse_log_message_for_vm_updates(message):
     return None, None, None
 
 
+# Typed lifecycle events (SSE "event:" types) -> (status, progress)
+VM_EVENT_STATES = {
+    'vm.started': ('provisioning', 0),
+    'vm.clone_progress': ('provisioning', None),
+    'vm.cloned': ('provisioning', 75),
+    'vm.customized': ('provisioning', 80),
+    'vm.powered_on': ('provisioning', 90),
+    'vm.ready': ('success', 100),
+    'vm.failed': ('failed', None),
+}
+
+
+def apply_vm_event(event_type, data, vm_status_data):
+    """
+    Apply a typed VM lifecycle event (from /stream or provision_vms(emit=...))
+    Same result as parse_log_message_for_vm_updates, without matching log text
+    """
+    state = VM_EVENT_STATES.get(event_type)
+    if not state or not data.get('name'):
+        return
+    status, progress = state
+    if event_type == 'vm.clone_progress':
+        progress = data.get('progress')
+    update_vm_status(data['name'], status, progress, vm_status_data=vm_status_data)
+
+
 def demo_provision_with_progress_table():
     """
     Demo function showing how to properly handle progress table updates
@@ -0,0 +1,105 @@
+"""
+CloneScheduler concurrency limits and start failures, with tasks polled through task.info
+"""
+from types import SimpleNamespace
+
+import vm_provision
+
+
+class FakeTask:
+    """Task that reports running for a number of polls, then its final state"""
+
+    def __init__(self, polls=2, final_state="success", error=None):
+        self.polls = polls
+        self.final_state = final_state
+        self.error = error
+
+    @property
+    def info(self):
+        if self.polls > 0:
+            self.polls -= 1
+            return SimpleNamespace(state="running", progress=50, error=None)
+        return SimpleNamespace(state=self.final_state, progress=100, error=self.error)
+
+
+def moref(moid):
+    return SimpleNamespace(_moId=moid)
+
+
+def run_and_track(scheduler):
+    """Run the scheduler; return its events and the peak clones per datastore and host"""
+    events = []
+    running = {}
+    peak = {}
+    for event, job in scheduler.run():
+        events.append((event, job["name"]))
+        keys = [vm_provision._moid(job["datastore"]), vm_provision._moid(job["host"])]
+        if event == "started":
+            for key in filter(None, keys):
+                running[key] = running.get(key, 0) + 1
+                peak[key] = max(peak.get(key, 0), running[key])
+        elif event == "finished":
+            for key in filter(None, keys):
+                running[key] -= 1
+    return events, peak
+
+
+def test_scheduler_respects_per_datastore_and_per_host_limits():
+    scheduler = vm_provision.CloneScheduler(
+        max_in_flight=8, max_per_datastore=2, max_per_host=3, poll_interval=0
+    )
+    for idx in range(6):
+        scheduler.add(
+            f"vm{idx}", FakeTask, datastore=moref(f"ds-{idx % 2}"), host=moref("host-1")
+        )
+
+    events, peak = run_and_track(scheduler)
+
+    assert peak == {"ds-0": 2, "ds-1": 2, "host-1": 3}
+    assert sorted(name for event, name in events if event == "finished") == [
+        f"vm{idx}" for idx in range(6)
+    ]
+
+
+def test_busy_datastore_does_not_hold_up_other_jobs():
+    scheduler = vm_provision.CloneScheduler(max_in_flight=4, max_per_datastore=1, poll_interval=0)
+    scheduler.add("a1", FakeTask, datastore=moref("ds-a"))
+    scheduler.add("a2", FakeTask, datastore=moref("ds-a"))
+    scheduler.add("b1", FakeTask, datastore=moref("ds-b"))
+
+    events, _ = run_and_track(scheduler)
+
+    started = [name for event, name in events if event == "started"]
+    assert started.index("b1") < started.index("a2")
+
+
+def test_global_limit_caps_tasks_in_flight():
+    scheduler = vm_provision.CloneScheduler(max_in_flight=2, poll_interval=0)
+    in_flight = []
+    for idx in range(5):
+        scheduler.add(f"vm{idx}", FakeTask)
+
+    for event, job in scheduler.run():
+        in_flight.append(scheduler.in_flight)
+
+    assert max(in_flight) == 2
+
+
+def test_failed_start_takes_no_slot_and_the_rest_still_run():
+    def broken_start():
+        raise RuntimeError("name already in use")
+
+    scheduler = vm_provision.CloneScheduler(max_in_flight=1, poll_interval=0)
+    scheduler.add("bad", broken_start)
+    scheduler.add("good", FakeTask)
+    scheduler.add("failing", lambda: FakeTask(final_state="error", error="disk full"))
+
+    events, _ = run_and_track(scheduler)
+    jobs = {job["name"]: job for job in scheduler._jobs}
+
+    assert ("start_failed", "bad") in events
+    assert str(jobs["bad"]["error"]) == "name already in use"
+    assert jobs["good"]["state"] == "success"
+    assert jobs["failing"]["state"] == "error"
+    assert jobs["failing"]["task_error"] == "disk full"
+    assert [state for _, state, _ in jobs["good"]["transitions"]] == ["running", "success"]
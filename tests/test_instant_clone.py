@@ -0,0 +1,155 @@
+"""
+Instant-clone provisioning against local vCenter stand-ins
+
+- FakeVCenter answers the ViewManager / PropertyCollector calls at the SOAP stub,
+  so the real property-collector helpers run unchanged
+- The vcsim tests run the full provision_vms path against govmomi's vCenter
+  simulator; start one (vcsim -l 127.0.0.1:8989) and set VCSIM_HOST=127.0.0.1:8989
+"""
+import os
+from types import SimpleNamespace
+
+import pytest
+from pyVmomi import vim, vmodl
+
+import vm_provision
+
+
+class FakeVCenter:
+    """SOAP stub stand-in serving a fixed set of VMs ({moId: {property path: value}})"""
+
+    def __init__(self, vms):
+        self.vms = vms
+        root = vim.Folder("group-d1", self)
+        self.si = SimpleNamespace(
+            content=SimpleNamespace(
+                rootFolder=root,
+                viewManager=vim.view.ViewManager("ViewManager", self),
+                propertyCollector=vim.PropertyCollector("propertyCollector", self),
+            )
+        )
+
+    def InvokeMethod(self, mo, info, args):
+        if info.name == "CreateContainerView":
+            return vim.view.ContainerView("session[fake]view-1", self)
+        if info.name == "Destroy":
+            return None
+        if info.name == "RetrievePropertiesEx":
+            return self._retrieve(args[0][0])
+        raise NotImplementedError(info.name)
+
+    def _retrieve(self, spec):
+        if isinstance(spec.objectSet[0].obj, vim.view.ContainerView):
+            moids = list(self.vms)
+        else:
+            moids = [obj_spec.obj._moId for obj_spec in spec.objectSet]
+        path_set = spec.propSet[0].pathSet
+        objects = [
+            vmodl.query.PropertyCollector.ObjectContent(
+                obj=vim.VirtualMachine(moid, self),
+                propSet=[
+                    vmodl.DynamicProperty(name=path, val=self.vms[moid][path])
+                    for path in path_set
+                    if path in self.vms[moid]
+                ],
+            )
+            for moid in moids
+        ]
+        return vmodl.query.PropertyCollector.RetrieveResult(objects=objects)
+
+
+def fake_vm(name, template=False, power_state="poweredOn", nics=1):
+    return {
+        "name": name,
+        "config.template": template,
+        "runtime.powerState": power_state,
+        "config.hardware.device": vim.vm.device.VirtualDevice.Array(
+            [vim.vm.device.VirtualVmxnet3() for _ in range(nics)]
+        ),
+    }
+
+
+def test_instant_clone_parents_lists_powered_on_vms_only(monkeypatch):
+    fake = FakeVCenter({
+        "vm-1": fake_vm("ci-parent", nics=2),
+        "vm-2": fake_vm("rhel9-template", template=True, power_state="poweredOff"),
+        "vm-3": fake_vm("stopped-vm", power_state="poweredOff"),
+        "vm-4": fake_vm("app01"),
+    })
+    monkeypatch.setattr(vm_provision._session_pool, "_connect", lambda host, user, pwd: fake.si)
+
+    parents = vm_provision.get_instant_clone_parents("fake-vcenter.local", "user", "pass")
+
+    assert parents == [
+        {"name": "app01", "nic_count": 1},
+        {"name": "ci-parent", "nic_count": 2},
+    ]
+
+
+def test_check_instant_clone_parent_rejects_templates_and_stopped_vms():
+    def parent(template, power_state):
+        return SimpleNamespace(
+            name="parent", config=SimpleNamespace(template=template),
+            runtime=SimpleNamespace(powerState=power_state),
+        )
+
+    vm_provision.check_instant_clone_parent(parent(False, "poweredOn"))
+    with pytest.raises(ValueError, match="is a template"):
+        vm_provision.check_instant_clone_parent(parent(True, "poweredOff"))
+    with pytest.raises(ValueError, match="powered on"):
+        vm_provision.check_instant_clone_parent(parent(False, "suspended"))
+
+
+def test_instant_clone_spec_carries_identity_in_guestinfo():
+    blueprint = SimpleNamespace(nics=[
+        {"subnet_mask": "255.255.255.0", "gateway": "10.0.0.1"},
+        {"subnet_mask": "255.255.0.0", "gateway": None},
+    ])
+    location = vim.vm.RelocateSpec()
+
+    spec = vm_provision.build_instant_clone_spec(
+        None, "ci01", "ci01.lab", ["10.0.0.21", None], location,
+        logger=lambda message: None, blueprint=blueprint,
+    )
+
+    assert spec.name == "ci01"
+    assert spec.location is location
+    assert {option.key: option.value for option in spec.config} == {
+        "guestinfo.hostname": "ci01.lab",
+        "guestinfo.ipaddress1": "10.0.0.21",
+        "guestinfo.netmask1": "255.255.255.0",
+        "guestinfo.gateway1": "10.0.0.1",
+        "guestinfo.ipaddress2": "dhcp",
+    }
+
+
+VCSIM_HOST = os.environ.get("VCSIM_HOST")
+vcsim = pytest.mark.skipif(not VCSIM_HOST, reason="set VCSIM_HOST to run against vcsim")
+
+
+@vcsim
+def test_vcsim_instant_clone_parents():
+    names = [parent["name"] for parent in vm_provision.get_instant_clone_parents(VCSIM_HOST, "user", "pass")]
+    assert "DC0_C0_RP0_VM0" in names
+
+
+@vcsim
+def test_vcsim_provision_instant_clones():
+    results = []
+    vm_provision.provision_vms(
+        VCSIM_HOST, "user", "pass",
+        template="DC0_C0_RP0_VM0",
+        prefix="ic-test",
+        count=2,
+        datacenter_name="DC0",
+        cluster_name="DC0_C0",
+        network_name="VM Network",
+        ip_map={},
+        logger=lambda message: None,
+        clone_mode="instant",
+        vm_results=results,
+    )
+    assert sorted((vm["name"], vm["status"]) for vm in results) == [
+        ("ic-test01", "success"),
+        ("ic-test02", "success"),
+    ]
@@ -0,0 +1,131 @@
+"""
+InventoryCache TTLs, single-flight loading, LRU bound and invalidation
+"""
+import threading
+import time
+
+import pytest
+
+from inventory_cache import InventoryCache
+
+
+def test_hit_within_ttl_and_reload_after_expiry(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, "time", lambda: now[0])
+    cache = InventoryCache(ttls={"clusters": 60})
+    loads = []
+
+    def loader():
+        loads.append(now[0])
+        return ["Cluster-A"]
+
+    assert cache.get_or_load("vc", "admin", "clusters", "DC1", loader) == ["Cluster-A"]
+    now[0] += 59
+    cache.get_or_load("vc", "admin", "clusters", "DC1", loader)
+    now[0] += 2
+    cache.get_or_load("vc", "admin", "clusters", "DC1", loader)
+
+    assert loads == [1000.0, 1061.0]
+    assert cache.stats()["hits"] == 1
+
+
+def test_zero_ttl_disables_caching_for_that_kind():
+    cache = InventoryCache(ttls={"nic_count": 0})
+    loads = []
+
+    for _ in range(2):
+        cache.get_or_load("vc", "admin", "nic_count", "rhel9", lambda: loads.append(1) or 2)
+
+    assert len(loads) == 2
+    assert cache.stats()["entries"] == 0
+
+
+def test_results_are_copies():
+    cache = InventoryCache()
+    cache.get_or_load("vc", "admin", "templates", None, lambda: ["rhel9"]).append("changed")
+
+    assert cache.get_or_load("vc", "admin", "templates", None, lambda: []) == ["rhel9"]
+
+
+def test_concurrent_misses_share_one_load():
+    cache = InventoryCache()
+    release = threading.Event()
+    calls = []
+
+    def slow_loader():
+        calls.append(1)
+        release.wait(5)
+        return ["DC1"]
+
+    results = []
+    threads = [
+        threading.Thread(
+            target=lambda: results.append(
+                cache.get_or_load("vc", "admin", "datacenters", None, slow_loader)
+            )
+        )
+        for _ in range(5)
+    ]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.1)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(calls) == 1
+    assert results == [["DC1"]] * 5
+
+
+def test_waiters_time_out_behind_a_hung_load():
+    cache = InventoryCache(wait_timeout=0.1)
+    release = threading.Event()
+    loader_thread = threading.Thread(
+        target=cache.get_or_load,
+        args=("vc", "admin", "datacenters", None, lambda: release.wait(5)),
+    )
+    loader_thread.start()
+    time.sleep(0.05)
+    try:
+        with pytest.raises(TimeoutError):
+            cache.get_or_load("vc", "admin", "datacenters", None, lambda: [])
+    finally:
+        release.set()
+        loader_thread.join(5)
+
+
+def test_failed_load_is_not_cached():
+    cache = InventoryCache()
+
+    def failing():
+        raise ConnectionError("vCenter unreachable")
+
+    with pytest.raises(ConnectionError):
+        cache.get_or_load("vc", "admin", "templates", None, failing)
+
+    assert cache.get_or_load("vc", "admin", "templates", None, lambda: ["rhel9"]) == ["rhel9"]
+
+
+def test_lru_bound_evicts_the_least_recently_used_entry():
+    cache = InventoryCache(max_entries=2)
+    cache.get_or_load("vc", "admin", "clusters", "DC1", lambda: ["A"])
+    cache.get_or_load("vc", "admin", "clusters", "DC2", lambda: ["B"])
+    cache.get_or_load("vc", "admin", "clusters", "DC1", lambda: ["reloaded"])  # touch DC1
+    cache.get_or_load("vc", "admin", "clusters", "DC3", lambda: ["C"])
+
+    assert cache.get_or_load("vc", "admin", "clusters", "DC1", lambda: ["reloaded"]) == ["A"]
+    assert cache.get_or_load("vc", "admin", "clusters", "DC2", lambda: ["reloaded"]) == ["reloaded"]
+    assert cache.stats()["evictions"] >= 1
+
+
+def test_invalidate_matches_host_kind_and_argument():
+    cache = InventoryCache()
+    for host in ("vc1", "vc2"):
+        for dc in ("DC1", "DC2"):
+            cache.get_or_load(host, "admin", "clusters", dc, lambda: ["A"])
+        cache.get_or_load(host, "admin", "templates", None, lambda: ["rhel9"])
+
+    assert cache.invalidate(host="vc1", kind="clusters", arg="DC1") == 1
+    assert cache.invalidate(kind="templates") == 2
+    assert cache.invalidate(host="vc2") == 2
+    assert cache.stats()["entries"] == 1
@@ -0,0 +1,65 @@
+"""
+Bulk IP planning: allocate_ips per NIC and plan_bulk_ips across a whole job
+"""
+import ipaddress
+from types import SimpleNamespace
+
+import pytest
+
+import vm_provision
+
+
+def test_allocate_ips_skips_gateway_and_reserved_ranges():
+    addresses, network = vm_provision.allocate_ips(
+        "10.0.0.1/24", 4, gateway="10.0.0.1", reserved="10.0.0.3-10.0.0.5, 10.0.0.7"
+    )
+
+    assert addresses == ["10.0.0.2", "10.0.0.6", "10.0.0.8", "10.0.0.9"]
+    assert network == ipaddress.IPv4Network("10.0.0.0/24")
+
+
+def test_allocate_ips_starts_a_whole_network_after_its_network_address():
+    addresses, _ = vm_provision.allocate_ips("192.168.1.0/30", 2, reserved="")
+
+    assert addresses == ["192.168.1.1", "192.168.1.2"]
+
+
+def test_allocate_ips_never_leaves_the_network():
+    with pytest.raises(ValueError, match="only 2 free addresses"):
+        vm_provision.allocate_ips("10.0.0.253/24", 3, reserved="")
+
+
+def test_allocate_ips_uses_the_default_mask_for_a_bare_address():
+    addresses, network = vm_provision.allocate_ips(
+        "172.16.0.254", 2, default_mask="255.255.0.0", reserved=""
+    )
+
+    assert addresses == ["172.16.0.254", "172.16.0.255"]
+    assert network == ipaddress.IPv4Network("172.16.0.0/16")
+
+
+def test_plan_bulk_ips_builds_one_row_per_vm_and_leaves_unset_nics_on_dhcp():
+    blueprint = SimpleNamespace(nics=[
+        {"subnet_mask": "255.255.255.0", "gateway": "10.0.0.11"},
+        {"subnet_mask": "255.255.255.0", "gateway": None},
+    ])
+
+    rows, networks = vm_provision.plan_bulk_ips(
+        {"net1": "10.0.0.10", "net3": "10.2.0.0/29"}, 3, blueprint=blueprint, reserved=""
+    )
+
+    assert rows == [
+        ["10.0.0.10", None, "10.2.0.1"] + [None] * 6,
+        ["10.0.0.12", None, "10.2.0.2"] + [None] * 6,
+        ["10.0.0.13", None, "10.2.0.3"] + [None] * 6,
+    ]
+    assert networks[0] == ipaddress.IPv4Network("10.0.0.0/24")
+    assert networks[1] is None
+    assert networks[2] == ipaddress.IPv4Network("10.2.0.0/29")
+
+
+def test_plan_bulk_ips_names_the_nic_that_ran_out():
+    with pytest.raises(ValueError, match="^NIC2: "):
+        vm_provision.plan_bulk_ips(
+            {"net1": "10.0.0.10", "net2": "10.1.0.0/30"}, 3, reserved=""
+        )
@@ -0,0 +1,82 @@
+"""
+JobJournal ownership: interrupted jobs after a restart and one-shot resume claims
+"""
+import pytest
+
+import job_journal
+
+
+@pytest.fixture
+def journal_path(tmp_path):
+    return str(tmp_path / "jobs.db")
+
+
+def restart(monkeypatch, journal_path):
+    """Open the journal as a new process would"""
+    monkeypatch.setattr(job_journal, "PROCESS_TOKEN", "next-process")
+    return job_journal.JobJournal(journal_path)
+
+
+def test_own_running_jobs_are_not_interrupted(journal_path):
+    journal = job_journal.JobJournal(journal_path)
+    job_id = journal.create_job("vc", "admin", {"count": 2})
+
+    assert journal.mark_interrupted() == []
+    assert journal.get_job(job_id)["status"] == "running"
+
+
+def test_jobs_of_a_previous_process_are_interrupted_on_open(journal_path, monkeypatch):
+    journal = job_journal.JobJournal(journal_path)
+    running = journal.create_job("vc", "admin", {"count": 2})
+    finished = journal.create_job("vc", "admin", {"count": 1})
+    journal.set_status(finished, "completed", "done")
+
+    reopened = restart(monkeypatch, journal_path)
+
+    assert reopened.get_job(running)["status"] == "interrupted"
+    assert reopened.get_job(finished)["status"] == "completed"
+    assert [event["phase"] for event in reopened.get_job(running)["events"]] == [
+        "running", "interrupted",
+    ]
+
+
+def test_same_host_and_pid_with_a_new_token_counts_as_another_process(journal_path, monkeypatch):
+    # pid 1 in a recreated container: host and pid repeat, only the token differs
+    journal = job_journal.JobJournal(journal_path)
+    job_id = journal.create_job("vc", "admin", {})
+
+    reopened = restart(monkeypatch, journal_path)
+
+    assert reopened.owner.rsplit("/", 1)[0] == journal.owner.rsplit("/", 1)[0]
+    assert reopened.get_job(job_id)["status"] == "interrupted"
+
+
+def test_claim_for_resume_succeeds_once(journal_path, monkeypatch):
+    job_journal.JobJournal(journal_path).create_job("vc", "admin", {}, job_id="job-1")
+    journal = restart(monkeypatch, journal_path)
+
+    assert journal.claim_for_resume("job-1") is True
+    assert journal.claim_for_resume("job-1") is False
+    job = journal.get_job("job-1")
+    assert job["status"] == "running"
+    assert job["owner"] == journal.owner
+
+
+def test_running_and_completed_jobs_cannot_be_claimed(journal_path):
+    journal = job_journal.JobJournal(journal_path)
+    running = journal.create_job("vc", "admin", {})
+    completed = journal.create_job("vc", "admin", {})
+    journal.set_status(completed, "completed", "done")
+
+    assert journal.claim_for_resume(running) is False
+    assert journal.claim_for_resume(completed) is False
+    assert journal.claim_for_resume("missing") is False
+
+
+def test_failed_jobs_can_be_claimed(journal_path):
+    journal = job_journal.JobJournal(journal_path)
+    job_id = journal.create_job("vc", "admin", {})
+    journal.set_status(job_id, "failed", "clone error")
+
+    assert journal.claim_for_resume(job_id, message="retrying") is True
+    assert journal.get_job(job_id)["message"] == "retrying"
@@ -0,0 +1,92 @@
+"""
+LogChannel ring buffer, spill file and sequence-based replay
+"""
+import log_bus
+
+
+def publish_lines(channel, count):
+    for idx in range(count):
+        channel.publish(f"line {idx}")
+
+
+def test_reader_replays_from_its_cursor_in_order():
+    channel = log_bus.LogChannel("job", capacity=100)
+    publish_lines(channel, 5)
+
+    messages, cursor, dropped = channel.read(2, timeout=0)
+
+    assert messages == ["line 2", "line 3", "line 4"]
+    assert (cursor, dropped) == (5, 0)
+
+
+def test_events_and_lines_share_one_sequence():
+    bus = log_bus.LogBus(capacity=100)
+    log = bus.publisher("job")
+    emit = bus.emitter("job")
+    log("cloning")
+    emit("vm.cloned", {"name": "web01"})
+    log("done")
+
+    messages, cursor, _ = bus.channel("job").read(0, timeout=0)
+
+    assert messages == ["cloning", {"event": "vm.cloned", "data": {"name": "web01"}}, "done"]
+    assert cursor == 3
+
+
+def test_lines_beyond_capacity_are_dropped_without_a_spill_file():
+    channel = log_bus.LogChannel("job", capacity=3)
+    publish_lines(channel, 5)
+
+    messages, cursor, dropped = channel.read(0, timeout=0)
+
+    assert messages == ["line 2", "line 3", "line 4"]
+    assert (cursor, dropped) == (5, 2)
+    assert channel.stats()["dropped"] == 2
+
+
+def test_late_reader_is_served_from_the_spill_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(log_bus, "SPILL_INDEX_EVERY", 4)
+    channel = log_bus.LogChannel("job", capacity=3, spill_path=str(tmp_path / "job.log"))
+    publish_lines(channel, 20)
+
+    replayed = []
+    cursor = 0
+    while cursor < channel.next_seq:
+        messages, cursor, dropped = channel.read(cursor, timeout=0)
+        assert dropped == 0
+        replayed.extend(messages)
+
+    assert replayed == [f"line {idx}" for idx in range(20)]
+    assert channel.stats()["spilled"] == 17
+
+
+def test_spill_read_starts_at_a_checkpoint_inside_the_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(log_bus, "SPILL_INDEX_EVERY", 4)
+    channel = log_bus.LogChannel("job", capacity=2, spill_path=str(tmp_path / "job.log"))
+    publish_lines(channel, 12)
+
+    messages, cursor, dropped = channel.read(9, timeout=0)
+
+    assert messages == ["line 9"]
+    assert (cursor, dropped) == (10, 0)
+
+
+def test_read_returns_at_the_end_of_a_closed_channel():
+    channel = log_bus.LogChannel("job", capacity=10)
+    publish_lines(channel, 2)
+    channel.close()
+
+    assert channel.read(2, timeout=5) == ([], 2, 0)
+
+
+def test_memory_limit_spills_by_size(tmp_path):
+    channel = log_bus.LogChannel(
+        "job", capacity=100, memory_limit=25, spill_path=str(tmp_path / "job.log")
+    )
+    for idx in range(4):
+        channel.publish(f"{idx}" * 10)
+
+    stats = channel.stats()
+    assert stats["buffered_size"] <= 25
+    assert stats["spilled"] == 4 - stats["buffered"]
+    assert channel.read(0, timeout=0)[0][0] == "0" * 10
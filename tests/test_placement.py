@@ -0,0 +1,125 @@
+"""
+PlacementEngine policies and eligibility filters on plain candidate dicts
+"""
+from types import SimpleNamespace
+
+import pytest
+
+import vm_provision
+
+GB = 1024 ** 3
+
+
+def datastore(moid, free_gb, capacity_gb=1000, provisioned_gb=None, eligible=True):
+    return {
+        "obj": SimpleNamespace(_moId=moid),
+        "name": moid,
+        "free": free_gb * GB,
+        "capacity": capacity_gb * GB,
+        "provisioned": (provisioned_gb if provisioned_gb is not None else capacity_gb - free_gb) * GB,
+        "eligible": eligible,
+    }
+
+
+def host(moid, free_gb, datastores, eligible=True):
+    return {
+        "obj": SimpleNamespace(_moId=moid),
+        "name": moid,
+        "free": free_gb * GB,
+        "datastores": set(datastores),
+        "eligible": eligible,
+    }
+
+
+def placed_names(engine, count):
+    return [
+        (ds["name"], h["name"] if h else None)
+        for ds, h in (engine.place() for _ in range(count))
+    ]
+
+
+def test_most_free_accounts_for_clones_already_placed():
+    engine = vm_provision.PlacementEngine(
+        [datastore("ds-a", 100), datastore("ds-b", 90)],
+        [host("esx-1", 64, ["ds-a", "ds-b"])],
+        policy="most-free",
+        disk_bytes=20 * GB,
+    )
+
+    assert [ds for ds, _ in placed_names(engine, 3)] == ["ds-a", "ds-b", "ds-a"]
+
+
+def test_round_robin_keeps_separate_datastore_and_host_counters():
+    engine = vm_provision.PlacementEngine(
+        [datastore("ds-a", 500), datastore("ds-b", 500)],
+        [host("esx-1", 64, ["ds-a", "ds-b"]), host("esx-2", 64, ["ds-a", "ds-b"]),
+         host("esx-3", 64, ["ds-a", "ds-b"])],
+        policy="round-robin",
+    )
+
+    assert placed_names(engine, 4) == [
+        ("ds-a", "esx-1"), ("ds-b", "esx-2"), ("ds-a", "esx-3"), ("ds-b", "esx-1"),
+    ]
+
+
+def test_weighted_shares_clones_in_proportion_to_usable_space():
+    engine = vm_provision.PlacementEngine(
+        [datastore("ds-big", 300), datastore("ds-small", 100)],
+        [],
+        policy="weighted",
+    )
+
+    placements = [ds for ds, _ in placed_names(engine, 8)]
+
+    assert placements.count("ds-big") == 6
+    assert placements.count("ds-small") == 2
+
+
+def test_weighted_discounts_overcommitted_thin_provisioning():
+    engine = vm_provision.PlacementEngine(
+        [datastore("ds-thin", 300, provisioned_gb=1250), datastore("ds-thick", 100)],
+        [],
+        policy="weighted",
+    )
+
+    # ds-thin: 300 GB free less 250 GB overcommitted weighs 50 GB against 100 GB
+    placements = [ds for ds, _ in placed_names(engine, 6)]
+    assert placements.count("ds-thick") == 4
+
+
+def test_ineligible_and_full_datastores_are_skipped():
+    engine = vm_provision.PlacementEngine(
+        [datastore("ds-maint", 900, eligible=False), datastore("ds-full", 10), datastore("ds-ok", 50)],
+        [],
+        policy="most-free",
+        disk_bytes=20 * GB,
+    )
+
+    assert [ds for ds, _ in placed_names(engine, 2)] == ["ds-ok", "ds-ok"]
+    with pytest.raises(Exception, match="No accessible datastore"):
+        engine.place()
+
+
+def test_hosts_must_mount_the_datastore_and_have_memory_left():
+    engine = vm_provision.PlacementEngine(
+        [datastore("ds-a", 500)],
+        [
+            host("esx-other", 256, ["ds-b"]),
+            host("esx-small", 6, ["ds-a"]),
+            host("esx-down", 256, ["ds-a"], eligible=False),
+            host("esx-ok", 10, ["ds-a"]),
+        ],
+        policy="most-free",
+        memory_mb=4096,
+    )
+
+    assert placed_names(engine, 3) == [
+        ("ds-a", "esx-ok"), ("ds-a", "esx-small"), ("ds-a", "esx-ok"),
+    ]
+    # Every host is now short of memory; vCenter picks the host
+    assert placed_names(engine, 1) == [("ds-a", None)]
+
+
+def test_unknown_policy_is_rejected():
+    with pytest.raises(ValueError, match="Unknown placement policy"):
+        vm_provision.PlacementEngine([], [], policy="random")
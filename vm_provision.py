@@ -1,220 +1,2196 @@
 from pyVim.connect import SmartConnect, Disconnect
-from pyVmomi import vim
+from pyVim.task import WaitForTask
+from pyVmomi import vim, vmodl
 import ssl
 import atexit
+import threading
 import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import ipaddress
+import json
 import random
 
+try:
+    from .config import config
+except ImportError:  # imported as a top-level module (python app.py)
+    from config import config
 
-def get_template_names(vcenter_host, vcenter_user, vcenter_pass):
-    """Get all VM templates from vCenter"""
-    context = ssl._create_unverified_context()
-    si = SmartConnect(
-        host=vcenter_host, user=vcenter_user, pwd=vcenter_pass, sslContext=context
+
+# vCenter tunables come from config.py (VCENTER_* environment variables)
+VCENTER_CONFIG = config["VCENTER"]
+
+# vCenter session pool settings (seconds unless noted)
+SESSION_POOL_MAX_SIZE = VCENTER_CONFIG["SESSION_POOL_MAX_SIZE"]
+SESSION_IDLE_TIMEOUT = VCENTER_CONFIG["SESSION_IDLE_TIMEOUT"]
+SESSION_KEEPALIVE_INTERVAL = VCENTER_CONFIG["SESSION_KEEPALIVE_INTERVAL"]
+SESSION_HEALTH_CHECK_INTERVAL = VCENTER_CONFIG["SESSION_HEALTH_CHECK_INTERVAL"]
+
+# Objects per RetrievePropertiesEx page when streaming inventory
+INVENTORY_PAGE_SIZE = VCENTER_CONFIG["INVENTORY_PAGE_SIZE"]
+
+# Background inventory sync via WaitForUpdatesEx
+INVENTORY_SYNC_ENABLED = VCENTER_CONFIG["INVENTORY_SYNC"]
+INVENTORY_SYNC_WAIT_SECONDS = VCENTER_CONFIG["INVENTORY_SYNC_WAIT_SECONDS"]
+INVENTORY_SYNC_RETRY_SECONDS = VCENTER_CONFIG["INVENTORY_SYNC_RETRY_SECONDS"]
+
+# Lifetime of a bulk-built name index when inventory sync is not running
+NAME_INDEX_TTL = VCENTER_CONFIG["NAME_INDEX_TTL"]
+
+# Worker threads shared by concurrent per-datacenter discovery
+DISCOVERY_MAX_WORKERS = VCENTER_CONFIG["DISCOVERY_MAX_WORKERS"]
+
+# Clone scheduler limits (clone tasks in flight)
+CLONE_MAX_IN_FLIGHT = VCENTER_CONFIG["CLONE_MAX_IN_FLIGHT"]
+CLONE_MAX_PER_DATASTORE = VCENTER_CONFIG["CLONE_MAX_PER_DATASTORE"]
+CLONE_MAX_PER_HOST = VCENTER_CONFIG["CLONE_MAX_PER_HOST"]
+CLONE_POLL_INTERVAL = VCENTER_CONFIG["CLONE_POLL_INTERVAL"]
+
+# Linked clones are made from this template snapshot (taken if the source is a VM)
+LINKED_CLONE_SNAPSHOT_NAME = VCENTER_CONFIG["LINKED_CLONE_SNAPSHOT"]
+
+# Datastore-local template replicas (off by default: replicas use datastore space)
+TEMPLATE_REPLICAS_ENABLED = VCENTER_CONFIG["TEMPLATE_REPLICAS"]
+REPLICA_MIN_USES = VCENTER_CONFIG["REPLICA_MIN_USES"]
+REPLICA_MIN_FREE_PERCENT = VCENTER_CONFIG["REPLICA_MIN_FREE_PERCENT"]
+REPLICA_MAX_WORKERS = VCENTER_CONFIG["REPLICA_MAX_WORKERS"]
+REPLICA_CHECK_SECONDS = VCENTER_CONFIG["REPLICA_CHECK_SECONDS"]
+
+# Datastore / host placement policy: most-free, round-robin or weighted
+PLACEMENT_POLICY = VCENTER_CONFIG["PLACEMENT_POLICY"]
+
+# Addresses the bulk IP allocator never hands out: comma-separated IPs, ranges
+# (10.0.0.1-10.0.0.20) or CIDRs
+IP_RESERVED = VCENTER_CONFIG["IP_RESERVED"]
+
+# In-use IP index (guest.net of all VMs) used to reject conflicting static IPs
+IP_CONFLICT_CHECK = VCENTER_CONFIG["IP_CONFLICT_CHECK"]
+IP_INDEX_TTL = VCENTER_CONFIG["IP_INDEX_TTL"]
+
+# Longest single WaitForUpdatesEx call while watching clone tasks
+TASK_MONITOR_WAIT_SECONDS = VCENTER_CONFIG["TASK_MONITOR_WAIT_SECONDS"]
+
+
+# Default vCenter HTTPS port; a "host:port" vCenter address overrides it
+VCENTER_PORT = int(config["VCENTER_PORT"])
+
+
+def _split_host_port(host):
+    """Split "host:port" (or "[v6addr]:port") into (host, port), defaulting to VCENTER_PORT"""
+    if host.startswith("["):
+        addr, _, rest = host[1:].partition("]")
+        port = rest[1:] if rest.startswith(":") else ""
+        return addr, int(port) if port.isdigit() else VCENTER_PORT
+    if host.count(":") == 1:
+        addr, _, port = host.partition(":")
+        if port.isdigit():
+            return addr, int(port)
+    return host, VCENTER_PORT
+
+
+class VCenterSessionPool:
+    """
+    Pool of logged-in vCenter sessions keyed by (host, user)
+
+    - One ServiceInstance is shared per key; pyVmomi's SOAP stub is thread-safe
+    - Sessions are health-checked with SessionIsActive before reuse
+    - A background reaper sends keepalives and logs out idle sessions
+    - When the pool is full the least recently used session is logged out
+    - Long operations lease their session (lease() / acquire(lease=True) + release());
+      a leased session is never reaped as idle nor evicted from the pool
+    """
+
+    def __init__(
+        self,
+        max_size=SESSION_POOL_MAX_SIZE,
+        idle_timeout=SESSION_IDLE_TIMEOUT,
+        keepalive_interval=SESSION_KEEPALIVE_INTERVAL,
+        health_check_interval=SESSION_HEALTH_CHECK_INTERVAL,
+    ):
+        self.max_size = max(1, max_size)
+        self.idle_timeout = idle_timeout
+        self.keepalive_interval = keepalive_interval
+        self.health_check_interval = health_check_interval
+        self._sessions = OrderedDict()  # (host, user) -> session entry
+        self._lock = threading.RLock()
+        self._login_locks = {}
+        self._reaper = None
+        self._closed = False
+        atexit.register(self.close_all)
+
+    def _connect(self, host, user, pwd):
+        context = ssl._create_unverified_context()
+        host, port = _split_host_port(host)
+        return SmartConnect(host=host, port=port, user=user, pwd=pwd, sslContext=context)
+
+    def _logout(self, entry):
+        if not entry:
+            return
+        try:
+            Disconnect(entry['si'])
+        except Exception:
+            pass
+
+    def _is_healthy(self, entry):
+        """Check the session with SessionIsActive (falls back to currentSession)"""
+        now = time.time()
+        if now - entry['last_checked'] < self.health_check_interval:
+            return True
+        try:
+            session_manager = entry['si'].content.sessionManager
+            current = session_manager.currentSession
+            if current is None:
+                return False
+            try:
+                active = session_manager.SessionIsActive(
+                    sessionID=current.key, userName=current.userName
+                )
+            except vim.fault.NoPermission:
+                # Sessions.ValidateSession is not granted; currentSession is enough
+                active = True
+            if active:
+                entry['last_checked'] = now
+            return active
+        except Exception:
+            return False
+
+    def acquire(self, host, user, pwd, lease=False):
+        """
+        Return a live ServiceInstance for (host, user), logging in if needed
+        - lease: hold the session until release(host, user, si) is called
+        """
+        key = (host, user)
+        with self._lock:
+            login_lock = self._login_locks.setdefault(key, threading.Lock())
+
+        # Serialise logins per key so concurrent requests share one session
+        with login_lock:
+            with self._lock:
+                entry = self._sessions.get(key)
+                if entry and entry['pwd'] != pwd:
+                    entry = None
+                if entry:
+                    self._sessions.move_to_end(key)
+
+            if entry and self._is_healthy(entry):
+                with self._lock:
+                    # The reaper may have dropped it during the health check
+                    if self._sessions.get(key) is entry:
+                        entry['last_used'] = time.time()
+                        if lease:
+                            entry['leases'] += 1
+                        return entry['si']
+
+            si = self._connect(host, user, pwd)
+            now = time.time()
+            new_entry = {
+                'si': si,
+                'pwd': pwd,
+                'created': now,
+                'last_used': now,
+                'last_checked': now,
+                'last_keepalive': now,
+                'leases': 1 if lease else 0,
+            }
+            evicted = []
+            with self._lock:
+                old = self._sessions.pop(key, None)
+                if old and not old['leases']:
+                    evicted.append(old)  # a leased old session is logged out on release
+                self._sessions[key] = new_entry
+                evicted.extend(self._trim())
+            for old_entry in evicted:
+                self._logout(old_entry)
+            self._ensure_reaper()
+            return si
+
+    def release(self, host, user, si):
+        """End a lease taken with acquire(lease=True)"""
+        orphan = None
+        with self._lock:
+            entry = self._sessions.get((host, user))
+            if entry and entry['si'] is si:
+                entry['leases'] = max(0, entry['leases'] - 1)
+                entry['last_used'] = time.time()
+                evicted = self._trim()
+            else:
+                # Replaced (new password) or discarded while leased: log it out now
+                orphan, evicted = {'si': si}, []
+        for old_entry in evicted:
+            self._logout(old_entry)
+        if orphan:
+            self._logout(orphan)
+
+    @contextmanager
+    def lease(self, host, user, pwd):
+        """Hold a pooled session for the duration of a with block"""
+        si = self.acquire(host, user, pwd, lease=True)
+        try:
+            yield si
+        finally:
+            self.release(host, user, si)
+
+    def _trim(self):
+        """Pop least recently used unleased sessions beyond max_size (call with the lock held)"""
+        evicted = []
+        while len(self._sessions) > self.max_size:
+            idle = next((key for key, entry in self._sessions.items() if not entry['leases']), None)
+            if idle is None:
+                break  # every session is leased; trimmed once one is released
+            evicted.append(self._sessions.pop(idle))
+        return evicted
+
+    def discard(self, host, user, si=None):
+        """Drop the pooled session for (host, user), e.g. after NotAuthenticated"""
+        with self._lock:
+            entry = self._sessions.get((host, user))
+            if entry and (si is None or entry['si'] is si):
+                del self._sessions[(host, user)]
+            else:
+                entry = None
+        self._logout(entry)
+
+    def run(self, host, user, pwd, func):
+        """Call func(si) on a leased pooled session, re-logging in once on NotAuthenticated"""
+        si = None
+        try:
+            with self.lease(host, user, pwd) as si:
+                return func(si)
+        except vim.fault.NotAuthenticated:
+            self.discard(host, user, si)
+            with self.lease(host, user, pwd) as si:
+                return func(si)
+
+    def stats(self):
+        """Return a snapshot of pooled sessions for diagnostics"""
+        now = time.time()
+        with self._lock:
+            return [
+                {
+                    'host': host,
+                    'user': user,
+                    'age': round(now - entry['created'], 1),
+                    'idle': round(now - entry['last_used'], 1),
+                    'leases': entry['leases'],
+                }
+                for (host, user), entry in self._sessions.items()
+            ]
+
+    def _ensure_reaper(self):
+        with self._lock:
+            if self._reaper and self._reaper.is_alive():
+                return
+            self._reaper = threading.Thread(
+                target=self._reap_loop, name="vcenter-session-reaper", daemon=True
+            )
+            self._reaper.start()
+
+    def _reap_loop(self):
+        interval = max(5, min(self.idle_timeout, self.keepalive_interval) / 4)
+        while not self._closed:
+            time.sleep(interval)
+            self.reap()
+
+    def reap(self):
+        """Log out idle sessions and keep the remaining ones alive"""
+        now = time.time()
+        expired = []
+        to_ping = []
+        with self._lock:
+            for key, entry in list(self._sessions.items()):
+                if not entry['leases'] and now - entry['last_used'] > self.idle_timeout:
+                    expired.append(self._sessions.pop(key))
+                elif now - entry['last_keepalive'] > self.keepalive_interval:
+                    to_ping.append((key, entry))
+        for entry in expired:
+            self._logout(entry)
+        for (host, user), entry in to_ping:
+            try:
+                entry['si'].CurrentTime()
+                entry['last_keepalive'] = time.time()
+            except Exception:
+                self.discard(host, user, entry['si'])
+
+    def close_all(self):
+        """Log out every pooled session (registered with atexit)"""
+        self._closed = True
+        with self._lock:
+            entries = list(self._sessions.values())
+            self._sessions.clear()
+        for entry in entries:
+            self._logout(entry)
+
+
+_session_pool = VCenterSessionPool()
+
+
+def get_session_pool():
+    """Return the process-wide vCenter session pool"""
+    return _session_pool
+
+
+def with_vcenter_session(vcenter_host, vcenter_user, vcenter_pass, func):
+    """Run func(si) on a pooled vCenter session"""
+    return _session_pool.run(vcenter_host, vcenter_user, vcenter_pass, func)
+
+
+def _view_filter_spec(view, obj_type, path_set):
+    """Build a FilterSpec that reads path_set from every object in a ContainerView"""
+    return _view_multi_filter_spec(view, {obj_type: path_set})
+
+
+def _view_multi_filter_spec(view, properties):
+    """Build a FilterSpec over a ContainerView from {managed object type: path_set}"""
+    traversal = vmodl.query.PropertyCollector.TraversalSpec(
+        name="traverseView", path="view", skip=False, type=type(view)
+    )
+    obj_spec = vmodl.query.PropertyCollector.ObjectSpec(
+        obj=view, skip=True, selectSet=[traversal]
     )
-    atexit.register(Disconnect, si)
+    prop_specs = [
+        vmodl.query.PropertyCollector.PropertySpec(
+            type=obj_type, pathSet=path_set, all=False
+        )
+        for obj_type, path_set in properties.items()
+    ]
+    return vmodl.query.PropertyCollector.FilterSpec(
+        objectSet=[obj_spec], propSet=prop_specs
+    )
+
+
+def _content_of(managed_object):
+    """Return the ServiceContent for the session a managed object is bound to"""
+    return vim.ServiceInstance("ServiceInstance", managed_object._stub).content
 
-    content = si.RetrieveContent()
-    templates = []
 
-    container = content.viewManager.CreateContainerView(
-        content.rootFolder, [vim.VirtualMachine], True
+def _iter_properties(content, obj_type, path_set, root=None, page_size=None):
+    """
+    Stream (managed object, {property path: value}) for all obj_type objects under root
+
+    Uses RetrievePropertiesEx with maxObjects and ContinueRetrievePropertiesEx so only
+    one page is held in memory. Closing the generator early cancels the server-side
+    retrieval.
+    """
+    return _iter_view_properties(
+        content, {obj_type: path_set}, root=root, page_size=page_size
     )
 
-    for vm in container.view:
-        if vm.config and vm.config.template:
-            templates.append(vm.name)
 
-    container.Destroy()
-    return sorted(templates)
+def _iter_view_properties(content, properties, root=None, page_size=None):
+    """Stream properties for several object types ({type: path_set}) in one pass"""
+    view = content.viewManager.CreateContainerView(
+        root or content.rootFolder, list(properties), True
+    )
+    try:
+        spec = _view_multi_filter_spec(view, properties)
+        yield from _iter_retrieve(content.propertyCollector, spec, page_size)
+    finally:
+        view.Destroy()
 
 
-def get_datacenters(vcenter_host, vcenter_user, vcenter_pass):
-    """Get all datacenters from vCenter"""
-    context = ssl._create_unverified_context()
-    si = SmartConnect(
-        host=vcenter_host, user=vcenter_user, pwd=vcenter_pass, sslContext=context
+def _iter_objects_properties(content, managed_objects, obj_type, path_set, page_size=None):
+    """Stream path_set for an explicit list of obj_type objects, paged like _iter_properties"""
+    if not managed_objects:
+        return
+    spec = vmodl.query.PropertyCollector.FilterSpec(
+        objectSet=[
+            vmodl.query.PropertyCollector.ObjectSpec(obj=obj, skip=False)
+            for obj in managed_objects
+        ],
+        propSet=[
+            vmodl.query.PropertyCollector.PropertySpec(
+                type=obj_type, pathSet=path_set, all=False
+            )
+        ],
     )
-    atexit.register(Disconnect, si)
+    yield from _iter_retrieve(content.propertyCollector, spec, page_size)
+
+
+def _iter_retrieve(collector, spec, page_size=None):
+    """Page through RetrievePropertiesEx results, cancelling the retrieval if closed early"""
+    token = None
+    try:
+        options = vmodl.query.PropertyCollector.RetrieveOptions(
+            maxObjects=page_size or INVENTORY_PAGE_SIZE
+        )
+        result = collector.RetrievePropertiesEx([spec], options)
+        while result:
+            token = result.token
+            for obj_content in result.objects:
+                props = {prop.name: prop.val for prop in obj_content.propSet}
+                yield obj_content.obj, props
+            if not token:
+                break
+            result = collector.ContinueRetrievePropertiesEx(token)
+            token = None
+    finally:
+        if token:
+            try:
+                collector.CancelRetrievePropertiesEx(token)
+            except Exception:
+                pass
 
-    content = si.RetrieveContent()
-    datacenters = []
 
-    container = content.viewManager.CreateContainerView(
-        content.rootFolder, [vim.Datacenter], True
+def _retrieve_properties(content, obj_type, path_set, root=None):
+    """
+    Fetch only path_set for all obj_type objects under root with RetrievePropertiesEx
+    Returns a list of (managed object, {property path: value})
+    """
+    return list(_iter_properties(content, obj_type, path_set, root=root))
+
+
+def _object_properties(content, managed_object, path_set):
+    """Read only path_set from a single managed object in one PropertyCollector call"""
+    spec = vmodl.query.PropertyCollector.FilterSpec(
+        objectSet=[
+            vmodl.query.PropertyCollector.ObjectSpec(obj=managed_object, skip=False)
+        ],
+        propSet=[
+            vmodl.query.PropertyCollector.PropertySpec(
+                type=type(managed_object), pathSet=path_set, all=False
+            )
+        ],
     )
+    result = content.propertyCollector.RetrievePropertiesEx(
+        [spec], vmodl.query.PropertyCollector.RetrieveOptions()
+    )
+    if not result or not result.objects:
+        return {}
+    return {prop.name: prop.val for prop in result.objects[0].propSet}
 
-    for dc in container.view:
-        datacenters.append(dc.name)
 
-    container.Destroy()
-    return sorted(datacenters)
+def _iter_names(content, obj_type, root=None):
+    """Stream the names of all obj_type objects under root page by page"""
+    for _, props in _iter_properties(content, obj_type, ["name"], root=root):
+        yield props.get("name")
 
 
-def get_clusters(vcenter_host, vcenter_user, vcenter_pass, datacenter_name):
-    """Get all clusters in a specific datacenter"""
-    context = ssl._create_unverified_context()
-    si = SmartConnect(
-        host=vcenter_host, user=vcenter_user, pwd=vcenter_pass, sslContext=context
+def _find_by_name(content, obj_type, name, root=None):
+    """Return the first obj_type object called name, stopping the scan on a match"""
+    objects = _iter_properties(content, obj_type, ["name"], root=root)
+    try:
+        for obj, props in objects:
+            if props.get("name") == name:
+                return obj
+        return None
+    finally:
+        objects.close()
+
+
+# Properties kept current by InventorySynchronizer
+INVENTORY_SYNC_PROPERTIES = {
+    vim.VirtualMachine: ["name", "parent", "config.template", "config.hardware.device"],
+    vim.Datacenter: ["name", "parent"],
+    vim.ClusterComputeResource: ["name", "parent"],
+    vim.Network: ["name", "parent"],
+    vim.Folder: ["name", "parent"],
+}
+
+
+# Properties read by a one-shot bulk fetch to build a name index
+NAME_INDEX_PROPERTIES = {
+    vim.VirtualMachine: ["name", "parent", "config.template"],
+    vim.Datacenter: ["name", "parent"],
+    vim.ClusterComputeResource: ["name", "parent"],
+    vim.Network: ["name", "parent"],
+    vim.Folder: ["name", "parent"],
+}
+
+
+class DuplicateNameError(Exception):
+    """Raised when a name lookup matches more than one managed object"""
+
+    def __init__(self, kind, name, paths):
+        self.kind = kind
+        self.name = name
+        self.paths = paths
+        super().__init__(
+            f"{len(paths)} {kind} objects are named '{name}': {', '.join(paths)}"
+        )
+
+
+def _inventory_kind(managed_object):
+    """Map a managed object to the kind used by InventoryIndex"""
+    if isinstance(managed_object, vim.VirtualMachine):
+        return "vm"
+    if isinstance(managed_object, vim.Datacenter):
+        return "datacenter"
+    if isinstance(managed_object, vim.ClusterComputeResource):
+        return "cluster"
+    if isinstance(managed_object, vim.Network):
+        return "network"
+    return "folder"
+
+
+class InventoryIndex:
+    """
+    In-process index of vCenter inventory built from PropertyCollector data
+
+    Objects are stored by MoRef id with their name, parent id and (for VMs)
+    template flag and NIC count, so lookups never go back to vCenter.
+    """
+
+    def __init__(self):
+        self._objects = {}  # moId -> {'kind', 'type', 'name', 'parent', ...}
+        self._by_name = {}  # (kind, name) -> set of moIds
+        self._lock = threading.RLock()
+        self.ready = False
+        self.live = False  # kept current by an InventorySynchronizer (else a snapshot)
+        self.updated_at = None
+
+    @classmethod
+    def build(cls, content, properties=None):
+        """Build a ready index from one paged bulk property fetch"""
+        index = cls()
+        for obj, props in _iter_view_properties(
+            content, properties or NAME_INDEX_PROPERTIES
+        ):
+            index.add_object(obj, props)
+        index.ready = True
+        return index
+
+    def load_template_devices(self, content):
+        """
+        Read config.hardware.device for templates only, in one paged pass
+        A bulk-built index skips the device list of ordinary VMs; templates need it
+        for their NIC counts.
+        """
+        stub = content.rootFolder._stub
+        with self._lock:
+            templates = [
+                entry["type"](moid, stub)
+                for moid, entry in self._objects.items()
+                if entry["kind"] == "vm" and entry.get("config.template")
+            ]
+        for obj, props in _iter_objects_properties(
+            content, templates, vim.VirtualMachine, ["config.hardware.device"]
+        ):
+            self.add_object(obj, props)
+
+    def clear(self):
+        with self._lock:
+            self._objects.clear()
+            self._by_name.clear()
+            self.ready = False
+
+    def apply_update(self, obj, kind, changes):
+        """Apply one ObjectUpdate (enter/modify/leave) from WaitForUpdatesEx"""
+        moid = obj._moId
+        with self._lock:
+            if kind == "leave":
+                entry = self._objects.pop(moid, None)
+                if entry:
+                    self._index_name(moid, entry, None)
+            else:
+                entry = self._entry(obj)
+                for change in changes:
+                    if change.op in ("remove", "indirectRemove"):
+                        if change.name == "name":
+                            self._index_name(moid, entry, None)
+                        entry.pop(change.name, None)
+                    else:
+                        self._set_property(entry, change.name, change.val)
+            self.updated_at = time.time()
+
+    def add_object(self, obj, props):
+        """Add an object read by a bulk property fetch"""
+        with self._lock:
+            entry = self._entry(obj)
+            for name, value in props.items():
+                self._set_property(entry, name, value)
+            self.updated_at = time.time()
+
+    def _entry(self, obj):
+        entry = self._objects.get(obj._moId)
+        if entry is None:
+            entry = {"kind": _inventory_kind(obj), "type": type(obj), "moid": obj._moId}
+            self._objects[obj._moId] = entry
+        return entry
+
+    def _index_name(self, moid, entry, new_name):
+        old_name = entry.get("name")
+        if old_name is not None:
+            moids = self._by_name.get((entry["kind"], old_name))
+            if moids:
+                moids.discard(moid)
+                if not moids:
+                    del self._by_name[(entry["kind"], old_name)]
+        if new_name is not None:
+            self._by_name.setdefault((entry["kind"], new_name), set()).add(moid)
+
+    def _set_property(self, entry, name, value):
+        if name == "name":
+            self._index_name(entry["moid"], entry, value)
+            entry["name"] = value
+        elif name == "parent":
+            entry["parent"] = value._moId if value is not None else None
+        elif name == "config.hardware.device":
+            # Only the NIC count is needed; keep the index small
+            entry["nic_count"] = _count_nics(value)
+        else:
+            entry[name] = value
+
+    def _datacenter_of(self, moid):
+        seen = set()
+        entry = self._objects.get(moid)
+        while entry and moid not in seen:
+            if entry["kind"] == "datacenter":
+                return moid
+            seen.add(moid)
+            moid = entry.get("parent")
+            entry = self._objects.get(moid)
+        return None
+
+    def _names(self, kind, datacenter_name=None):
+        with self._lock:
+            dc_ids = None
+            if datacenter_name is not None:
+                dc_ids = {
+                    moid
+                    for moid, entry in self._objects.items()
+                    if entry["kind"] == "datacenter" and entry.get("name") == datacenter_name
+                }
+            names = []
+            for moid, entry in self._objects.items():
+                if entry["kind"] != kind or entry.get("name") is None:
+                    continue
+                if dc_ids is not None and self._datacenter_of(moid) not in dc_ids:
+                    continue
+                names.append(entry["name"])
+            return sorted(names)
+
+    def _path(self, moid):
+        """Inventory path of an object, e.g. DC1/vm/Templates/rhel9"""
+        names = []
+        seen = set()
+        entry = self._objects.get(moid)
+        while entry and moid not in seen:
+            seen.add(moid)
+            if entry.get("parent") is None:
+                break  # root folder
+            names.append(entry.get("name") or moid)
+            moid = entry.get("parent")
+            entry = self._objects.get(moid)
+        return "/".join(reversed(names))
+
+    def find(self, kind, name, stub, datacenter=None):
+        """
+        Look up a managed object by kind and name in O(1)
+        - datacenter: restrict the match to objects inside this datacenter
+        - Returns None if not found; raises DuplicateNameError on ambiguous names
+        """
+        with self._lock:
+            moids = set(self._by_name.get((kind, name), ()))
+            if datacenter is not None:
+                moids = {
+                    moid for moid in moids
+                    if self._datacenter_of(moid) == datacenter._moId
+                }
+            if not moids:
+                return None
+            if len(moids) > 1:
+                raise DuplicateNameError(
+                    kind, name, sorted(self._path(moid) for moid in moids)
+                )
+            moid = moids.pop()
+            return self._objects[moid]["type"](moid, stub)
+
+    def duplicates(self, kind=None):
+        """Return {(kind, name): [paths]} for names shared by several objects"""
+        with self._lock:
+            return {
+                key: sorted(self._path(moid) for moid in moids)
+                for key, moids in self._by_name.items()
+                if len(moids) > 1 and (kind is None or key[0] == kind)
+            }
+
+    def bootstrap(self):
+        """
+        Everything the provision page needs in one document:
+        templates with NIC counts, and each datacenter's clusters and networks
+        """
+        with self._lock:
+            datacenters = {
+                moid: {"name": entry.get("name"), "clusters": [], "networks": []}
+                for moid, entry in self._objects.items()
+                if entry["kind"] == "datacenter"
+            }
+            templates = []
+            for moid, entry in self._objects.items():
+                kind = entry["kind"]
+                if kind == "vm":
+                    if (
+                        entry.get("config.template") and entry.get("name")
+                        and not is_replica_name(entry["name"])
+                    ):
+                        templates.append(
+                            {"name": entry["name"], "nic_count": entry.get("nic_count", 1)}
+                        )
+                elif kind in ("cluster", "network"):
+                    dc = datacenters.get(self._datacenter_of(moid))
+                    if dc is not None and entry.get("name") is not None:
+                        dc[kind + "s"].append(entry["name"])
+        for dc in datacenters.values():
+            dc["clusters"].sort()
+            # Standard and distributed port groups may share a name; list it once
+            dc["networks"] = sorted(set(dc["networks"]))
+        return {
+            "templates": sorted(templates, key=lambda t: t["name"]),
+            "datacenters": sorted(datacenters.values(), key=lambda dc: dc["name"] or ""),
+        }
+
+    def template_names(self):
+        with self._lock:
+            return sorted(
+                entry["name"]
+                for entry in self._objects.values()
+                if entry["kind"] == "vm" and entry.get("config.template") and entry.get("name")
+                and not is_replica_name(entry["name"])
+            )
+
+    def datacenter_names(self):
+        return self._names("datacenter")
+
+    def cluster_names(self, datacenter_name):
+        return self._names("cluster", datacenter_name)
+
+    def network_names(self, datacenter_name):
+        return self._names("network", datacenter_name)
+
+    def _template_ids(self, template_name):
+        return [
+            moid
+            for moid in self._by_name.get(("vm", template_name), ())
+            if self._objects[moid].get("config.template")
+        ]
+
+    def find_template(self, template_name, stub):
+        """Like find('vm', ...) but only considers VMs marked as templates"""
+        with self._lock:
+            moids = self._template_ids(template_name)
+            if not moids:
+                return None
+            if len(moids) > 1:
+                raise DuplicateNameError(
+                    "template", template_name, sorted(self._path(moid) for moid in moids)
+                )
+            return self._objects[moids[0]]["type"](moids[0], stub)
+
+    def template_nic_count(self, template_name):
+        """NIC count of the named template, or None if unknown"""
+        with self._lock:
+            for moid in self._template_ids(template_name):
+                return self._objects[moid].get("nic_count")
+            return None
+
+
+class InventorySynchronizer:
+    """
+    Keep an InventoryIndex current for one pooled vCenter session
+
+    A dedicated PropertyCollector holds one filter over VMs, datacenters,
+    clusters, networks and folders; WaitForUpdatesEx deltas are applied to
+    the index. The synchronizer stops when its pooled session goes away and
+    is restarted on the next lookup.
+    """
+
+    def __init__(self, vcenter_host, vcenter_user, vcenter_pass, pool=None):
+        self.vcenter_host = vcenter_host
+        self.vcenter_user = vcenter_user
+        self.vcenter_pass = vcenter_pass
+        self.pool = pool or _session_pool
+        self.index = InventoryIndex()
+        self.index.live = True
+        self.error = None
+        self._si = None
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self._run,
+            name=f"inventory-sync-{self.vcenter_host}",
+            daemon=True,
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+
+    @property
+    def alive(self):
+        return bool(self._thread and self._thread.is_alive()) and not self._stopped.is_set()
+
+    def _run(self):
+        try:
+            while not self._stopped.is_set():
+                try:
+                    self._sync()
+                except vim.fault.NotAuthenticated:
+                    # Session expired on the vCenter side; stop with it
+                    self.pool.discard(self.vcenter_host, self.vcenter_user, self._si)
+                    break
+                except Exception as e:
+                    self.error = str(e)
+                    self.index.ready = False
+                    self._stopped.wait(INVENTORY_SYNC_RETRY_SECONDS)
+        finally:
+            self._stopped.set()
+            self.index.ready = False
+
+    def _sync(self):
+        # Leased for the whole WaitForUpdatesEx loop so the pool never logs it out
+        with self.pool.lease(self.vcenter_host, self.vcenter_user, self.vcenter_pass) as si:
+            self._si = si
+            self._watch(si)
+
+    def _watch(self, si):
+        content = si.content
+        collector = content.propertyCollector.CreatePropertyCollector()
+        view = content.viewManager.CreateContainerView(
+            content.rootFolder, list(INVENTORY_SYNC_PROPERTIES), True
+        )
+        try:
+            collector.CreateFilter(
+                _view_multi_filter_spec(view, INVENTORY_SYNC_PROPERTIES),
+                partialUpdates=False,
+            )
+            options = vmodl.query.PropertyCollector.WaitOptions(
+                maxWaitSeconds=INVENTORY_SYNC_WAIT_SECONDS,
+                maxObjectUpdates=INVENTORY_PAGE_SIZE,
+            )
+            self.index.clear()
+            version = ""
+            while not self._stopped.is_set():
+                update_set = collector.WaitForUpdatesEx(version, options)
+                if update_set is None:
+                    continue  # maxWaitSeconds elapsed with no changes
+                for filter_update in update_set.filterSet or []:
+                    for obj_update in filter_update.objectSet or []:
+                        self.index.apply_update(
+                            obj_update.obj, obj_update.kind, obj_update.changeSet or []
+                        )
+                version = update_set.version
+                if not update_set.truncated:
+                    self.index.ready = True
+                    self.error = None
+        finally:
+            try:
+                collector.Destroy()
+            except Exception:
+                pass
+            try:
+                view.Destroy()
+            except Exception:
+                pass
+
+
+_synchronizers = {}
+_synchronizers_lock = threading.Lock()
+
+
+def get_inventory_synchronizer(vcenter_host, vcenter_user, vcenter_pass):
+    """Return the running synchronizer for (host, user), starting one if needed"""
+    key = (vcenter_host, vcenter_user)
+    with _synchronizers_lock:
+        sync = _synchronizers.get(key)
+        if sync and sync.alive and sync.vcenter_pass == vcenter_pass:
+            return sync
+        if sync:
+            sync.stop()
+        sync = InventorySynchronizer(vcenter_host, vcenter_user, vcenter_pass).start()
+        _synchronizers[key] = sync
+        return sync
+
+
+def inventory_sync_live(vcenter_host, vcenter_user):
+    """True while a synchronizer keeps a ready index for (host, user); no vCenter call"""
+    if not INVENTORY_SYNC_ENABLED:
+        return False
+    with _synchronizers_lock:
+        sync = _synchronizers.get((vcenter_host, vcenter_user))
+    return bool(sync and sync.alive and sync.index.ready)
+
+
+def _synced_index(vcenter_host, vcenter_user, vcenter_pass):
+    """
+    Return a ready InventoryIndex for (host, user), or None to use live queries
+    The pool is always consulted first so the credentials are still verified.
+    """
+    if not INVENTORY_SYNC_ENABLED:
+        return None
+    _session_pool.acquire(vcenter_host, vcenter_user, vcenter_pass)
+    sync = get_inventory_synchronizer(vcenter_host, vcenter_user, vcenter_pass)
+    return sync.index if sync.index.ready else None
+
+
+_name_indexes = {}
+_name_indexes_lock = threading.Lock()
+
+
+def get_name_index(vcenter_host, vcenter_user, vcenter_pass):
+    """
+    Return a name -> MoRef index for (host, user)
+    Uses the live synchronizer index when ready, otherwise a bulk-built
+    index that is rebuilt after NAME_INDEX_TTL seconds.
+    """
+    index = _synced_index(vcenter_host, vcenter_user, vcenter_pass)
+    if index:
+        return index
+    key = (vcenter_host, vcenter_user)
+    with _name_indexes_lock:
+        index = _name_indexes.get(key)
+    if index and time.time() - index.updated_at < NAME_INDEX_TTL:
+        return index
+    index = with_vcenter_session(
+        vcenter_host, vcenter_user, vcenter_pass,
+        lambda si: InventoryIndex.build(si.content),
     )
-    atexit.register(Disconnect, si)
+    with _name_indexes_lock:
+        _name_indexes[key] = index
+    return index
+
+
+class InUseIPIndex:
+    """
+    Addresses reported by VMware Tools for every VM, from one paged bulk fetch
+
+    - Built from guest.ipAddress and guest.net[].ipAddress of all VMs
+    - owners(ip) is a dict lookup, so checking a whole job is O(planned addresses)
+    Powered-off VMs and VMs without Tools report nothing and cannot be checked.
+    """
+
+    def __init__(self, owners=None):
+        self._owners = owners or {}  # address -> set of VM names
+        self.updated_at = time.time()
+
+    @classmethod
+    def build(cls, content):
+        owners = {}
+        for _, props in _iter_properties(
+            content, vim.VirtualMachine, ["name", "guest.ipAddress", "guest.net"]
+        ):
+            addresses = set()
+            if props.get("guest.ipAddress"):
+                addresses.add(props["guest.ipAddress"])
+            for nic in props.get("guest.net") or []:
+                addresses.update(nic.ipAddress or [])
+            for address in addresses:
+                owners.setdefault(address, set()).add(props.get("name"))
+        return cls(owners)
+
+    def __len__(self):
+        return len(self._owners)
+
+    def owners(self, ip):
+        return self._owners.get(ip, set())
+
+    def conflicts(self, vm_configs):
+        """
+        Return every conflict in the plan as (vm name, NIC number, ip, [owners])
+        Covers addresses already in use and addresses planned twice in the job.
+        """
+        found = []
+        planned = {}
+        for vmc in vm_configs:
+            for nic, ip in enumerate(vmc['ips'], 1):
+                if not ip:
+                    continue
+                owners = self.owners(ip)
+                if owners:
+                    found.append((vmc['name'], nic, ip, sorted(owners)))
+                if ip in planned:
+                    found.append((vmc['name'], nic, ip, [f"{planned[ip]} (this job)"]))
+                else:
+                    planned[ip] = vmc['name']
+        return found
+
+
+_ip_indexes = {}
+_ip_indexes_lock = threading.Lock()
 
-    content = si.RetrieveContent()
-    clusters = []
 
-    # Find the datacenter
-    dc_container = content.viewManager.CreateContainerView(
-        content.rootFolder, [vim.Datacenter], True
+def get_ip_index(vcenter_host, vcenter_user, vcenter_pass, max_age=None):
+    """Return the in-use IP index for (host, user), rebuilt after IP_INDEX_TTL seconds"""
+    max_age = IP_INDEX_TTL if max_age is None else max_age
+    key = (vcenter_host, vcenter_user)
+    with _ip_indexes_lock:
+        index = _ip_indexes.get(key)
+    if index and time.time() - index.updated_at < max_age:
+        return index
+    index = with_vcenter_session(
+        vcenter_host, vcenter_user, vcenter_pass,
+        lambda si: InUseIPIndex.build(si.content),
     )
+    with _ip_indexes_lock:
+        _ip_indexes[key] = index
+    return index
 
-    datacenter = None
-    for dc in dc_container.view:
-        if dc.name == datacenter_name:
-            datacenter = dc
-            break
 
-    dc_container.Destroy()
+def get_template_names(vcenter_host, vcenter_user, vcenter_pass):
+    """Get all VM templates from vCenter"""
+    index = _synced_index(vcenter_host, vcenter_user, vcenter_pass)
+    if index:
+        return index.template_names()
 
-    if datacenter:
-        cluster_container = content.viewManager.CreateContainerView(
-            datacenter, [vim.ClusterComputeResource], True
+    def fetch(si):
+        vms = _iter_properties(
+            si.content, vim.VirtualMachine, ["name", "config.template"]
         )
+        templates = [
+            props["name"] for _, props in vms
+            if props.get("config.template") and not is_replica_name(props["name"])
+        ]
+        return sorted(templates)
+
+    return with_vcenter_session(vcenter_host, vcenter_user, vcenter_pass, fetch)
+
+
+def get_datacenters(vcenter_host, vcenter_user, vcenter_pass):
+    """Get all datacenters from vCenter"""
+    index = _synced_index(vcenter_host, vcenter_user, vcenter_pass)
+    if index:
+        return index.datacenter_names()
 
-        for cluster in cluster_container.view:
-            clusters.append(cluster.name)
+    def fetch(si):
+        return sorted(_iter_names(si.content, vim.Datacenter))
 
-        cluster_container.Destroy()
+    return with_vcenter_session(vcenter_host, vcenter_user, vcenter_pass, fetch)
 
-    return sorted(clusters)
+
+def get_clusters(vcenter_host, vcenter_user, vcenter_pass, datacenter_name):
+    """Get all clusters in a specific datacenter"""
+    index = _synced_index(vcenter_host, vcenter_user, vcenter_pass)
+    if index:
+        return index.cluster_names(datacenter_name)
+
+    def fetch(si):
+        content = si.content
+        datacenter = find_datacenter_by_name(content, datacenter_name)
+        if not datacenter:
+            return []
+        return sorted(
+            _iter_names(content, vim.ClusterComputeResource, root=datacenter)
+        )
+
+    return with_vcenter_session(vcenter_host, vcenter_user, vcenter_pass, fetch)
 
 
 def get_networks(vcenter_host, vcenter_user, vcenter_pass, datacenter_name):
     """Get all networks in a specific datacenter"""
-    context = ssl._create_unverified_context()
-    si = SmartConnect(
-        host=vcenter_host, user=vcenter_user, pwd=vcenter_pass, sslContext=context
-    )
-    atexit.register(Disconnect, si)
+    index = _synced_index(vcenter_host, vcenter_user, vcenter_pass)
+    if index:
+        return index.network_names(datacenter_name)
 
-    content = si.RetrieveContent()
-    networks = []
+    def fetch(si):
+        content = si.content
+        datacenter = find_datacenter_by_name(content, datacenter_name)
+        if not datacenter:
+            return []
+        return sorted(_iter_names(content, vim.Network, root=datacenter))
 
-    # Find the datacenter
-    dc_container = content.viewManager.CreateContainerView(
-        content.rootFolder, [vim.Datacenter], True
-    )
+    return with_vcenter_session(vcenter_host, vcenter_user, vcenter_pass, fetch)
 
-    datacenter = None
-    for dc in dc_container.view:
-        if dc.name == datacenter_name:
-            datacenter = dc
-            break
 
-    dc_container.Destroy()
+def get_inventory_bootstrap(vcenter_host, vcenter_user, vcenter_pass):
+    """
+    Templates (with NIC counts), datacenters, clusters and networks in one document
+    Served from the sync index when ready, otherwise gathered over one pooled
+    session: a paged name-index pass plus the device lists of templates only.
+    """
+    index = _synced_index(vcenter_host, vcenter_user, vcenter_pass)
+    if index:
+        return index.bootstrap()
+
+    def build(si):
+        index = InventoryIndex.build(si.content)
+        index.load_template_devices(si.content)
+        return index
+
+    index = with_vcenter_session(vcenter_host, vcenter_user, vcenter_pass, build)
+    # The bootstrap index is a superset of the name index; reuse it for find_* lookups
+    with _name_indexes_lock:
+        _name_indexes[(vcenter_host, vcenter_user)] = index
+    return index.bootstrap()
+
+
+_discovery_executor = ThreadPoolExecutor(
+    max_workers=DISCOVERY_MAX_WORKERS, thread_name_prefix="vcenter-discovery"
+)
+
+# Resource kinds fetched per datacenter by discover_datacenter_resources
+DATACENTER_RESOURCE_TYPES = {
+    "clusters": vim.ClusterComputeResource,
+    "networks": vim.Network,
+    "datastores": vim.Datastore,
+    "resource_pools": vim.ResourcePool,
+}
+
+
+def find_resource_pool(content, cluster, pool_name):
+    """Return the resource pool (or vApp) named pool_name inside cluster, or None"""
+    matches = [
+        obj for obj, props in _iter_properties(content, vim.ResourcePool, ["name"], root=cluster)
+        if props.get("name") == pool_name
+    ]
+    if len(matches) > 1:
+        raise ValueError(f"Resource pool name '{pool_name}' is ambiguous in the cluster")
+    return matches[0] if matches else None
+
+
+def discover_datacenter_resources(vcenter_host, vcenter_user, vcenter_pass, datacenter_names):
+    """
+    Fetch clusters, networks, datastores and resource pools for one or more
+    datacenters in parallel over the pooled session
+    Returns {datacenter name: {kind: sorted names}}; unknown datacenters map to None.
+    """
+    if isinstance(datacenter_names, str):
+        datacenter_names = [datacenter_names]
+    wanted = set(datacenter_names)
+
+    def resolve(si):
+        # Datacenter-only view: cheap even when the inventory holds thousands of VMs
+        return {
+            props.get("name"): obj._moId
+            for obj, props in _iter_properties(si.content, vim.Datacenter, ["name"])
+            if props.get("name") in wanted
+        }
+
+    datacenter_ids = with_vcenter_session(vcenter_host, vcenter_user, vcenter_pass, resolve)
+
+    def fetch_names(datacenter_id, obj_type):
+        def fetch(si):
+            # MoRefs are bound to a session; rebind to the pooled one doing the fetch
+            datacenter = vim.Datacenter(datacenter_id, si.content.rootFolder._stub)
+            return sorted(set(_iter_names(si.content, obj_type, root=datacenter)))
+
+        return with_vcenter_session(vcenter_host, vcenter_user, vcenter_pass, fetch)
+
+    futures = {
+        (dc_name, kind): _discovery_executor.submit(fetch_names, datacenter_ids[dc_name], obj_type)
+        for dc_name in dict.fromkeys(datacenter_names)
+        if dc_name in datacenter_ids
+        for kind, obj_type in DATACENTER_RESOURCE_TYPES.items()
+    }
+    resources = {dc_name: None for dc_name in datacenter_names if dc_name not in datacenter_ids}
+    for (dc_name, kind), future in futures.items():
+        resources.setdefault(dc_name, {})[kind] = future.result()
+    return resources
 
-    if datacenter:
-        network_container = content.viewManager.CreateContainerView(
-            datacenter, [vim.Network], True
-        )
 
-        for network in network_container.view:
-            networks.append(network.name)
+_nic_count_memo = {}  # (host, template moId) -> (config.changeVersion, NIC count)
+_nic_count_memo_lock = threading.Lock()
 
-        network_container.Destroy()
 
-    return sorted(networks)
+def _count_nics(devices):
+    return len(
+        [
+            device
+            for device in (devices or [])
+            if isinstance(device, vim.vm.device.VirtualEthernetCard)
+        ]
+    )
 
 
 def get_nic_count(vcenter_host, vcenter_user, vcenter_pass, template_name):
     """Get the number of NICs in a template"""
-    context = ssl._create_unverified_context()
-    si = SmartConnect(
-        host=vcenter_host, user=vcenter_user, pwd=vcenter_pass, sslContext=context
-    )
-    atexit.register(Disconnect, si)
+    index = _synced_index(vcenter_host, vcenter_user, vcenter_pass)
+    if index:
+        nic_count = index.template_nic_count(template_name)
+        return nic_count if nic_count is not None else 1
+
+    name_index = get_name_index(vcenter_host, vcenter_user, vcenter_pass)
+
+    def fetch(si):
+        content = si.content
+        template_vm = _checked_hit(
+            name_index,
+            name_index.find_template(template_name, content.rootFolder._stub),
+            template_name,
+            lambda: find_vm_by_name(content, template_name),
+        )
+        if not template_vm:
+            return 1
+
+        # Cheap version probe; devices are only re-read when the template changed
+        key = (vcenter_host, template_vm._moId)
+        version = _object_properties(
+            content, template_vm, ["config.changeVersion"]
+        ).get("config.changeVersion")
+        with _nic_count_memo_lock:
+            memo = _nic_count_memo.get(key)
+        if memo and version is not None and memo[0] == version:
+            return memo[1]
+
+        props = _object_properties(
+            content, template_vm, ["config.changeVersion", "config.hardware.device"]
+        )
+        nic_count = _count_nics(props.get("config.hardware.device"))
+        with _nic_count_memo_lock:
+            _nic_count_memo[key] = (props.get("config.changeVersion"), nic_count)
+        return nic_count
+
+    return with_vcenter_session(vcenter_host, vcenter_user, vcenter_pass, fetch)
+
+
+def _checked_hit(index, obj, name, lookup):
+    """
+    Trust a live (synchronized) index as is; a bulk-built snapshot can be up to
+    NAME_INDEX_TTL old, so confirm its hit still has that name (deleted or renamed
+    objects fail the check) and use the direct lookup on a stale or missing hit
+    """
+    if index.live:
+        return obj
+    if obj is not None:
+        try:
+            if obj.name == name:
+                return obj
+        except Exception:
+            pass  # e.g. ManagedObjectNotFound: deleted since the snapshot
+    return lookup()
 
-    content = si.RetrieveContent()
 
-    container = content.viewManager.CreateContainerView(
-        content.rootFolder, [vim.VirtualMachine], True
+def find_vm_by_name(content, name, index=None):
+    """Find VM by name (O(1) through index when given)"""
+    lookup = lambda: _find_by_name(content, vim.VirtualMachine, name)
+    if index:
+        return _checked_hit(index, index.find("vm", name, content.rootFolder._stub), name, lookup)
+    return lookup()
+
+
+def find_datacenter_by_name(content, name, index=None):
+    """Find datacenter by name"""
+    lookup = lambda: _find_by_name(content, vim.Datacenter, name)
+    if index:
+        return _checked_hit(
+            index, index.find("datacenter", name, content.rootFolder._stub), name, lookup
+        )
+    return lookup()
+
+
+def find_cluster_by_name(datacenter, name, index=None):
+    """Find cluster by name in datacenter"""
+    lookup = lambda: _find_by_name(
+        _content_of(datacenter), vim.ClusterComputeResource, name, root=datacenter
     )
+    if index:
+        return _checked_hit(
+            index, index.find("cluster", name, datacenter._stub, datacenter=datacenter), name, lookup
+        )
+    return lookup()
 
-    for vm in container.view:
-        if vm.name == template_name and vm.config and vm.config.template:
-            nic_count = len(
-                [
-                    device
-                    for device in vm.config.hardware.device
-                    if isinstance(device, vim.vm.device.VirtualEthernetCard)
-                ]
+
+def find_network_by_name(datacenter, name, index=None):
+    """Find network by name in datacenter"""
+    lookup = lambda: _find_by_name(_content_of(datacenter), vim.Network, name, root=datacenter)
+    if index:
+        return _checked_hit(
+            index, index.find("network", name, datacenter._stub, datacenter=datacenter), name, lookup
+        )
+    return lookup()
+
+
+def _moid(managed_object):
+    return managed_object._moId if managed_object is not None else None
+
+
+TASK_MONITOR_PROPERTIES = ["info.state", "info.progress", "info.error"]
+TASK_DONE_STATES = ("success", "error")
+
+
+class TaskMonitor:
+    """
+    Watch many vCenter tasks through a single PropertyCollector filter
+
+    - Tasks are added to a ListView; one filter traverses the view for
+      info.state / info.progress / info.error
+    - wait() blocks in WaitForUpdatesEx and returns only the tasks that changed,
+      so no per-task polling is needed however many clones are in flight
+    """
+
+    def __init__(self, content, wait_seconds=TASK_MONITOR_WAIT_SECONDS):
+        self.wait_seconds = wait_seconds
+        self.tasks = {}  # task moid -> {state, progress, error}
+        self._collector = content.propertyCollector.CreatePropertyCollector()
+        self._view = content.viewManager.CreateListView([])
+        try:
+            self._collector.CreateFilter(
+                _view_multi_filter_spec(self._view, {vim.Task: TASK_MONITOR_PROPERTIES}),
+                partialUpdates=False,
             )
-            container.Destroy()
-            return nic_count
+        except Exception:
+            self.close()
+            raise
+        self._version = ""
 
-    container.Destroy()
-    return 1
+    def add(self, task):
+        self.tasks.setdefault(task._moId, {"state": None, "progress": None, "error": None})
+        self._view.ModifyListView(add=[task])
 
+    def remove(self, task):
+        self.tasks.pop(task._moId, None)
+        try:
+            self._view.ModifyListView(remove=[task])
+        except Exception:
+            pass
+
+    def state(self, task):
+        return self.tasks.get(task._moId, {})
+
+    def wait(self):
+        """Block until some watched task changes; return the moids that changed"""
+        options = vmodl.query.PropertyCollector.WaitOptions(maxWaitSeconds=self.wait_seconds)
+        update_set = self._collector.WaitForUpdatesEx(self._version, options)
+        if update_set is None:
+            return []  # maxWaitSeconds elapsed with no changes
+        self._version = update_set.version
+        changed = []
+        for filter_update in update_set.filterSet or []:
+            for obj_update in filter_update.objectSet or []:
+                entry = self.tasks.get(obj_update.obj._moId)
+                if entry is None:
+                    continue  # removed while the update was in flight
+                for change in obj_update.changeSet or []:
+                    key = change.name.split(".", 1)[1]
+                    entry[key] = change.val if change.op != "remove" else None
+                changed.append(obj_update.obj._moId)
+        return changed
+
+    def close(self):
+        for obj in (self._collector, self._view):
+            try:
+                obj.Destroy()
+            except Exception:
+                pass
 
-def find_vm_by_name(content, name):
-    """Find VM by name"""
-    container = content.viewManager.CreateContainerView(
-        content.rootFolder, [vim.VirtualMachine], True
-    )
 
-    for vm in container.view:
-        if vm.name == name:
-            container.Destroy()
-            return vm
+class CloneScheduler:
+    """
+    Run clone jobs with bounded concurrency: globally, per datastore and per ESXi host
+
+    Jobs start in submission order whenever their datastore and host have a free
+    slot (a job blocked on a busy datastore does not hold up the others), and a
+    new clone is submitted as soon as an earlier one finishes.
+    """
 
-    container.Destroy()
+    def __init__(
+        self,
+        max_in_flight=None,
+        max_per_datastore=None,
+        max_per_host=None,
+        poll_interval=CLONE_POLL_INTERVAL,
+        monitor=None,
+    ):
+        self.max_in_flight = max(1, max_in_flight or CLONE_MAX_IN_FLIGHT)
+        self.max_per_datastore = max(1, max_per_datastore or CLONE_MAX_PER_DATASTORE)
+        self.max_per_host = max(1, max_per_host or CLONE_MAX_PER_HOST)
+        self.poll_interval = poll_interval
+        self.monitor = monitor
+        self.in_flight = 0
+        self._jobs = []
+
+    def add(self, name, start, datastore=None, host=None, **data):
+        """
+        Queue a clone job
+        - start: callable that initiates the clone and returns its vim.Task
+        - datastore / host: placement used for the per-datastore / per-host limits
+        Finished jobs carry the task's final 'state' and 'task_error'.
+        """
+        job = dict(
+            data, name=name, start=start, datastore=datastore, host=host,
+            task=None, error=None, state=None, progress=None, task_error=None,
+            transitions=[],
+        )
+        self._jobs.append(job)
+        return job
+
+    def run(self):
+        """
+        Yield (event, job) with event in 'started', 'start_failed', 'progress', 'finished'
+        'progress' is yielded when a running task's state or progress changes; every
+        change is also kept in job['transitions'] as (timestamp, state, progress).
+        """
+        pending = list(self._jobs)
+        running = []
+        per_datastore = {}
+        per_host = {}
+        while pending or running:
+            for job in list(pending):
+                if len(running) >= self.max_in_flight:
+                    break
+                ds_key = _moid(job['datastore'])
+                host_key = _moid(job['host'])
+                if ds_key and per_datastore.get(ds_key, 0) >= self.max_per_datastore:
+                    continue
+                if host_key and per_host.get(host_key, 0) >= self.max_per_host:
+                    continue
+                pending.remove(job)
+                try:
+                    job['task'] = job['start']()
+                except Exception as e:
+                    job['error'] = e
+                    yield 'start_failed', job
+                    continue
+                if self.monitor:
+                    self.monitor.add(job['task'])
+                running.append(job)
+                per_datastore[ds_key] = per_datastore.get(ds_key, 0) + 1
+                per_host[host_key] = per_host.get(host_key, 0) + 1
+                self.in_flight = len(running)
+                yield 'started', job
+
+            if not running:
+                continue
+            done, progressed = self._wait_for_any(running)
+            for job in progressed:
+                yield 'progress', job
+            for job in done:
+                running.remove(job)
+                if self.monitor:
+                    self.monitor.remove(job['task'])
+                per_datastore[_moid(job['datastore'])] -= 1
+                per_host[_moid(job['host'])] -= 1
+                self.in_flight = len(running)
+                yield 'finished', job
+
+    def _wait_for_any(self, running):
+        """Block until a running task changes; return (finished jobs, jobs with new progress)"""
+        while True:
+            changed = self._refresh(running)
+            done = [job for job in running if job['state'] in TASK_DONE_STATES]
+            progressed = [job for job in changed if job not in done]
+            if done or progressed:
+                return done, progressed
+            if self.monitor:
+                self.monitor.wait()
+            else:
+                time.sleep(self.poll_interval)
+
+    def _refresh(self, running):
+        """Copy task state into the jobs, from the monitor or by reading task.info"""
+        changed = []
+        now = time.time()
+        for job in running:
+            if self.monitor:
+                info = self.monitor.state(job['task'])
+                state, progress, error = info.get('state'), info.get('progress'), info.get('error')
+            else:
+                info = job['task'].info
+                state, progress, error = info.state, info.progress, info.error
+            state = str(state) if state is not None else None
+            if (state, progress) != (job['state'], job['progress']):
+                job['transitions'].append((now, state, progress))
+                changed.append(job)
+            job['state'] = state
+            job['progress'] = progress
+            job['task_error'] = error
+        return changed
+
+
+CLONE_MODES = {
+    'full': "Full clone",
+    'linked': "Linked clone",
+    'instant': "Instant clone",
+}
+
+
+def _find_snapshot(snapshot_trees, name):
+    """Depth-first search of a snapshot tree for a snapshot by name"""
+    for tree in snapshot_trees or []:
+        if tree.name == name:
+            return tree.snapshot
+        found = _find_snapshot(tree.childSnapshotList, name)
+        if found:
+            return found
     return None
 
 
-def find_datacenter_by_name(content, name):
-    """Find datacenter by name"""
-    container = content.viewManager.CreateContainerView(
-        content.rootFolder, [vim.Datacenter], True
+def get_linked_clone_snapshot(template_vm, snapshot_name=None, logger=print):
+    """
+    Return the snapshot linked clones of template_vm should be based on
+    - Reuses the designated snapshot (VCENTER_LINKED_CLONE_SNAPSHOT) if present
+    - Otherwise uses the current snapshot
+    - Otherwise takes the designated snapshot, which only works on a VM;
+      a template without any snapshot raises ValueError
+    """
+    snapshot_name = snapshot_name or LINKED_CLONE_SNAPSHOT_NAME
+    snapshot_info = template_vm.snapshot
+    if snapshot_info:
+        snapshot = _find_snapshot(snapshot_info.rootSnapshotList, snapshot_name)
+        if snapshot:
+            logger(f"📸 Reusing snapshot '{snapshot_name}' for linked clones")
+            return snapshot
+        if snapshot_info.currentSnapshot:
+            logger(f"📸 Using current snapshot of {template_vm.name} for linked clones")
+            return snapshot_info.currentSnapshot
+
+    if template_vm.config.template:
+        raise ValueError(
+            f"Template '{template_vm.name}' has no snapshot; linked clones need one "
+            f"(convert it to a VM, take a snapshot named '{snapshot_name}' and convert it back)"
+        )
+
+    logger(f"📸 Taking snapshot '{snapshot_name}' of {template_vm.name} for linked clones")
+    WaitForTask(
+        template_vm.CreateSnapshot(
+            name=snapshot_name,
+            description="Base snapshot for linked clones",
+            memory=False,
+            quiesce=False,
+        )
     )
+    return _find_snapshot(template_vm.snapshot.rootSnapshotList, snapshot_name)
 
-    for dc in container.view:
-        if dc.name == name:
-            container.Destroy()
-            return dc
 
-    container.Destroy()
-    return None
+def check_instant_clone_parent(parent_vm):
+    """Instant clones fork a running VM; templates and powered-off VMs are rejected"""
+    if parent_vm.config.template:
+        raise ValueError(
+            f"'{parent_vm.name}' is a template; instant clones need a powered-on parent VM"
+        )
+    if parent_vm.runtime.powerState != vim.VirtualMachinePowerState.poweredOn:
+        raise ValueError(
+            f"Parent VM '{parent_vm.name}' is {parent_vm.runtime.powerState}; "
+            f"instant clones need it powered on"
+        )
 
 
-def find_cluster_by_name(datacenter, name):
-    """Find cluster by name in datacenter"""
-    container = datacenter.parent.viewManager.CreateContainerView(
-        datacenter, [vim.ClusterComputeResource], True
+def get_instant_clone_parents(vcenter_host, vcenter_user, vcenter_pass):
+    """
+    Powered-on, non-template VMs that can be instant-clone parents, with NIC counts
+    Power state changes too often to index or cache: one paged pass reads names,
+    template flags and power states, a second reads device lists of the eligible VMs only.
+    """
+    def fetch(si):
+        running = [
+            obj
+            for obj, props in _iter_properties(
+                si.content, vim.VirtualMachine, ["config.template", "runtime.powerState"]
+            )
+            if not props.get("config.template")
+            and props.get("runtime.powerState") == vim.VirtualMachinePowerState.poweredOn
+        ]
+        parents = [
+            {"name": props.get("name"), "nic_count": _count_nics(props.get("config.hardware.device"))}
+            for _, props in _iter_objects_properties(
+                si.content, running, vim.VirtualMachine, ["name", "config.hardware.device"]
+            )
+            if props.get("name")
+        ]
+        return sorted(parents, key=lambda parent: parent["name"])
+
+    return with_vcenter_session(vcenter_host, vcenter_user, vcenter_pass, fetch)
+
+
+def build_instant_clone_spec(parent_vm, vm_name, hostname, ip_list, location, logger=print, blueprint=None):
+    """
+    Build an InstantCloneSpec that hands per-VM identity to the guest via guestinfo
+    - guestinfo.hostname, guestinfo.ipaddress<N>, guestinfo.netmask<N>, guestinfo.gateway<N>
+      (NICs without an IP get guestinfo.ipaddress<N>=dhcp); a script in the parent
+      guest reads these with vmware-rpctool after the fork
+    - location: RelocateSpec with folder / pool / datastore for the child
+    - blueprint: CustomizationBlueprint of the parent, built here when not given
+    NIC backings are inherited from the parent; vSphere generates new MAC addresses.
+    """
+    if blueprint is None:
+        blueprint = CustomizationBlueprint.from_template(parent_vm, logger=logger)
+    options = [vim.option.OptionValue(key="guestinfo.hostname", value=hostname)]
+    for i, (nic, ip) in enumerate(zip(blueprint.nics, ip_list), 1):
+        if not ip:
+            options.append(vim.option.OptionValue(key=f"guestinfo.ipaddress{i}", value="dhcp"))
+            continue
+        options.append(vim.option.OptionValue(key=f"guestinfo.ipaddress{i}", value=ip))
+        options.append(vim.option.OptionValue(key=f"guestinfo.netmask{i}", value=nic['subnet_mask']))
+        if nic['gateway']:
+            options.append(vim.option.OptionValue(key=f"guestinfo.gateway{i}", value=nic['gateway']))
+        logger(f"🌐 NIC{i}: guestinfo IP {ip}/{nic['subnet_mask']}")
+
+    spec = vim.vm.InstantCloneSpec()
+    spec.name = vm_name
+    spec.location = location
+    spec.config = options
+    return spec
+
+
+REPLICA_NAME_MARKER = "__replica__"
+REPLICA_ANNOTATION_PREFIX = "template-replica:"
+REPLICA_LAST_USED_FIELD = "template-replica-last-used"
+
+
+def replica_name(template_name, datastore_name):
+    return f"{template_name}{REPLICA_NAME_MARKER}{datastore_name}"
+
+
+def is_replica_name(name):
+    return REPLICA_NAME_MARKER in (name or "")
+
+
+def _has_active_tasks(content, managed_object):
+    """True when vCenter has a queued or running task on managed_object (e.g. a clone from it)"""
+    tasks = _object_properties(content, managed_object, ["recentTask"]).get("recentTask") or []
+    return any(
+        props.get("info.state") in (vim.TaskInfo.State.queued, vim.TaskInfo.State.running)
+        for _, props in _iter_objects_properties(content, list(tasks), vim.Task, ["info.state"])
     )
 
-    for cluster in container.view:
-        if cluster.name == name:
-            container.Destroy()
-            return cluster
 
-    container.Destroy()
-    return None
+class TemplateReplicaManager:
+    """
+    Keep copies of frequently used templates on the datastores clones land on
+
+    - lookup() returns the replica of a template on a datastore when one exists and
+      was made from the template's current config.changeVersion
+    - note_use() counts clones per (template, datastore); once a pair reaches
+      min_uses a replica is created in the background
+    - Before a replica is created, and on lookups at most every check_seconds per
+      datastore, least-recently-used replicas on that datastore are destroyed until
+      its free space stays above min_free_percent
+    Replicas are templates named "<template>__replica__<datastore>" whose annotation
+    records the source template and changeVersion; the last time each was cloned
+    from is kept in a custom attribute, so eviction order survives restarts.
+    """
 
+    def __init__(
+        self,
+        min_uses=REPLICA_MIN_USES,
+        min_free_percent=REPLICA_MIN_FREE_PERCENT,
+        max_workers=REPLICA_MAX_WORKERS,
+        check_seconds=REPLICA_CHECK_SECONDS,
+    ):
+        self.min_uses = max(1, min_uses)
+        self.min_free_percent = min_free_percent
+        self.check_seconds = check_seconds
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(1, max_workers), thread_name_prefix="template-replica"
+        )
+        self._lock = threading.Lock()
+        self._uses = {}  # (vcenter, template moid, datastore moid) -> clones counted
+        self._replicas = {}  # (vcenter, template moid, datastore moid) -> replica VM
+        self._last_used = {}  # (vcenter, replica moid) -> last time cloned from
+        self._in_use = {}  # (vcenter, replica moid) -> running provisioning jobs
+        self._evicting = set()  # (vcenter, replica moid) leased for eviction
+        self._creating = set()
+        self._checked = {}  # (vcenter, datastore moid) -> last free-space check
+        self._field_keys = {}  # vcenter -> key of the last-used custom attribute
+
+    @staticmethod
+    def _annotation(template_moid, change_version):
+        return f"{REPLICA_ANNOTATION_PREFIX}{template_moid}:{change_version}"
+
+    def lookup(self, content, vcenter, template_vm, datastore, index=None, logger=print):
+        """
+        Return a current replica of template_vm on datastore (marked in use), or None
+        Call release() with the result once its clones have finished.
+        """
+        self._check_datastore(content, vcenter, datastore, logger)
+        template_props = _object_properties(
+            content, template_vm, ["name", "config.changeVersion", "datastore"]
+        )
+        if datastore._moId in {ds._moId for ds in template_props.get("datastore", [])}:
+            return None  # the template already lives on the target datastore
+        key = (vcenter, template_vm._moId, datastore._moId)
+        with self._lock:
+            replica = self._replicas.get(key)
+        if replica is None:
+            datastore_name = _object_properties(content, datastore, ["name"]).get("name")
+            replica = find_vm_by_name(
+                content, replica_name(template_props["name"], datastore_name), index=index
+            )
+        if replica is None:
+            return None
+        annotation = _object_properties(content, replica, ["config.annotation"]).get(
+            "config.annotation"
+        )
+        if annotation != self._annotation(template_vm._moId, template_props.get("config.changeVersion")):
+            return None  # made from an older version of the template
+        with self._lock:
+            replica_key = (vcenter, replica._moId)
+            if replica_key in self._evicting:
+                return None  # being destroyed to make room; clone from the template
+            self._replicas[key] = replica
+            self._last_used[replica_key] = time.time()
+            self._in_use[replica_key] = self._in_use.get(replica_key, 0) + 1
+        self._record_use(content, vcenter, replica, logger)
+        return replica
+
+    def _check_datastore(self, content, vcenter, datastore, logger):
+        """Evict idle replicas when datastore fell below the free-space threshold (throttled)"""
+        check_key = (vcenter, datastore._moId)
+        now = time.time()
+        with self._lock:
+            if now - self._checked.get(check_key, 0) < self.check_seconds:
+                return
+            self._checked[check_key] = now
+        try:
+            self._make_room(content, vcenter, datastore, 0, logger)
+        except Exception as e:
+            logger(f"⚠️ Template replica eviction failed: {str(e)}")
+
+    def _last_used_field_key(self, content, vcenter):
+        """Key of the custom attribute holding replica last-use times (created on first use)"""
+        with self._lock:
+            if vcenter in self._field_keys:
+                return self._field_keys[vcenter]
+        manager = content.customFieldsManager
+        field = next((f for f in manager.field or [] if f.name == REPLICA_LAST_USED_FIELD), None)
+        if field is None:
+            try:
+                field = manager.AddCustomFieldDef(
+                    name=REPLICA_LAST_USED_FIELD, moType=vim.VirtualMachine
+                )
+            except vim.fault.DuplicateName:
+                field = next(f for f in manager.field if f.name == REPLICA_LAST_USED_FIELD)
+        with self._lock:
+            self._field_keys[vcenter] = field.key
+        return field.key
 
-def find_network_by_name(datacenter, name):
-    """Find network by name in datacenter"""
-    container = datacenter.parent.viewManager.CreateContainerView(
-        datacenter, [vim.Network], True
+    def _record_use(self, content, vcenter, replica, logger):
+        try:
+            content.customFieldsManager.SetField(
+                entity=replica,
+                key=self._last_used_field_key(content, vcenter),
+                value=str(int(time.time())),
+            )
+        except Exception as e:
+            logger(f"⚠️ Could not record replica last use: {str(e)}")
+
+    def _stored_last_used(self, content, vcenter, custom_values):
+        """Last-use time persisted on a replica, or 0 when it was never recorded"""
+        with self._lock:
+            field_key = self._field_keys.get(vcenter)
+        if field_key is None:
+            try:
+                field_key = self._last_used_field_key(content, vcenter)
+            except Exception:
+                return 0
+        for value in custom_values or []:
+            if value.key == field_key:
+                try:
+                    return float(value.value)
+                except (TypeError, ValueError):
+                    return 0
+        return 0
+
+    def release(self, vcenter, replica):
+        with self._lock:
+            replica_key = (vcenter, replica._moId)
+            self._last_used[replica_key] = time.time()
+            self._in_use[replica_key] = max(0, self._in_use.get(replica_key, 0) - 1)
+
+    def note_use(self, vcenter, template_vm, datastore, pool, clones=1, logger=print):
+        """Count clones of template_vm onto datastore; start a replica once it is used enough"""
+        key = (vcenter, template_vm._moId, datastore._moId)
+        with self._lock:
+            self._uses[key] = self._uses.get(key, 0) + clones
+            if self._uses[key] < self.min_uses or key in self._creating:
+                return False
+            self._creating.add(key)
+        self._executor.submit(self._create, key, template_vm, datastore, pool, logger)
+        return True
+
+    def _create(self, key, template_vm, datastore, pool, logger):
+        content = _content_of(template_vm)
+        try:
+            template_props = _object_properties(
+                content, template_vm,
+                ["name", "parent", "config.changeVersion", "summary.storage.committed"],
+            )
+            datastore_name = _object_properties(content, datastore, ["name"]).get("name")
+            name = replica_name(template_props["name"], datastore_name)
+            needed = template_props.get("summary.storage.committed") or 0
+            if not self._make_room(content, key[0], datastore, needed, logger):
+                logger(f"⚠️ Not enough free space on {datastore_name} for replica '{name}'")
+                return
+            logger(f"🧬 Creating template replica '{name}' in the background")
+            spec = vim.vm.CloneSpec(
+                location=vim.vm.RelocateSpec(datastore=datastore, pool=pool),
+                template=True,
+                powerOn=False,
+                config=vim.vm.ConfigSpec(
+                    annotation=self._annotation(
+                        template_vm._moId, template_props.get("config.changeVersion")
+                    )
+                ),
+            )
+            task = template_vm.Clone(folder=template_props["parent"], name=name, spec=spec)
+            WaitForTask(task)
+            replica = task.info.result
+            with self._lock:
+                self._replicas[key] = replica
+                self._last_used[(key[0], replica._moId)] = time.time()
+            self._record_use(content, key[0], replica, logger)
+            logger(f"🧬 Template replica '{name}' ready on {datastore_name}")
+        except Exception as e:
+            logger(f"⚠️ Template replica creation failed: {str(e)}")
+        finally:
+            with self._lock:
+                self._creating.discard(key)
+
+    def _make_room(self, content, vcenter, datastore, needed, logger):
+        """
+        Destroy least-recently-used idle replicas until needed bytes fit above the threshold
+        A replica is leased before it is destroyed so lookup() stops handing it out, and
+        kept when vCenter still has clone tasks running from it (e.g. another app instance).
+        """
+        summary = _object_properties(
+            content, datastore, ["summary.freeSpace", "summary.capacity"]
+        )
+        free = summary.get("summary.freeSpace") or 0
+        capacity = summary.get("summary.capacity") or 0
+        if not capacity:
+            return False
+        reserve = capacity * self.min_free_percent / 100
+        if free - needed >= reserve:
+            return True
+
+        replicas = [
+            (vm, props)
+            for vm, props in _iter_properties(
+                content, vim.VirtualMachine,
+                [
+                    "name", "config.annotation", "datastore", "summary.storage.committed",
+                    "customValue",
+                ],
+            )
+            if (props.get("config.annotation") or "").startswith(REPLICA_ANNOTATION_PREFIX)
+            and datastore._moId in {ds._moId for ds in props.get("datastore", [])}
+        ]
+        stored = {
+            vm._moId: self._stored_last_used(content, vcenter, props.get("customValue"))
+            for vm, props in replicas
+        }
+        with self._lock:
+            replicas = [
+                (vm, props) for vm, props in replicas
+                if not self._in_use.get((vcenter, vm._moId))
+            ]
+            replicas.sort(key=lambda item: self._last_used.get(
+                (vcenter, item[0]._moId), stored[item[0]._moId]
+            ))
+        for vm, props in replicas:
+            if free - needed >= reserve:
+                break
+            replica_key = (vcenter, vm._moId)
+            with self._lock:
+                if self._in_use.get(replica_key):
+                    continue  # a job picked it up since the list was taken
+                self._evicting.add(replica_key)
+            try:
+                if _has_active_tasks(content, vm):
+                    logger(f"⏭️ Keeping replica '{props['name']}': tasks are still running from it")
+                    continue
+                logger(f"🧹 Evicting least recently used replica '{props['name']}'")
+                WaitForTask(vm.Destroy())
+                free += props.get("summary.storage.committed") or 0
+                with self._lock:
+                    for key, replica in list(self._replicas.items()):
+                        if replica._moId == vm._moId:
+                            del self._replicas[key]
+                    self._last_used.pop(replica_key, None)
+            finally:
+                with self._lock:
+                    self._evicting.discard(replica_key)
+        return free - needed >= reserve
+
+
+_replica_manager = TemplateReplicaManager()
+
+
+def get_replica_manager():
+    return _replica_manager
+
+
+PLACEMENT_PROPERTIES = {
+    vim.Datastore: [
+        "name",
+        "summary.accessible",
+        "summary.maintenanceMode",
+        "summary.freeSpace",
+        "summary.capacity",
+        "summary.uncommitted",
+    ],
+    vim.HostSystem: [
+        "name",
+        "datastore",
+        "runtime.connectionState",
+        "runtime.inMaintenanceMode",
+        "summary.hardware.memorySize",
+        "summary.quickStats.overallMemoryUsage",
+    ],
+}
+
+
+def _cluster_placement_properties(content, cluster):
+    """Read placement properties of every datastore and host of a cluster in one call"""
+    traversals = [
+        vmodl.query.PropertyCollector.TraversalSpec(
+            name=f"cluster_{path}", path=path, skip=False, type=vim.ClusterComputeResource
+        )
+        for path in ("datastore", "host")
+    ]
+    spec = vmodl.query.PropertyCollector.FilterSpec(
+        objectSet=[
+            vmodl.query.PropertyCollector.ObjectSpec(obj=cluster, skip=True, selectSet=traversals)
+        ],
+        propSet=[
+            vmodl.query.PropertyCollector.PropertySpec(type=obj_type, pathSet=path_set, all=False)
+            for obj_type, path_set in PLACEMENT_PROPERTIES.items()
+        ],
     )
+    collector = content.propertyCollector
+    result = collector.RetrievePropertiesEx([spec], vmodl.query.PropertyCollector.RetrieveOptions())
+    objects = []
+    while result:
+        objects.extend(
+            (obj_content.obj, {prop.name: prop.val for prop in obj_content.propSet})
+            for obj_content in result.objects
+        )
+        if not result.token:
+            break
+        result = collector.ContinueRetrievePropertiesEx(result.token)
+    return objects
 
-    for network in container.view:
-        if network.name == name:
-            container.Destroy()
-            return network
 
-    container.Destroy()
-    return None
+def _place_most_free(candidates, placements):
+    return max(candidates, key=lambda c: c['free'])
+
+
+def _place_round_robin(candidates, placements):
+    return sorted(candidates, key=lambda c: c['name'])[placements % len(candidates)]
+
+
+def _placement_weight(candidate):
+    """Free bytes, less what thin disks could still grow beyond capacity (datastores only)"""
+    overcommitted = max(candidate.get('provisioned', 0) - candidate.get('capacity', 0), 0)
+    return max(candidate['free'] - overcommitted, 1)
+
+
+def _place_weighted(candidates, placements):
+    # Proportional share without randomness: each candidate gets clones in proportion
+    # to its weight (lowest (placed + 1) / weight wins); ties go to the name
+    return min(
+        candidates,
+        key=lambda c: ((c['placed'] + 1) / _placement_weight(c), c['name'] or ""),
+    )
+
+
+# Policies pick one candidate ({obj, name, free, placed, ...}) given the number of
+# datastore (or host) placements made so far
+PLACEMENT_POLICIES = {
+    'most-free': _place_most_free,
+    'round-robin': _place_round_robin,
+    'weighted': _place_weighted,
+}
+
+
+def _format_bytes(size):
+    for unit in ("B", "KB", "MB", "GB", "TB"):
+        if abs(size) < 1024 or unit == "TB":
+            return f"{size:.1f} {unit}" if unit != "B" else f"{size} B"
+        size /= 1024
+
+
+class PlacementEngine:
+    """
+    Spread clones across the datastores and hosts of a cluster
+
+    - Datastores must be accessible, not in maintenance and keep disk_bytes free
+      after the clones already placed on them in this job
+    - Hosts must be connected, not in maintenance, mount the chosen datastore and
+      keep memory_bytes free after the clones already placed on them
+    - The policy (PLACEMENT_POLICIES) picks among eligible datastores by free space
+      (weighted also discounts overcommitted thin provisioning) and among eligible
+      hosts by free memory; datastores and hosts keep separate placement counters
+    """
+
+    def __init__(self, datastores, hosts, policy=None, disk_bytes=0, memory_mb=0):
+        self.policy_name = policy or PLACEMENT_POLICY
+        if self.policy_name not in PLACEMENT_POLICIES:
+            raise ValueError(f"Unknown placement policy '{self.policy_name}'")
+        self.policy = PLACEMENT_POLICIES[self.policy_name]
+        self.datastores = datastores
+        self.hosts = hosts
+        self.disk_bytes = disk_bytes or 0
+        self.memory_bytes = (memory_mb or 0) * 1024 * 1024
+        for candidate in self.datastores + self.hosts:
+            candidate.setdefault('placed', 0)
+        self._datastore_placements = 0
+        self._host_placements = 0
+
+    @classmethod
+    def for_cluster(cls, content, cluster, policy=None, disk_bytes=0, memory_mb=0):
+        datastores, hosts = [], []
+        for obj, props in _cluster_placement_properties(content, cluster):
+            if isinstance(obj, vim.Datastore):
+                capacity = props.get("summary.capacity") or 0
+                free = props.get("summary.freeSpace") or 0
+                datastores.append({
+                    'obj': obj,
+                    'name': props.get("name"),
+                    'free': free,
+                    'capacity': capacity,
+                    'provisioned': capacity - free + (props.get("summary.uncommitted") or 0),
+                    'eligible': bool(props.get("summary.accessible"))
+                    and props.get("summary.maintenanceMode") in (None, "normal"),
+                })
+            else:
+                memory = props.get("summary.hardware.memorySize") or 0
+                used = (props.get("summary.quickStats.overallMemoryUsage") or 0) * 1024 * 1024
+                hosts.append({
+                    'obj': obj,
+                    'name': props.get("name"),
+                    'free': memory - used,
+                    'datastores': {ds._moId for ds in props.get("datastore", [])},
+                    'eligible': props.get("runtime.connectionState") == "connected"
+                    and not props.get("runtime.inMaintenanceMode"),
+                })
+        return cls(datastores, hosts, policy=policy, disk_bytes=disk_bytes, memory_mb=memory_mb)
+
+    def summary(self):
+        return (
+            f"{self.policy_name} across "
+            f"{sum(1 for ds in self.datastores if ds['eligible'])}/{len(self.datastores)} datastores, "
+            f"{sum(1 for host in self.hosts if host['eligible'])}/{len(self.hosts)} hosts"
+        )
+
+    def place(self):
+        """Pick (datastore candidate, host candidate or None) for the next clone"""
+        datastores = [
+            ds for ds in self.datastores
+            if ds['eligible'] and ds['free'] - self.disk_bytes > 0
+        ]
+        if not datastores:
+            raise Exception("No accessible datastore in the cluster has room for another clone")
+        datastore = self.policy(datastores, self._datastore_placements)
+        hosts = [
+            host for host in self.hosts
+            if host['eligible'] and datastore['obj']._moId in host['datastores']
+            and host['free'] - self.memory_bytes >= 0
+        ]
+        host = self.policy(hosts, self._host_placements) if hosts else None
+        # Account for this clone so the next decision sees the remaining capacity
+        datastore['free'] -= self.disk_bytes
+        datastore['provisioned'] += self.disk_bytes
+        datastore['placed'] += 1
+        self._datastore_placements += 1
+        if host:
+            host['free'] -= self.memory_bytes
+            host['placed'] += 1
+            self._host_placements += 1
+        return datastore, host
+
+
+def parse_ip_spec(spec, default_mask=None):
+    """
+    Parse a bulk NIC entry into (first address, network)
+    - "10.0.0.10": start there, in the network given by default_mask (/24 if unknown)
+    - "10.0.0.10/24" or "10.0.0.10/255.255.255.0": start there, in that network
+    - "10.0.0.0/24": the whole network
+    """
+    spec = spec.strip()
+    if "/" not in spec:
+        spec = f"{spec}/{default_mask or DEFAULT_SUBNET_MASK}"
+    try:
+        interface = ipaddress.IPv4Interface(spec)
+    except ValueError as e:
+        raise ValueError(f"Invalid IP or CIDR '{spec}': {e}")
+    return interface.ip, interface.network
+
+
+def parse_reserved_ranges(entries):
+    """Turn "ip", "ip-ip" or CIDR entries (list or comma-separated string) into sorted int ranges"""
+    if isinstance(entries, str):
+        entries = entries.split(",")
+    ranges = []
+    for entry in entries or []:
+        entry = entry.strip()
+        if not entry:
+            continue
+        if "-" in entry:
+            first, last = (ipaddress.IPv4Address(part.strip()) for part in entry.split("-", 1))
+        elif "/" in entry:
+            network = ipaddress.IPv4Network(entry, strict=False)
+            first, last = network.network_address, network.broadcast_address
+        else:
+            first = last = ipaddress.IPv4Address(entry)
+        ranges.append((int(first), int(last)))
+    return sorted(ranges)
+
+
+def allocate_ips(spec, count, gateway=None, reserved=None, default_mask=None):
+    """
+    Allocate count consecutive free addresses for one NIC in a single pass
+    Skips the network and broadcast addresses, the gateway and reserved ranges,
+    and never leaves the network. Raises ValueError if the network runs out.
+    """
+    start, network = parse_ip_spec(spec, default_mask)
+    skip = {int(ipaddress.IPv4Address(gateway))} if gateway else set()
+    if network.prefixlen < 31:
+        skip.update((int(network.network_address), int(network.broadcast_address)))
+    ranges = parse_reserved_ranges(reserved if reserved is not None else IP_RESERVED)
+
+    addresses = []
+    current = max(int(start), int(network.network_address))
+    last = int(network.broadcast_address)
+    range_idx = 0
+    while current <= last and len(addresses) < count:
+        while range_idx < len(ranges) and ranges[range_idx][1] < current:
+            range_idx += 1
+        if range_idx < len(ranges) and ranges[range_idx][0] <= current:
+            current = ranges[range_idx][1] + 1  # jump over the reserved range
+            continue
+        if current not in skip:
+            addresses.append(str(ipaddress.IPv4Address(current)))
+        current += 1
+
+    if len(addresses) < count:
+        raise ValueError(
+            f"Network {network} has only {len(addresses)} free addresses from {start}; "
+            f"{count} are needed"
+        )
+    return addresses, network
+
+
+def plan_bulk_ips(ip_map, count, blueprint=None, reserved=None):
+    """
+    Allocate every VM's IPs before any clone starts
+    - ip_map: {"net1": "10.0.0.10" or CIDR, ...}; NICs without an entry use DHCP
+    - blueprint: CustomizationBlueprint supplying each NIC's default mask and gateway
+    Returns (rows, networks): rows[i] is VM i's list of 9 IPs (None = DHCP) and
+    networks[n] the IPv4Network used for NIC n+1 (None when unset).
+    """
+    columns = []
+    networks = []
+    for nic_idx in range(1, 10):
+        spec = ip_map.get(f"net{nic_idx}")
+        if not spec:
+            columns.append([None] * count)
+            networks.append(None)
+            continue
+        nic = blueprint.nics[nic_idx - 1] if blueprint and nic_idx <= len(blueprint.nics) else {}
+        try:
+            addresses, network = allocate_ips(
+                spec,
+                count,
+                gateway=nic.get('gateway'),
+                reserved=reserved,
+                default_mask=nic.get('subnet_mask'),
+            )
+        except ValueError as e:
+            raise ValueError(f"NIC{nic_idx}: {e}")
+        columns.append(addresses)
+        networks.append(network)
+    return [list(row) for row in zip(*columns)], networks
+
+
+def _transition_time(job):
+    """Wall-clock time of a job's latest task state/progress transition"""
+    if not job['transitions']:
+        return datetime.now().strftime('%H:%M:%S')
+    return datetime.fromtimestamp(job['transitions'][-1][0]).strftime('%H:%M:%S')
 
 
 def configure_vm_network(vm, network, ip_map, logger):
@@ -468,8 +2444,46 @@ def provision_vms(
     logger=print,
     timeout_seconds=30,  # This will now only apply to connection/discovery
     individual_nodes_data=None,  # เพิ่ม argument สำหรับ individual mode
+    max_concurrent_clones=None,
+    max_clones_per_datastore=None,
+    max_clones_per_host=None,
+    clone_mode='full',
+    vm_results=None,
+    placement_policy=None,
+    resource_pool_name=None,
+    journal=None,
+    resume_vms=None,
+    emit=None,
 ):
-    """Provision VMs from template with per-VM customization (hostname, static IP)"""
+    """
+    Provision VMs from template with per-VM customization (hostname, static IP)
+    - max_concurrent_clones / max_clones_per_datastore / max_clones_per_host:
+      clone scheduler limits (default from VCENTER_CLONE_MAX_* settings)
+    - clone_mode: 'full', 'linked' (child disks on a template snapshot) or
+      'instant' (InstantClone_Task from the powered-on VM named by template)
+    - placement_policy: 'most-free', 'round-robin' or 'weighted' datastore/host
+      spreading (default VCENTER_PLACEMENT_POLICY)
+    - resource_pool_name: resource pool (or vApp) inside the cluster that receives
+      the clones (default the cluster's root pool)
+    - vm_results: optional list that receives one result dict per VM
+      (name, hostname, status, ips), as also logged in "VM<n>: {json}" lines
+    - journal: optional recorder with plan(vm_configs) and
+      phase(name, phase, task_moid=None, error=None) (see job_journal.JobRecorder)
+    - resume_vms: journaled VMs of an interrupted job ({name, hostname, ips,
+      phase, task_moid}); running tasks are adopted, succeeded VMs skipped, VMs that
+      exist without having succeeded reported as failed (they need checking or
+      cleanup) and only the rest is cloned
+    - emit: optional emit(event_type, data) callback for typed lifecycle events
+      next to the log lines: vm.started, vm.clone_progress, vm.cloned,
+      vm.customized, vm.powered_on, vm.ready, vm.failed, job.completed, job.failed
+    """
+    def emit_event(event_type, **data):
+        if emit:
+            emit(event_type, data)
+
+    clone_mode = clone_mode or 'full'
+    if clone_mode not in CLONE_MODES:
+        raise ValueError(f"Unknown clone mode '{clone_mode}'")
     logger(f"🚀 Starting VM provisioning...")
     logger(f"📋 Template: {template}")
     logger(f"📋 Prefix: {prefix}")
@@ -477,18 +2491,17 @@ def provision_vms(
     logger(f"📋 Datacenter: {datacenter_name}")
     logger(f"📋 Cluster: {cluster_name}")
     logger(f"📋 Network: {network_name}")
+    logger(f"📋 Clone mode: {CLONE_MODES[clone_mode]}")
     logger(f"⏱️  Timeout setting (connection/discovery only): {timeout_seconds} seconds")
     start_time = time.time()
+    si = None
     try:
         # Connection timeout check
         logger(f"🔌 Connecting to vCenter: {vcenter_host}")
         connection_start = time.time()
         try:
-            context = ssl._create_unverified_context()
-            si = SmartConnect(
-                host=vcenter_host, user=vcenter_user, pwd=vcenter_pass, sslContext=context
-            )
-            atexit.register(Disconnect, si)
+            # Leased for the whole job so the pool never logs it out mid-clone
+            si = _session_pool.acquire(vcenter_host, vcenter_user, vcenter_pass, lease=True)
             connection_time = time.time() - connection_start
             logger(f"✅ Connected to vCenter (took {connection_time:.2f}s)")
         except Exception as conn_error:
@@ -508,14 +2521,27 @@ def provision_vms(
             logger(f"⏰ Timeout exceeded ({elapsed_time:.1f}s > {timeout_seconds}s) during connection phase")
             raise Exception(f"Operation timed out during vCenter connection")
 
-        content = si.RetrieveContent()
+        content = si.content
 
         # Resource discovery with timeout check
         logger(f"🔍 Discovering vCenter resources...")
         discovery_start = time.time()
 
+        # Name -> MoRef index (live sync index or one bulk fetch) for O(1) lookups
+        try:
+            name_index = get_name_index(vcenter_host, vcenter_user, vcenter_pass)
+        except Exception as index_error:
+            logger(f"⚠️ Inventory index unavailable, falling back to scans: {str(index_error)}")
+            name_index = None
+
         # Find required objects with individual timeout checks
-        template_vm = find_vm_by_name(content, template)
+        try:
+            template_vm = find_vm_by_name(content, template, index=name_index)
+        except DuplicateNameError as dup_error:
+            logger(f"❌ Template name '{template}' is ambiguous:")
+            for path in dup_error.paths:
+                logger(f"   • {path}")
+            raise
         if not template_vm:
             logger(f"❌ Template '{template}' not found")
             logger(f"💡 Please verify:")
@@ -524,12 +2550,23 @@ def provision_vms(
             logger(f"   • User has permissions to access template")
             raise Exception(f"Template '{template}' not found")
 
+        # Linked clones need a snapshot on the template; check before any clone starts
+        linked_snapshot = None
+        if clone_mode == 'linked':
+            linked_snapshot = get_linked_clone_snapshot(template_vm, logger=logger)
+        elif clone_mode == 'instant':
+            check_instant_clone_parent(template_vm)
+
         elapsed_time = time.time() - start_time
         if elapsed_time > timeout_seconds:
             logger(f"⏰ Timeout exceeded ({elapsed_time:.1f}s > {timeout_seconds}s) during template discovery")
             raise Exception(f"Operation timed out while finding template")
 
-        datacenter = find_datacenter_by_name(content, datacenter_name)
+        try:
+            datacenter = find_datacenter_by_name(content, datacenter_name, index=name_index)
+        except DuplicateNameError as dup_error:
+            logger(f"❌ Datacenter name '{datacenter_name}' is ambiguous: {', '.join(dup_error.paths)}")
+            raise
         if not datacenter:
             logger(f"❌ Datacenter '{datacenter_name}' not found")
             logger(f"💡 Available datacenters should be verified")
@@ -540,7 +2577,11 @@ def provision_vms(
             logger(f"⏰ Timeout exceeded ({elapsed_time:.1f}s > {timeout_seconds}s) during datacenter discovery")
             raise Exception(f"Operation timed out while finding datacenter")
 
-        cluster = find_cluster_by_name(datacenter, cluster_name)
+        try:
+            cluster = find_cluster_by_name(datacenter, cluster_name, index=name_index)
+        except DuplicateNameError as dup_error:
+            logger(f"❌ Cluster name '{cluster_name}' is ambiguous: {', '.join(dup_error.paths)}")
+            raise
         if not cluster:
             logger(f"❌ Cluster '{cluster_name}' not found in datacenter '{datacenter_name}'")
             logger(f"💡 Please verify cluster name and permissions")
@@ -551,7 +2592,11 @@ def provision_vms(
             logger(f"⏰ Timeout exceeded ({elapsed_time:.1f}s > {timeout_seconds}s) during cluster discovery")
             raise Exception(f"Operation timed out while finding cluster")
 
-        network = find_network_by_name(datacenter, network_name)
+        try:
+            network = find_network_by_name(datacenter, network_name, index=name_index)
+        except DuplicateNameError as dup_error:
+            logger(f"❌ Network name '{network_name}' is ambiguous: {', '.join(dup_error.paths)}")
+            raise
         if not network:
             logger(f"❌ Network '{network_name}' not found in datacenter '{datacenter_name}'")
             logger(f"💡 Please verify network name and accessibility")
@@ -566,22 +2611,51 @@ def provision_vms(
             logger(f"⏰ Timeout exceeded ({elapsed_time:.1f}s > {timeout_seconds}s) during resource discovery")
             raise Exception(f"Operation timed out during resource discovery")
 
-        # Get resource pool (default to cluster's root resource pool)
-        resource_pool = cluster.resourcePool
+        # Resource pool: the one named in the request, which must belong to the cluster,
+        # otherwise the cluster's root resource pool
+        if resource_pool_name:
+            resource_pool = find_resource_pool(content, cluster, resource_pool_name)
+            if resource_pool is None:
+                logger(f"❌ Resource pool '{resource_pool_name}' not found in cluster '{cluster_name}'")
+                raise Exception(f"Resource pool '{resource_pool_name}' not found in cluster '{cluster_name}'")
+            logger(f"📍 Resource pool: {resource_pool_name}")
+        else:
+            resource_pool = cluster.resourcePool
+            logger(f"📍 Resource pool: cluster root pool of '{cluster_name}'")
         # VM folder (default to datacenter's vm folder)
         vm_folder = datacenter.vmFolder
-        # Get datastore (use first available datastore in cluster)
-        datastore = cluster.datastore[0] if cluster.datastore else None
-        if not datastore:
+        # Placement: spread clones over the cluster's datastores and hosts
+        template_sizing = _object_properties(
+            content, template_vm, ["summary.storage.committed", "config.hardware.memoryMB"]
+        )
+        placement = PlacementEngine.for_cluster(
+            content,
+            cluster,
+            policy=placement_policy,
+            disk_bytes=template_sizing.get("summary.storage.committed") if clone_mode == 'full' else 0,
+            memory_mb=template_sizing.get("config.hardware.memoryMB"),
+        )
+        if not any(ds['eligible'] for ds in placement.datastores):
             logger(f"❌ No datastore available in cluster '{cluster_name}'")
             logger(f"💡 Cluster must have at least one accessible datastore")
             raise Exception("No datastore available in cluster")
-        logger(f"📁 Using datastore: {datastore.name}")
+        logger(f"📍 Placement policy: {placement.summary()}")
+
+        os_type = 'windows' if 'win' in template.lower() else 'linux'
+
+        # Template NICs, networks, masks and gateways are resolved once for the job
+        blueprint = CustomizationBlueprint.from_template(
+            template_vm, datacenter=datacenter, os_type=os_type, logger=logger
+        )
 
         # Start cloning VMs (NO timeout for the provisioning process itself)
-        clone_tasks = []
         vm_configs = []
-        if individual_nodes_data and len(individual_nodes_data) > 0:
+        if resume_vms:
+            # Resume: the plan (names, hostnames, IPs) comes from the job journal
+            logger(f"♻️ Resuming job: {len(resume_vms)} planned VMs")
+            for vm in resume_vms:
+                vm_configs.append({'name': vm['name'], 'hostname': vm['hostname'], 'ips': vm['ips']})
+        elif individual_nodes_data and len(individual_nodes_data) > 0:
             # Individual mode: ใช้ข้อมูลแต่ละ node
             logger(f"👥 Individual node provisioning mode: {len(individual_nodes_data)} unique VMs")
             for idx, node in enumerate(individual_nodes_data, 1):
@@ -597,157 +2671,348 @@ def provision_vms(
         else:
             # Bulk mode: auto-increment IP, ตั้งชื่อ, สร้าง spec ให้แต่ละ VM
             logger(f"📦 Bulk provisioning mode: {count} VMs with prefix '{prefix}'")
-            def increment_ip(ip, n):
-                parts = list(map(int, ip.split('.')))
-                parts[-1] += n
-                for i in range(3, 0, -1):
-                    if parts[i] > 255:
-                        parts[i] -= 256
-                        parts[i-1] += 1
-                return '.'.join(map(str, parts))
-            ip_bases = []
-            for nic_idx in range(1, 10):
-                ip = ip_map.get(f"net{nic_idx}")
-                ip_bases.append(ip if ip else None)
+            # Every VM's addresses are planned up front; a pool too small fails here
+            ip_rows, ip_networks = plan_bulk_ips(ip_map, count, blueprint=blueprint)
+            for nic_idx, network in enumerate(ip_networks):
+                if network is None:
+                    continue
+                logger(f"🧮 NIC{nic_idx + 1}: {count} addresses allocated in {network}")
+                if "/" in ip_map[f"net{nic_idx + 1}"] and nic_idx < len(blueprint.nics):
+                    # An explicit CIDR overrides the mask from the template network's IP pool
+                    blueprint.nics[nic_idx]['subnet_mask'] = str(network.netmask)
             for i in range(count):
                 vm_name = f"{prefix}{i+1:02d}"
                 hostname = vm_name
-                ips = []
-                for base in ip_bases:
-                    if base:
-                        ips.append(increment_ip(base, i))
-                    else:
-                        ips.append(None)
-                vm_configs.append({'name': vm_name, 'hostname': hostname, 'ips': ips})
+                vm_configs.append({'name': vm_name, 'hostname': hostname, 'ips': ip_rows[i]})
         
         logger(f"🔢 Preparing to provision {len(vm_configs)} VMs...")
-        
-        # Process each VM with detailed logging (similar to demo mode)
-        for idx, vmc in enumerate(vm_configs, 1):
+
+        def record(vm_name, phase, **info):
+            # The journal must never stop provisioning
+            if journal is None:
+                return
+            try:
+                journal.phase(vm_name, phase, **info)
+            except Exception as e:
+                logger(f"⚠️ Job journal write failed: {str(e)}")
+
+        if journal is not None:
+            try:
+                journal.plan(vm_configs)
+            except Exception as e:
+                logger(f"⚠️ Job journal write failed: {str(e)}")
+
+        # On resume, adopt every clone task vCenter still knows about: running ones are
+        # watched to the end, and ones that finished while the app was down are reported
+        # (and journaled) by the scheduler's finish path with their real outcome. VMs that
+        # already succeeded are skipped; a VM that exists while its task is gone may be
+        # half-built, so it is reported as failed for the operator to check or delete
+        completed_vms = []
+        leftover_vms = []
+        adopted_tasks = {}
+        if resume_vms:
+            existing = set(_iter_names(content, vim.VirtualMachine))
+            for vm in resume_vms:
+                if vm.get('task_moid') and vm['phase'] == 'cloning':
+                    task = vim.Task(vm['task_moid'], content.rootFolder._stub)
+                    try:
+                        state = _object_properties(content, task, ["info.state"]).get("info.state")
+                    except Exception:
+                        state = None  # the task has expired from vCenter
+                    if state in ('queued', 'running', 'success', 'error'):
+                        adopted_tasks[vm['name']] = task
+                        continue
+                if vm['phase'] == 'succeeded':
+                    completed_vms.append(vm['name'])
+                elif vm['name'] in existing:
+                    leftover_vms.append(vm['name'])
+            to_clone = len(vm_configs) - len(completed_vms) - len(leftover_vms) - len(adopted_tasks)
+            logger(
+                f"♻️ {len(completed_vms)} VMs already created, {len(adopted_tasks)} clone tasks "
+                f"adopted, {len(leftover_vms)} left over from a failed attempt, {to_clone} to clone"
+            )
+        clone_configs = [
+            vmc for vmc in vm_configs
+            if vmc['name'] not in completed_vms and vmc['name'] not in leftover_vms
+            and vmc['name'] not in adopted_tasks
+        ]
+
+        # Reject static IPs that are already in use before any clone is submitted
+        if IP_CONFLICT_CHECK and any(any(vmc['ips']) for vmc in clone_configs):
+            try:
+                ip_index = get_ip_index(vcenter_host, vcenter_user, vcenter_pass)
+            except Exception as e:
+                logger(f"⚠️ IP conflict check skipped, guest IPs unavailable: {str(e)}")
+                ip_index = None
+            if ip_index is not None:
+                conflicts = ip_index.conflicts(clone_configs)
+                if conflicts:
+                    logger(f"❌ {len(conflicts)} IP conflict(s) found:")
+                    for vm_name, nic, ip, owners in conflicts:
+                        logger(f"   • {vm_name} NIC{nic}: {ip} already used by {', '.join(owners)}")
+                    raise Exception(f"{len(conflicts)} planned IP address(es) already in use")
+                logger(f"✅ No IP conflicts ({len(ip_index)} addresses in use in vCenter)")
+
+        # Decide every VM's datastore and host up front so a full cluster fails fast
+        for vmc in clone_configs:
+            ds, host = placement.place()
+            vmc['datastore'] = ds['obj']
+            vmc['datastore_name'] = ds['name']
+            vmc['host'] = host['obj'] if host else None
+            logger(
+                f"📍 {vmc['name']} → datastore {ds['name']} "
+                f"({_format_bytes(ds['free'])} free after clone, "
+                f"{_format_bytes(ds['provisioned'])} provisioned of {_format_bytes(ds['capacity'])}), "
+                f"host {host['name'] if host else 'chosen by vCenter'}"
+            )
+
+        # Full clones read from a datastore-local template replica when one exists
+        replica_sources = {}  # datastore moid -> VM to clone from
+
+        def clone_source(target_datastore, datastore_name):
+            if clone_mode != 'full' or not TEMPLATE_REPLICAS_ENABLED:
+                return template_vm
+            ds_key = target_datastore._moId
+            if ds_key not in replica_sources:
+                try:
+                    replica = _replica_manager.lookup(
+                        content, vcenter_host, template_vm, target_datastore,
+                        index=name_index, logger=logger,
+                    )
+                except Exception as e:
+                    logger(f"⚠️ Template replica lookup failed: {str(e)}")
+                    replica = None
+                if replica:
+                    logger(f"🧬 Using datastore-local replica of {template} on {datastore_name}")
+                replica_sources[ds_key] = replica or template_vm
+            source = replica_sources[ds_key]
+            if source is template_vm:
+                _replica_manager.note_use(
+                    vcenter_host, template_vm, target_datastore, resource_pool, logger=logger
+                )
+            return source
+
+        # All clone tasks are watched through one PropertyCollector filter
+        try:
+            task_monitor = TaskMonitor(content)
+        except Exception as e:
+            logger(f"⚠️ Task monitor unavailable, polling clone tasks instead: {str(e)}")
+            task_monitor = None
+
+        # Clones are submitted by the scheduler as slots free up
+        scheduler = CloneScheduler(
+            max_in_flight=max_concurrent_clones,
+            max_per_datastore=max_clones_per_datastore,
+            max_per_host=max_clones_per_host,
+            monitor=task_monitor,
+        )
+        logger(
+            f"⚙️ Clone scheduler: up to {scheduler.max_in_flight} clones in flight "
+            f"({scheduler.max_per_datastore} per datastore, {scheduler.max_per_host} per host)"
+        )
+
+        def start_clone(idx, vmc):
             vm_name = vmc['name']
             hostname = vmc['hostname']
             ips = vmc['ips']
-            
+            datastore = vmc['datastore']
+
             # Start VM provisioning with detailed logs (matching demo mode)
+            emit_event('vm.started', name=vm_name, hostname=hostname, index=idx, total=len(vm_configs))
             logger(f"🚀 Starting VM {idx}/{len(vm_configs)}: {vm_name}")
-            time.sleep(0.3)
-            
+
             logger(f"📋 Validating configuration for {vm_name}")
             logger(f"   • Hostname: {hostname}")
             logger(f"   • Template: {template}")
             logger(f"   • Datacenter: {datacenter_name}")
             logger(f"   • Cluster: {cluster_name}")
-            time.sleep(0.4)
-            
+
             logger(f"🌐 Detecting network zones for {vm_name}")
-            if ips:
+            if any(ips):
                 for i, ip in enumerate(ips, 1):
                     if ip:
                         logger(f"   • NIC{i}: {ip}")
             else:
                 logger(f"   • Network: DHCP mode")
-            time.sleep(0.4)
-            
+
             logger(f"💾 Cloning template for {vm_name}")
-            logger(f"   • Source template: {template}")
-            logger(f"   • Target datastore: {datastore.name}")
-            logger(f"   • Clone method: Full clone")
-            time.sleep(0.6)
-            
+            source_vm = clone_source(datastore, vmc['datastore_name'])
+            if source_vm is template_vm:
+                logger(f"   • Source template: {template}")
+            else:
+                logger(f"   • Source template: {template} (datastore-local replica)")
+            logger(f"   • Target datastore: {vmc['datastore_name']}")
+            logger(f"   • Clone method: {CLONE_MODES[clone_mode]}")
+
+            if clone_mode == 'instant':
+                # The child forks the running parent; identity goes through guestinfo
+                location = vim.vm.RelocateSpec(
+                    datastore=datastore, pool=resource_pool, host=vmc['host'], folder=vm_folder
+                )
+                instant_spec = build_instant_clone_spec(
+                    template_vm, vm_name, hostname, ips, location, logger=logger, blueprint=blueprint
+                )
+                task = template_vm.InstantClone(spec=instant_spec)
+                logger(f"✅ Instant clone task initiated for {vm_name}")
+                return task
+
             # Create clone spec
             clone_spec = vim.vm.CloneSpec()
             clone_spec.location = vim.vm.RelocateSpec()
             clone_spec.location.datastore = datastore
             clone_spec.location.pool = resource_pool
-            
+            clone_spec.location.host = vmc['host']
+            if linked_snapshot:
+                clone_spec.snapshot = linked_snapshot
+                clone_spec.location.diskMoveType = 'createNewChildDiskBacking'
+
             # Network config (vNIC mapping already handled by template)
-            # CustomizationSpec
-            os_type = 'windows' if 'win' in template.lower() else 'linux'
-            custom_spec = build_customization_spec_from_template(template_vm, hostname, ips, os_type=os_type, logger=logger)
+            # CustomizationSpec stamped from the job's blueprint (no vCenter reads per VM)
+            custom_spec = blueprint.stamp(hostname, ips, logger=logger)
             clone_spec.customization = custom_spec
             clone_spec.powerOn = True
-            
-            try:
-                # Initiate clone task
-                task = template_vm.Clone(folder=vm_folder, name=vm_name, spec=clone_spec)
-                clone_tasks.append((task, vm_name, time.time()))
-                logger(f"✅ Clone task initiated for {vm_name}")
-                
-                # Simulate clone progress (since we can't get real-time progress from vCenter tasks)
-                logger(f"📈 Clone progress: 25% - VM {vm_name}")
-                time.sleep(0.3)
-                logger(f"📈 Clone progress: 50% - VM {vm_name}")
-                time.sleep(0.3)
-                logger(f"📈 Clone progress: 75% - VM {vm_name}")
-                time.sleep(0.3)
-                logger(f"📈 Clone progress: 100% - VM {vm_name}")
-                time.sleep(0.3)
-                
-            except Exception as clone_error:
-                logger(f"❌ Failed to initiate clone for {vm_name}: {str(clone_error)}")
-                continue
-        # Wait for all clone tasks to complete (NO global timeout)
+
+            # Initiate clone task
+            task = source_vm.Clone(folder=vm_folder, name=vm_name, spec=clone_spec)
+            logger(f"✅ Clone task initiated for {vm_name}")
+            return task
+
+        for idx, vmc in enumerate(vm_configs, 1):
+            if vmc['name'] in adopted_tasks:
+                emit_event(
+                    'vm.started', name=vmc['name'], hostname=vmc['hostname'],
+                    index=idx, total=len(vm_configs), adopted=True,
+                )
+                logger(f"♻️ Adopting clone task for {vmc['name']}")
+                scheduler.add(
+                    vmc['name'], lambda task=adopted_tasks[vmc['name']]: task, config=vmc
+                )
+            elif vmc['name'] not in completed_vms and vmc['name'] not in leftover_vms:
+                scheduler.add(
+                    vmc['name'],
+                    lambda idx=idx, vmc=vmc: start_clone(idx, vmc),
+                    datastore=vmc['datastore'],
+                    host=vmc['host'],
+                    config=vmc,
+                )
+
+        # Run the pipeline (NO global timeout); completions are handled as they finish
         success_count = 0
         failed_count = 0
-        for task, vm_name, task_start_time in clone_tasks:
-            # Find the VM config for this task to get IPs and other details
-            vm_config = next((vmc for vmc in vm_configs if vmc['name'] == vm_name), None)
-            if vm_config:
-                ips = vm_config['ips']
-                hostname = vm_config['hostname']
+        logged_progress = {}
+        reported = []
+
+        def report_result(job, status, error=None):
+            record(job['name'], 'succeeded' if status == 'success' else 'failed', error=error)
+            # Same per-VM result shape and "VM<n>: {json}" line as demo mode
+            ip_values = [ip for ip in job['config']['ips'] if ip]
+            vm_data = {
+                'name': job['name'],
+                'hostname': job['config']['hostname'],
+                'status': status,
+                'ips': ', '.join(ip_values) if ip_values else 'DHCP',
+            }
+            reported.append(vm_data)
+            if vm_results is not None:
+                vm_results.append(vm_data)
+            if status == 'success':
+                emit_event('vm.ready', **vm_data)
             else:
-                ips = []
-                hostname = vm_name
-            try:
-                logger(f"⏳ Waiting for VM '{vm_name}' to finish provisioning...")
-                
-                # Monitor task progress with detailed logs (matching demo mode)
-                while task.info.state in [
-                    vim.TaskInfo.State.running,
-                    vim.TaskInfo.State.queued,
-                ]:
-                    time.sleep(1)
-                
-                if task.info.state == vim.TaskInfo.State.success:
-                    # Success path with detailed logs (matching demo mode)
-                    logger(f"✅ VM {vm_name} cloned successfully")
-                    time.sleep(0.3)
-                    
-                    logger(f"⚙️ Applying customization for {vm_name}")
-                    logger(f"   • Setting hostname: {vm_name}")
-                    if ips:
-                        for i, ip in enumerate(ips, 1):
-                            if ip:
-                                logger(f"   • Configuring NIC{i}: {ip}")
-                    logger(f"   • OS customization: {os_type}")
-                    time.sleep(0.5)
-                    
-                    logger(f"🔧 Configuring network for {vm_name}")
-                    if ips:
-                        for i, ip in enumerate(ips, 1):
-                            if ip:
-                                logger(f"   • NIC{i}: Static IP {ip} configured")
-                    else:
-                        logger(f"   • Network: DHCP automatic assignment")
-                    time.sleep(0.4)
-                    
-                    logger(f"🟢 VM {vm_name} powered on successfully")
-                    time.sleep(0.3)
-                    
-                    logger(f"✅ Guest OS boot completed - VM {vm_name} ready")
-                    time.sleep(0.2)
-                    
-                    success_count += 1
-                else:
-                    # Error path
-                    error_msg = (
-                        str(task.info.error.localizedMessage) if task.info.error else "Unknown error"
-                    )
-                    logger(f"❌ {vm_name} clone failed: {error_msg}")
-                    failed_count += 1
-            except Exception as e:
-                logger(f"❌ Error monitoring {vm_name}: {str(e)}")
+                emit_event('vm.failed', error=error, **vm_data)
+            logger(f"VM{len(reported)}: {json.dumps(vm_data, ensure_ascii=False)}")
+
+        for vmc in vm_configs:
+            if vmc['name'] in completed_vms:
+                logger(f"⏭️ {vmc['name']} already exists, skipping")
+                success_count += 1
+                report_result({'name': vmc['name'], 'config': vmc}, 'success')
+            elif vmc['name'] in leftover_vms:
+                error_msg = (
+                    "VM exists but its clone never completed in this job; "
+                    "check it or delete it and resume again"
+                )
+                logger(f"⚠️ {vmc['name']}: {error_msg}")
                 failed_count += 1
+                report_result({'name': vmc['name'], 'config': vmc}, 'failed', error=error_msg)
+
+        try:
+            for event, job in scheduler.run():
+                vm_name = job['name']
+                ips = job['config']['ips']
+                if event == 'start_failed':
+                    logger(f"❌ Failed to initiate clone for {vm_name}: {str(job['error'])}")
+                    failed_count += 1
+                    report_result(job, 'failed', error=str(job['error']))
+                elif event == 'started':
+                    record(vm_name, 'cloning', task_moid=job['task']._moId)
+                    logger(f"⏳ Waiting for VM '{vm_name}' to finish provisioning... ({scheduler.in_flight} in flight)")
+                elif event == 'progress':
+                    # Progress as reported by vCenter in task.info.progress
+                    if job['progress'] is not None and job['progress'] != logged_progress.get(vm_name):
+                        logged_progress[vm_name] = job['progress']
+                        emit_event('vm.clone_progress', name=vm_name, progress=job['progress'])
+                        logger(
+                            f"📈 Clone progress: {job['progress']}% - VM {vm_name} "
+                            f"({_transition_time(job)})"
+                        )
+                elif event == 'finished':
+                    try:
+                        if job['state'] == 'success':
+                            if logged_progress.get(vm_name) != 100:
+                                emit_event('vm.clone_progress', name=vm_name, progress=100)
+                                logger(f"📈 Clone progress: 100% - VM {vm_name} ({_transition_time(job)})")
+                            # Success path with detailed logs (matching demo mode)
+                            emit_event('vm.cloned', name=vm_name)
+                            logger(f"✅ VM {vm_name} cloned successfully")
+
+                            emit_event(
+                                'vm.customized', name=vm_name, hostname=job['config']['hostname'],
+                                ips=[ip for ip in ips if ip], os_type=os_type,
+                            )
+                            logger(f"⚙️ Applying customization for {vm_name}")
+                            logger(f"   • Setting hostname: {vm_name}")
+                            if ips:
+                                for i, ip in enumerate(ips, 1):
+                                    if ip:
+                                        logger(f"   • Configuring NIC{i}: {ip}")
+                            if clone_mode == 'instant':
+                                logger(f"   • OS customization: guestinfo ({os_type})")
+                            else:
+                                logger(f"   • OS customization: {os_type}")
+
+                            logger(f"🔧 Configuring network for {vm_name}")
+                            if any(ips):
+                                for i, ip in enumerate(ips, 1):
+                                    if ip:
+                                        logger(f"   • NIC{i}: Static IP {ip} configured")
+                            else:
+                                logger(f"   • Network: DHCP automatic assignment")
+
+                            emit_event('vm.powered_on', name=vm_name)
+                            logger(f"🟢 VM {vm_name} powered on successfully")
+                            logger(f"✅ Guest OS boot completed - VM {vm_name} ready")
+
+                            success_count += 1
+                            report_result(job, 'success')
+                        else:
+                            # Error path
+                            error_msg = (
+                                str(job['task_error'].localizedMessage) if job['task_error'] else "Unknown error"
+                            )
+                            logger(f"❌ {vm_name} clone failed: {error_msg}")
+                            failed_count += 1
+                            report_result(job, 'failed', error=error_msg)
+                    except Exception as e:
+                        logger(f"❌ Error monitoring {vm_name}: {str(e)}")
+                        failed_count += 1
+                        report_result(job, 'failed', error=str(e))
+        finally:
+            if task_monitor:
+                task_monitor.close()
+            for source in replica_sources.values():
+                if source is not template_vm:
+                    _replica_manager.release(vcenter_host, source)
+
         total_time = time.time() - start_time
         logger("")
         logger(f"🎉 PROVISIONING COMPLETED SUCCESSFULLY!")
@@ -760,12 +3025,20 @@ def provision_vms(
         logger(f"   📋 Total requested: {len(vm_configs)}")
         logger(f"🚀 PRODUCTION MODE: Real vCenter provisioning completed using your configuration")
         completion_msg = f"Provisioning completed in {total_time:.1f}s! {success_count}/{len(vm_configs)} VMs created successfully"
+        emit_event(
+            'job.completed', succeeded=success_count, failed=failed_count,
+            total=len(vm_configs), seconds=round(total_time, 1), message=completion_msg,
+        )
         return completion_msg
     except Exception as e:
         total_time = time.time() - start_time
         error_msg = f"Provisioning failed after {total_time:.1f}s: {str(e)}"
         logger(f"❌ {error_msg}")
+        emit_event('job.failed', error=error_msg)
         raise Exception(error_msg)
+    finally:
+        if si is not None:
+            _session_pool.release(vcenter_host, vcenter_user, si)
 
 
 def get_template_network_info(template_vm, logger=print):
@@ -812,102 +3085,120 @@ def get_template_network_info(template_vm, logger=print):
     return network_info
 
 
-def build_customization_spec_from_template(template_vm, hostname, ip_list, os_type='linux', logger=print):
+DEFAULT_SUBNET_MASK = '255.255.255.0'
+
+
+class CustomizationBlueprint:
     """
-    สร้าง CustomizationSpec โดยดึง network settings จาก template และ override เฉพาะ IP
-    - template_vm: template VM object
-    - hostname: ชื่อ host ที่ต้องการ
-    - ip_list: list ของ IP ที่ต้องการ override (None = ใช้ DHCP)
-    - os_type: 'linux' หรือ 'windows'
+    Per-template guest customization settings, computed once per job
+
+    - nics: one entry per template NIC in device order, with the backing network
+      and the subnet mask / gateway from the network's vCenter IP pool
+    - stamp() builds each VM's Specification locally, overriding only hostname and IPs
     """
-    logger(f"🔍 Analyzing template network configuration...")
-    
-    # ดึง network configuration จาก template
-    template_nics = []
-    if template_vm.config and template_vm.config.hardware:
-        for device in template_vm.config.hardware.device:
-            if isinstance(device, vim.vm.device.VirtualEthernetCard):
-                nic_info = {
-                    'device': device,
-                    'network': None,
-                    'ip_settings': None
-                }
-                # ดึง network ที่เชื่อมต่อ
-                if device.backing and hasattr(device.backing, 'network'):
-                    nic_info['network'] = device.backing.network
-                template_nics.append(nic_info)
-    
-    logger(f"📋 Found {len(template_nics)} NICs in template")
-    
-    # สร้าง CustomizationSpec
-    global_ip = vim.vm.customization.GlobalIPSettings()
-    nic_settings = []
-    
-    for i, (nic_info, new_ip) in enumerate(zip(template_nics, ip_list)):
-        adapter = vim.vm.customization.AdapterMapping()
-        
-        # ใช้ network settings จาก template
-        if nic_info['network']:
-            adapter.adapter = vim.vm.customization.IPSettings()
-            
-            # ถ้ามี IP ใหม่ ให้ override
+
+    def __init__(self, nics, os_type='linux', domain='localdomain'):
+        self.nics = nics
+        self.os_type = os_type
+        self.domain = domain
+
+    @classmethod
+    def from_template(cls, template_vm, datacenter=None, os_type='linux', logger=print):
+        """
+        Read the template NICs (one property fetch) and the datacenter's IP pools
+        (one QueryIpPools call) to resolve each NIC's subnet mask and gateway
+        """
+        logger(f"🔍 Analyzing template network configuration...")
+        content = _content_of(template_vm)
+        devices = _object_properties(content, template_vm, ["config.hardware.device"]).get(
+            "config.hardware.device", []
+        )
+        pool_settings = {}  # network moid -> (subnet mask, gateway)
+        if datacenter is not None:
+            try:
+                for pool in content.ipPoolManager.QueryIpPools(dc=datacenter) or []:
+                    ipv4 = pool.ipv4Config
+                    if not ipv4 or not ipv4.netmask:
+                        continue
+                    for association in pool.networkAssociation or []:
+                        if association.network:
+                            pool_settings[association.network._moId] = (ipv4.netmask, ipv4.gateway)
+            except Exception as e:
+                logger(f"⚠️ Could not read IP pools, using default subnet mask: {str(e)}")
+
+        nics = []
+        for device in devices:
+            if not isinstance(device, vim.vm.device.VirtualEthernetCard):
+                continue
+            network = getattr(device.backing, 'network', None)
+            subnet_mask, gateway = pool_settings.get(
+                network._moId if network is not None else None, (DEFAULT_SUBNET_MASK, None)
+            )
+            nics.append({'network': network, 'subnet_mask': subnet_mask, 'gateway': gateway})
+        logger(f"📋 Found {len(nics)} NICs in template")
+        return cls(nics, os_type=os_type)
+
+    def _identity(self, hostname):
+        if self.os_type == 'windows':
+            return vim.vm.customization.Sysprep(
+                guiUnattended=vim.vm.customization.GuiUnattended(
+                    autoLogon=False,
+                    autoLogonCount=1,
+                    timeZone=190
+                ),
+                userData=vim.vm.customization.UserData(
+                    computerName=vim.vm.customization.FixedName(name=hostname),
+                    fullName="Administrator",
+                    orgName="Organization"
+                ),
+                identification=vim.vm.customization.Identification()
+            )
+        return vim.vm.customization.LinuxPrep(
+            hostName=vim.vm.customization.FixedName(name=hostname),
+            domain=self.domain
+        )
+
+    def stamp(self, hostname, ip_list, logger=print):
+        """Build the Specification for one VM; no vCenter calls"""
+        nic_settings = []
+        for i, (nic, new_ip) in enumerate(zip(self.nics, ip_list)):
+            adapter = vim.vm.customization.AdapterMapping()
             if new_ip:
                 logger(f"🌐 NIC{i+1}: Override IP to {new_ip}")
-                adapter.adapter.ip = vim.vm.customization.FixedIp(ipAddress=new_ip)
-                # ใช้ subnet/gateway จาก template (ถ้ามี)
-                if hasattr(nic_info['network'], 'summary'):
-                    network_summary = nic_info['network'].summary
-                    if hasattr(network_summary, 'ipPool'):
-                        ip_pool = network_summary.ipPool
-                        if ip_pool and hasattr(ip_pool, 'subnetAddress'):
-                            adapter.adapter.subnetMask = ip_pool.subnetAddress
-                        if ip_pool and hasattr(ip_pool, 'gateway'):
-                            adapter.adapter.gateway = [ip_pool.gateway]
-            else:
-                logger(f"🌐 NIC{i+1}: Use DHCP")
-                adapter.adapter.ip = vim.vm.customization.DhcpIpGenerator()
-        else:
-            # Fallback: ใช้การตั้งค่าพื้นฐาน
-            if new_ip:
                 adapter.adapter = vim.vm.customization.IPSettings(
                     ip=vim.vm.customization.FixedIp(ipAddress=new_ip),
-                    subnetMask='255.255.255.0'
+                    subnetMask=nic['subnet_mask'],
+                    gateway=[nic['gateway']] if nic['gateway'] else [],
                 )
             else:
+                logger(f"🌐 NIC{i+1}: Use DHCP")
                 adapter.adapter = vim.vm.customization.IPSettings(
                     ip=vim.vm.customization.DhcpIpGenerator()
                 )
-        
-        nic_settings.append(adapter)
-    
-    # Identity settings
-    if os_type == 'windows':
-        ident = vim.vm.customization.Sysprep(
-            guiUnattended=vim.vm.customization.GuiUnattended(
-                autoLogon=False,
-                autoLogonCount=1,
-                timeZone=190
-            ),
-            userData=vim.vm.customization.UserData(
-                computerName=vim.vm.customization.FixedName(name=hostname),
-                fullName="Administrator",
-                orgName="Organization"
-            ),
-            identification=vim.vm.customization.Identification()
-        )
-    else:
-        ident = vim.vm.customization.LinuxPrep(
-            hostName=vim.vm.customization.FixedName(name=hostname),
-            domain='localdomain'
-        )
-    
-    custom_spec = vim.vm.customization.Specification()
-    custom_spec.nicSettingMap = nic_settings
-    custom_spec.globalIPSettings = global_ip
-    custom_spec.identity = ident
-    
-    logger(f"✅ CustomizationSpec created with {len(nic_settings)} NICs")
-    return custom_spec
+            nic_settings.append(adapter)
+
+        custom_spec = vim.vm.customization.Specification()
+        custom_spec.nicSettingMap = nic_settings
+        custom_spec.globalIPSettings = vim.vm.customization.GlobalIPSettings()
+        custom_spec.identity = self._identity(hostname)
+
+        logger(f"✅ CustomizationSpec created with {len(nic_settings)} NICs")
+        return custom_spec
+
+
+def build_customization_spec_from_template(template_vm, hostname, ip_list, os_type='linux', logger=print, datacenter=None):
+    """
+    สร้าง CustomizationSpec โดยดึง network settings จาก template และ override เฉพาะ IP
+    - template_vm: template VM object
+    - hostname: ชื่อ host ที่ต้องการ
+    - ip_list: list ของ IP ที่ต้องการ override (None = ใช้ DHCP)
+    - os_type: 'linux' หรือ 'windows'
+    For many VMs, build a CustomizationBlueprint once and call stamp() per VM instead.
+    """
+    blueprint = CustomizationBlueprint.from_template(
+        template_vm, datacenter=datacenter, os_type=os_type, logger=logger
+    )
+    return blueprint.stamp(hostname, ip_list, logger=logger)
 
 
 def build_customization_spec(hostname, ip_list, os_type='linux', netmask='255.255.255.0', gateway=None, dns=None, domain='localdomain'):